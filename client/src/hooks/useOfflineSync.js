@@ -2,6 +2,9 @@ import { useState, useEffect, useCallback } from 'react';
 import { Network } from '@capacitor/network';
 import { Capacitor } from '@capacitor/core';
 
+// Most items POST /api/sync accepts in one request (MAX_SYNC_ITEMS on the server)
+const MAX_SYNC_ITEMS = 200;
+
 export function useNetworkStatus() {
   const [isOnline, setIsOnline] = useState(true);
   const [connectionType, setConnectionType] = useState('unknown');
@@ -68,7 +71,7 @@ export function useOfflineSync(apiBaseUrl = '') {
 
   // Add item to sync queue
   const addToQueue = useCallback((item) => {
-    setSyncQueue(prev => [...prev, { ...item, queuedAt: Date.now() }]);
+    setSyncQueue(prev => [...prev, { ...item, id: crypto.randomUUID(), queuedAt: Date.now() }]);
   }, []);
 
   // Process sync queue when online
@@ -76,29 +79,52 @@ export function useOfflineSync(apiBaseUrl = '') {
     if (!isOnline || syncQueue.length === 0 || isSyncing) return;
 
     setIsSyncing(true);
-    const processed = [];
 
-    for (const item of syncQueue) {
+    // Replay the queue in batches the server accepts; each item's id is its idempotency key
+    // (items queued before ids were added fall back to their queue time)
+    const keyOf = item => item.id || String(item.queuedAt);
+    for (let start = 0; start < syncQueue.length; start += MAX_SYNC_ITEMS) {
+      const batch = syncQueue.slice(start, start + MAX_SYNC_ITEMS);
+      const processed = [];
       try {
-        const response = await fetch(`${apiBaseUrl}${item.endpoint}`, {
-          method: item.method || 'POST',
+        const response = await fetch(`${apiBaseUrl}/api/sync`, {
+          method: 'POST',
           headers: {
             'Content-Type': 'application/json',
             ...(token ? { 'Authorization': `Bearer ${token}` } : {})
           },
-          body: JSON.stringify(item.data)
+          body: JSON.stringify({
+            items: batch.map(item => ({
+              idempotency_key: keyOf(item),
+              endpoint: item.endpoint,
+              method: item.method || 'POST',
+              data: item.data
+            }))
+          })
         });
 
-        if (response.ok) {
-          processed.push(item.queuedAt);
+        if (!response.ok) {
+          console.error('Sync failed with status', response.status);
+          break;
+        }
+        const { results } = await response.json();
+        for (const result of results) {
+          if (result.ok) {
+            processed.push(result.idempotency_key);
+          } else {
+            console.error('Sync failed for item:', result.idempotency_key, result.detail);
+          }
         }
       } catch (error) {
-        console.error('Sync failed for item:', item, error);
+        // Offline again: the rest of the queue waits for the next sync
+        console.error('Sync failed:', error);
+        break;
       }
+
+      // Remove this batch's processed items as soon as its response is in
+      setSyncQueue(prev => prev.filter(item => !processed.includes(keyOf(item))));
     }
 
-    // Remove processed items
-    setSyncQueue(prev => prev.filter(item => !processed.includes(item.queuedAt)));
     setLastSyncTime(Date.now());
     setIsSyncing(false);
   }, [isOnline, syncQueue, isSyncing, apiBaseUrl]);
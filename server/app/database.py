@@ -0,0 +1,44 @@
+# ClearMind Database
+import os
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.engine import Engine
+
+from app.models import metadata
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./clearmind.db")
+
+_engine = None
+
+
+def is_sqlite() -> bool:
+    return DATABASE_URL.startswith("sqlite")
+
+
+def data_directory() -> str:
+    """Directory holding the SQLite database file, where other on-disk state is kept next to it."""
+    database = make_url(DATABASE_URL).database if is_sqlite() else None
+    if not database or database == ":memory:":
+        return os.getcwd()
+    return os.path.dirname(os.path.abspath(database))
+
+
+def get_engine() -> Engine:
+    """Get the shared SQLAlchemy engine, creating tables on first use."""
+    global _engine
+    if _engine is None:
+        connect_args = {"check_same_thread": False} if is_sqlite() else {}
+        engine = create_engine(DATABASE_URL, connect_args=connect_args)
+
+        if is_sqlite():
+            @event.listens_for(engine, "connect")
+            def set_sqlite_pragmas(dbapi_connection, connection_record):
+                cursor = dbapi_connection.cursor()
+                # WAL lets readers proceed while background writers commit
+                cursor.execute("PRAGMA journal_mode=WAL")
+                cursor.execute("PRAGMA synchronous=NORMAL")
+                cursor.close()
+
+        metadata.create_all(engine)
+        _engine = engine
+    return _engine
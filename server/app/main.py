@@ -1,24 +1,99 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 import os
 from pathlib import Path
 
-from app.routers import thoughts, exercises, auth, chat
+from app.routers import thoughts, exercises, auth, chat, sync, admin, jobs, ambient, usage, history, reminders
+from app.services.jobs import job_queue
+from app.services.loop_monitor import loop_monitor
+from app.services.usage import usage_meter
+from app.services.reminders import reminder_scheduler
+from app.services.analysis_library import analysis_library
+from app.services.tokens import revocation_list
+from app.services.write_behind import write_behind
+from app.services import startup, llm
+from app.services.catalog import get_distortions_data, get_exercises_data
+from app.middleware.idempotency import IdempotencyMiddleware
+from app.middleware.request_context import RequestContextMiddleware
+from app.middleware.tracing import TracingMiddleware
+from app.middleware.cancellation import RequestCancellationMiddleware
+from app.middleware.body_limit import BodySizeLimitMiddleware, MAX_REQUEST_BYTES, MAX_SYNC_REQUEST_BYTES
 
 load_dotenv()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Start background workers on startup and stop them on shutdown
+    loop_monitor.start()
+    await job_queue.start()
+    await usage_meter.start()
+    await write_behind.start()
+    await reminder_scheduler.start()
+    await revocation_list.start()
+    warmup_task = await startup.initialize([
+        llm.warm_up,
+        auth.warm_up,
+        get_distortions_data,
+        get_exercises_data,
+        analysis_library.load,
+    ])
+    startup.mark("ready_seconds")
+    yield
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+    await revocation_list.stop()
+    await reminder_scheduler.stop()
+    await job_queue.stop()
+    # Queued history writes (including those of finished jobs) are committed before exit
+    await write_behind.stop()
+    await usage_meter.stop()
+    await loop_monitor.stop()
+
+
 app = FastAPI(
     title="ClearMind API",
     description="AI-powered cognitive behavioral therapy API for identifying cognitive distortions and reframing thoughts",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Environment
 ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
 
+# Make the caller's identity available to services for per-user state
+app.add_middleware(RequestContextMiddleware)
+
+# Replay completed responses for retried model-backed requests
+# (added before CORS so CORS stays the outermost middleware)
+app.add_middleware(
+    IdempotencyMiddleware,
+    paths=["/api/analyze", "/api/chat", "/api/chat/summarize", "/api/chat/action-plan"],
+)
+
+# Abort model-backed requests when the client disconnects or its deadline passes
+# (outside idempotency so an aborted request is not stored for replay)
+app.add_middleware(
+    RequestCancellationMiddleware,
+    paths=[
+        "/api/analyze", "/api/chat", "/api/chat/summarize", "/api/chat/action-plan",
+        "/api/chat/analyze-distortions", "/api/chat/reminder", "/api/chat/categorize", "/api/chat/insights",
+    ],
+)
+
+# Root span per request; stage spans are added by TracedRoute and the services
+app.add_middleware(TracingMiddleware)
+
+# Reject oversized bodies before anything buffers or parses them
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    max_bytes=MAX_REQUEST_BYTES,
+    path_limits={"/api/sync": MAX_SYNC_REQUEST_BYTES},
+)
+
 # CORS configuration - include Capacitor origins for mobile apps
 origins = [
     "http://localhost:3000",
@@ -43,10 +118,18 @@ app.include_router(thoughts.router, prefix="/api", tags=["Thoughts"])
 app.include_router(exercises.router, prefix="/api", tags=["Exercises"])
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(chat.router, prefix="/api", tags=["Chat"])
+app.include_router(ambient.router, prefix="/api", tags=["Ambient"])
+app.include_router(sync.router, prefix="/api", tags=["Sync"])
+app.include_router(jobs.router, prefix="/api", tags=["Jobs"])
+app.include_router(usage.router, prefix="/api", tags=["Usage"])
+app.include_router(history.router, prefix="/api", tags=["History"])
+app.include_router(reminders.router, prefix="/api", tags=["Reminders"])
+app.include_router(admin.router, prefix="/api/admin", tags=["Admin"])
 
 
 @app.get("/health")
 async def health_check():
+    startup.mark("first_healthy_seconds")
     return {"status": "healthy"}
 
 
@@ -59,6 +142,8 @@ if not STATIC_DIR.exists():
     STATIC_DIR = Path(__file__).parent.parent.parent / "client" / "dist"
 
 if STATIC_DIR.exists():
+    from fastapi.staticfiles import StaticFiles
+
     # Serve static assets
     app.mount("/assets", StaticFiles(directory=STATIC_DIR / "assets"), name="assets")
 
@@ -80,6 +165,9 @@ else:
         }
 
 
+startup.mark("app_imported_seconds")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
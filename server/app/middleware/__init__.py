@@ -0,0 +1 @@
+# ClearMind Middleware
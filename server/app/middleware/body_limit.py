@@ -0,0 +1,69 @@
+import os
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+from starlette.datastructures import Headers
+
+from app.middleware.idempotency import send_json
+
+# Largest request body accepted, and a larger one for offline sync batches
+MAX_REQUEST_BYTES = int(os.getenv("MAX_REQUEST_BYTES", str(1024 * 1024)))
+MAX_SYNC_REQUEST_BYTES = int(os.getenv("MAX_SYNC_REQUEST_BYTES", str(8 * 1024 * 1024)))
+
+
+class RequestTooLargeError(HTTPException):
+    def __init__(self, limit: int):
+        super().__init__(status_code=413, detail=f"Request body is larger than {limit} bytes")
+
+
+class BodySizeLimitMiddleware:
+    """
+    Rejects request bodies over a size limit with 413 before they are
+    buffered or parsed. A declared Content-Length is checked up front;
+    chunked bodies are counted as they are received.
+    """
+
+    def __init__(self, app, max_bytes: int = MAX_REQUEST_BYTES, path_limits: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_limits = path_limits or {}
+
+    def limit_for(self, path: str) -> int:
+        return self.path_limits.get(path, self.max_bytes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.limit_for(scope["path"])
+        content_length = Headers(scope=scope).get("content-length", "")
+        if content_length.isdigit() and int(content_length) > limit:
+            await send_json(send, 413, {"detail": RequestTooLargeError(limit).detail})
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # FastAPI turns this into a 413 response while reading the body
+                    raise RequestTooLargeError(limit)
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except RequestTooLargeError as e:
+            # Raised past FastAPI, e.g. by a middleware that buffers the body
+            if not response_started:
+                await send_json(send, 413, {"detail": e.detail})
@@ -0,0 +1,98 @@
+import asyncio
+from typing import Iterable, Optional
+
+from starlette.datastructures import Headers
+
+from app.middleware.idempotency import replayable, send_json
+from app.services.cancellation import (
+    CANCEL_ON_DISCONNECT, DEADLINE_HEADER, cancellation_metrics, parse_deadline
+)
+
+
+class RequestCancellationMiddleware:
+    """
+    Aborts model-backed requests nobody is waiting for: when the client
+    disconnects, or when the deadline it sent in X-Request-Deadline-Ms
+    passes. The handler task is cancelled, which also cancels its pending
+    upstream calls. A passed deadline is answered with 504 if no response
+    has started.
+    """
+
+    def __init__(self, app, paths: Iterable[str]):
+        self.app = app
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        deadline = parse_deadline(headers.get(DEADLINE_HEADER))
+        # A retry with the same Idempotency-Key attaches to the running request
+        watch_disconnect = CANCEL_ON_DISCONNECT and not replayable(headers)
+        if deadline is None and not watch_disconnect:
+            await self.app(scope, receive, send)
+            return
+
+        disconnected = asyncio.Event()
+        messages: asyncio.Queue = asyncio.Queue()
+        receive_error: Optional[Exception] = None
+        response_started = False
+
+        async def pump():
+            # Read ahead of the app so a disconnect is seen while the handler is busy
+            nonlocal receive_error
+            while True:
+                try:
+                    message = await receive()
+                except Exception as e:
+                    # e.g. RequestTooLargeError from the body size limit; the app's
+                    # receive raises it, so it is answered as if read directly
+                    receive_error = e
+                    await messages.put(None)
+                    return
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    disconnected.set()
+                    return
+
+        async def queued_receive():
+            message = await messages.get()
+            if message is None:
+                # Every later read fails the same way
+                messages.put_nowait(None)
+                raise receive_error
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        app_receive = queued_receive if watch_disconnect else receive
+        handler = asyncio.create_task(self.app(scope, app_receive, tracking_send))
+        watchers = []
+        if watch_disconnect:
+            watchers = [asyncio.create_task(pump()), asyncio.create_task(disconnected.wait())]
+        try:
+            await asyncio.wait([handler, *watchers[1:]], timeout=deadline, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            handler.cancel()
+            raise
+        finally:
+            for watcher in watchers:
+                watcher.cancel()
+
+        if handler.done():
+            handler.result()
+            return
+
+        reason = "disconnect" if disconnected.is_set() else "deadline"
+        handler.cancel()
+        await asyncio.gather(handler, return_exceptions=True)
+        cancellation_metrics.record_request(scope["path"], reason)
+        if reason == "deadline" and not response_started:
+            cancellation_metrics.counters["deadline_responses"] += 1
+            await send_json(send, 504, {"detail": "Request deadline exceeded"})
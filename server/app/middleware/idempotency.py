@@ -0,0 +1,240 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers
+
+# How long a completed response can be replayed, and how many are kept
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "600"))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "1000"))
+
+# Responses larger than this are passed through but never stored
+MAX_STORED_BODY_BYTES = 1024 * 1024
+MAX_KEY_LENGTH = 255
+
+
+def replayable(headers: Headers) -> bool:
+    """
+    Only signed-in callers' requests are cached: keys are scoped by the
+    Authorization header, so anonymous clients would share one namespace.
+    """
+    return bool(headers.get("idempotency-key")) and bool(headers.get("authorization"))
+
+
+class CachedResponse:
+    __slots__ = ("status", "headers", "body")
+
+    def __init__(self, status: int, headers: List[Tuple[bytes, bytes]], body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+class IdempotencyEntry:
+    __slots__ = ("fingerprint", "future", "response", "expires_at")
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.response: Optional[CachedResponse] = None
+        self.expires_at: Optional[float] = None
+
+
+class IdempotencyCache:
+    """
+    Size-bounded store of in-flight and completed responses keyed by
+    Idempotency-Key. Completed entries expire after a TTL; the oldest
+    entries are evicted first once the cache is full. The TTL is the same
+    for every entry, so expiry times are queued in completion order and
+    only the expired front of the queue is examined.
+    """
+
+    def __init__(self, ttl_seconds: int = IDEMPOTENCY_TTL_SECONDS, max_entries: int = IDEMPOTENCY_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, IdempotencyEntry]" = OrderedDict()
+        self.expiry: Deque[Tuple[float, str, IdempotencyEntry]] = deque()
+        self.counters = {
+            "hits": 0,
+            "attached": 0,
+            "misses": 0,
+            "stored": 0,
+            "conflicts": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+    def _purge(self):
+        now = time.monotonic()
+        while self.expiry and self.expiry[0][0] <= now:
+            _, key, entry = self.expiry.popleft()
+            # Skip entries already evicted or replaced
+            if self.entries.get(key) is entry:
+                del self.entries[key]
+                self.counters["expirations"] += 1
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def reserve(self, key: str, fingerprint: str) -> Tuple[IdempotencyEntry, bool]:
+        """Return the existing entry for a key, or create a pending one (second value True)."""
+        self._purge()
+        entry = self.entries.get(key)
+        if entry is not None:
+            return entry, False
+
+        entry = IdempotencyEntry(fingerprint)
+        self.entries[key] = entry
+        self.counters["misses"] += 1
+        self._purge()
+        return entry, True
+
+    def complete(self, key: str, entry: IdempotencyEntry, response: Optional[CachedResponse]):
+        """Resolve waiters and keep the response if it is worth replaying."""
+        if response is not None and response.status < 500:
+            entry.response = response
+            entry.expires_at = time.monotonic() + self.ttl_seconds
+            self.expiry.append((entry.expires_at, key, entry))
+            self.counters["stored"] += 1
+        elif self.entries.get(key) is entry:
+            # Server errors and failures are not cached so a retry runs again
+            del self.entries[key]
+        if not entry.future.done():
+            entry.future.set_result(entry.response)
+
+    def stats(self) -> Dict:
+        lookups = self.counters["hits"] + self.counters["attached"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hit_rate": round((self.counters["hits"] + self.counters["attached"]) / lookups, 4) if lookups else 0.0,
+        }
+
+
+idempotency_cache = IdempotencyCache()
+
+
+async def send_json(send, status: int, content: Dict):
+    body = json.dumps(content).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class IdempotencyMiddleware:
+    """
+    Replays completed responses for POST requests of signed-in callers that
+    carry an Idempotency-Key header, so client retries do not repeat model
+    calls.
+
+    A duplicate that arrives while the original is still running waits for
+    it and receives the same bytes. Reusing a key with a different request
+    body or Accept header is rejected with 422.
+    """
+
+    def __init__(self, app, paths: List[str], cache: Optional[IdempotencyCache] = None):
+        self.app = app
+        self.paths = set(paths)
+        self.cache = cache or idempotency_cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        if not replayable(headers):
+            await self.app(scope, receive, send)
+            return
+        key = headers["idempotency-key"]
+        if len(key) > MAX_KEY_LENGTH:
+            await send_json(send, 400, {"detail": "Idempotency-Key is too long"})
+            return
+
+        # Buffer the body so it can be fingerprinted and then handed to the app
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+
+        # Keys are scoped to the caller so one user cannot replay another's response
+        caller = hashlib.sha256(headers["authorization"].encode()).hexdigest()[:16]
+        cache_key = f"{scope['path']}|{caller}|{key}"
+        # The stored bytes are in the negotiated format, so Accept is part of the request
+        fingerprint = hashlib.sha256(headers.get("accept", "").encode() + b"\n" + body).hexdigest()
+
+        entry, created = self.cache.reserve(cache_key, fingerprint)
+        if not created:
+            if entry.fingerprint != fingerprint:
+                self.cache.counters["conflicts"] += 1
+                await send_json(send, 422, {"detail": "Idempotency-Key was already used with a different request"})
+                return
+
+            in_flight = not entry.future.done()
+            cached = await asyncio.shield(entry.future)
+            if cached is not None:
+                self.cache.counters["attached" if in_flight else "hits"] += 1
+                await self.replay(cached, send)
+                return
+            # The original request failed; run this one normally
+            self.cache.counters["misses"] += 1
+
+        await self.run_and_capture(scope, body, receive, send, cache_key, entry if created else None)
+
+    async def replay(self, cached: CachedResponse, send):
+        await send({
+            "type": "http.response.start",
+            "status": cached.status,
+            "headers": cached.headers + [(b"idempotent-replayed", b"true")],
+        })
+        await send({"type": "http.response.body", "body": cached.body})
+
+    async def run_and_capture(self, scope, body: bytes, receive, send, cache_key: str, entry: Optional[IdempotencyEntry]):
+        body_sent = False
+
+        async def replay_receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        status = 500
+        response_headers: List[Tuple[bytes, bytes]] = []
+        response_body = bytearray()
+        storable = True
+
+        async def capture_send(message):
+            nonlocal status, response_headers, storable
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body" and storable:
+                response_body.extend(message.get("body", b""))
+                if len(response_body) > MAX_STORED_BODY_BYTES:
+                    storable = False
+                    response_body.clear()
+            await send(message)
+
+        response = None
+        try:
+            await self.app(scope, replay_receive, capture_send)
+            if storable:
+                response = CachedResponse(status, response_headers, bytes(response_body))
+        finally:
+            if entry is not None:
+                self.cache.complete(cache_key, entry, response)
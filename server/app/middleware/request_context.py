@@ -0,0 +1,34 @@
+from starlette.datastructures import Headers
+
+from app.routers.auth import decode_access_token, users_db
+from app.services.request_context import current_request
+
+
+class RequestContextMiddleware:
+    """Binds the caller's user id and address to the request context."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        user_id = None
+        authorization = Headers(scope=scope).get("authorization", "")
+        if authorization.lower().startswith("bearer "):
+            payload = decode_access_token(authorization[7:])
+            if payload and payload.get("sub") in users_db:
+                user_id = payload["sub"]
+
+        client = scope.get("client")
+        token = current_request.set({
+            "user_id": user_id,
+            "client_host": client[0] if client else None,
+            "path": scope["path"],
+        })
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_request.reset(token)
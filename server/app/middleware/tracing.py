@@ -0,0 +1,70 @@
+import asyncio
+import functools
+
+from fastapi.routing import APIRoute
+
+from app.services.tracing import span, current_span
+
+# Operator endpoints are not traced, so reading traces does not fill the buffer
+UNTRACED_PREFIXES = ("/api/admin", "/health")
+
+
+class TracingMiddleware:
+    """Starts a root span per HTTP request and returns its id as X-Trace-Id."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(UNTRACED_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        with span(f"{scope['method']} {scope['path']}", method=scope["method"], path=scope["path"]) as root:
+            async def send_with_trace_id(message):
+                if message["type"] == "http.response.start":
+                    root.set("status_code", message["status"])
+                    if root.trace_id:
+                        message["headers"] = list(message.get("headers", [])) + [
+                            (b"x-trace-id", root.trace_id.encode())
+                        ]
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace_id)
+            route = scope.get("route")
+            if route is not None:
+                root.set("route", route.path)
+
+
+class TracedRoute(APIRoute):
+    """
+    Route class that adds a "route" span around FastAPI's request handling
+    (body parsing and validation, the endpoint, response serialization) and
+    an "endpoint" span around the endpoint function itself. The time before
+    the endpoint starts is recorded on the route span as parse_ms.
+    """
+
+    def get_route_handler(self):
+        endpoint = self.dependant.call
+        if asyncio.iscoroutinefunction(endpoint) and not getattr(endpoint, "_traced", False):
+            endpoint_name = f"endpoint {self.name}"
+
+            @functools.wraps(endpoint)
+            async def traced_endpoint(*args, **kwargs):
+                parent = current_span.get()
+                if parent is not None:
+                    parent.set("parse_ms", round(parent.elapsed_ms(), 3))
+                with span(endpoint_name):
+                    return await endpoint(*args, **kwargs)
+
+            traced_endpoint._traced = True
+            self.dependant.call = traced_endpoint
+
+        handler = super().get_route_handler()
+        route_name = f"route {self.path}"
+
+        async def traced_handler(request):
+            with span(route_name, route=self.path):
+                return await handler(request)
+
+        return traced_handler
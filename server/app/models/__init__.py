@@ -1 +1,134 @@
 # ClearMind Database Models
+from sqlalchemy import MetaData, Table, Column, String, Integer, Float, Text, DateTime, JSON, Index, DDL, event
+
+metadata = MetaData()
+
+# Background generation jobs (see app.services.jobs)
+jobs = Table(
+    "jobs",
+    metadata,
+    Column("id", String(36), primary_key=True),
+    Column("type", String(32), nullable=False),
+    Column("status", String(16), nullable=False, index=True),
+    Column("user_id", String(64), index=True),
+    Column("payload", JSON, nullable=False),
+    Column("result", JSON),
+    Column("error", Text),
+    Column("attempts", Integer, nullable=False, default=0),
+    Column("created_at", DateTime, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+# Daily model token usage per caller, endpoint and model (see app.services.usage)
+usage_daily = Table(
+    "usage_daily",
+    metadata,
+    Column("day", String(10), primary_key=True),
+    Column("user_key", String(96), primary_key=True),
+    Column("endpoint", String(64), primary_key=True),
+    Column("model", String(64), primary_key=True),
+    Column("requests", Integer, nullable=False, default=0),
+    Column("input_tokens", Integer, nullable=False, default=0),
+    Column("output_tokens", Integer, nullable=False, default=0),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+# Stored thought analyses and chat summaries of signed-in users (see app.services.history)
+history = Table(
+    "history",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("user_id", String(64), nullable=False),
+    Column("kind", String(16), nullable=False),
+    Column("input", Text, nullable=False),
+    Column("result", JSON, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+    # Keyset pagination for exports walks (user_id, id)
+    Index("ix_history_user_id_id", "user_id", "id"),
+)
+
+# Scheduled reminders of signed-in users (see app.services.reminders).
+# status: pending -> due (dispatched, awaiting acknowledgement) -> delivered; or cancelled
+reminders = Table(
+    "reminders",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("user_id", String(64), nullable=False),
+    Column("text", Text, nullable=False),
+    Column("category", String(32), nullable=False),
+    Column("suggested_time", String(64)),
+    Column("due_at", DateTime, nullable=False),
+    Column("status", String(16), nullable=False),
+    Column("created_at", DateTime, nullable=False),
+    Column("dispatched_at", DateTime),
+    # The scheduler loads upcoming work as a range scan over (status, due_at)
+    Index("ix_reminders_status_due_at", "status", "due_at", "id"),
+    # Per-user listings and the delivery endpoints
+    Index("ix_reminders_user_id_status_id", "user_id", "status", "id"),
+)
+
+# Refresh tokens issued at sign-in (see app.services.tokens). Each refresh
+# rotates the token within its family; presenting a used token again revokes
+# the whole family.
+refresh_tokens = Table(
+    "refresh_tokens",
+    metadata,
+    Column("jti", String(32), primary_key=True),
+    Column("family", String(32), nullable=False),
+    Column("user_id", String(64), nullable=False),
+    Column("expires_at", DateTime, nullable=False),
+    Column("used_at", DateTime),
+    Column("revoked_at", DateTime),
+    Index("ix_refresh_tokens_family", "family"),
+)
+
+# Revoked token ids and session families, kept until the tokens they cover expire
+revoked_tokens = Table(
+    "revoked_tokens",
+    metadata,
+    Column("key", String(40), primary_key=True),
+    Column("expires_at", DateTime, nullable=False),
+    Column("revoked_at", DateTime, nullable=False),
+    # Workers pick up each other's revocations by revoked_at
+    Index("ix_revoked_tokens_revoked_at", "revoked_at"),
+)
+
+# Population-level aggregates written by the analytics job (see app.services.analytics).
+# Only counts are stored; weeks with too few distinct users are left out.
+analytics_weekly = Table(
+    "analytics_weekly",
+    metadata,
+    Column("week", String(10), primary_key=True),  # Monday, ISO date
+    Column("metric", String(16), primary_key=True),  # distortion | theme | emotion | exercise
+    Column("label", String(64), primary_key=True),
+    Column("count", Integer, nullable=False),
+    Column("share", Float, nullable=False),  # fraction of that week's records of the metric's kind
+)
+
+analytics_cooccurrence = Table(
+    "analytics_cooccurrence",
+    metadata,
+    Column("matrix", String(32), primary_key=True),  # e.g. theme_emotion
+    Column("row_label", String(64), primary_key=True),
+    Column("col_label", String(64), primary_key=True),
+    Column("count", Integer, nullable=False),
+)
+
+analytics_runs = Table(
+    "analytics_runs",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("started_at", DateTime, nullable=False),
+    Column("finished_at", DateTime, nullable=False),
+    Column("records", Integer, nullable=False),
+    Column("weeks", Integer, nullable=False),
+    Column("seconds", Float, nullable=False),
+)
+
+# Full-text index over history on SQLite (FTS5); rowid is history.id and rows
+# are written alongside history rows by app.services.search. "tags" holds
+# owner, kind, distortion, theme and emotion tokens used as filters.
+event.listen(metadata, "after_create", DDL(
+    "CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5("
+    "body, tags, tokenize = \"porter unicode61 tokenchars '_'\")"
+).execute_if(dialect="sqlite"))
@@ -0,0 +1,84 @@
+# ClearMind API Responses
+import json
+from datetime import date, datetime
+from typing import Any, Mapping, Optional
+
+from starlette.background import BackgroundTask
+from starlette.datastructures import Headers
+from starlette.responses import Response
+
+# Optional accelerated encoders; the stdlib json module is used without them
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def _default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+def dumps_json(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def dumps_msgpack(content: Any) -> bytes:
+    return msgpack.packb(content, use_bin_type=True, default=_default)
+
+
+def wants_msgpack(accept: str) -> bool:
+    return msgpack is not None and any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES)
+
+
+class FastResponse(Response):
+    """
+    Response for plain dict/list payloads that skips FastAPI's re-validation and
+    jsonable_encoder pass. Encodes with orjson, or MessagePack when the client's
+    Accept header asks for it. Rendering waits until the response is sent, so
+    the original content stays available on `.content`.
+    """
+
+    media_type = JSON_MEDIA_TYPE
+
+    def __init__(
+        self,
+        content: Any,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        background: Optional[BackgroundTask] = None,
+    ):
+        self.content = content
+        self.status_code = status_code
+        self.background = background
+        self.init_headers(headers)
+
+    def render_for(self, accept: str) -> bytes:
+        if wants_msgpack(accept):
+            self.headers["content-type"] = MSGPACK_MEDIA_TYPES[0]
+            return dumps_msgpack(self.content)
+        return dumps_json(self.content)
+
+    async def __call__(self, scope, receive, send):
+        self.body = self.render_for(Headers(scope=scope).get("accept", ""))
+        self.headers["content-length"] = str(len(self.body))
+        self.headers["vary"] = "Accept"
+        await super().__call__(scope, receive, send)
+
+
+def response_content(result: Any) -> Any:
+    """Unwrap a handler result for internal callers (batch sync, jobs)."""
+    if isinstance(result, FastResponse):
+        return result.content
+    return result
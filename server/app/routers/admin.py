@@ -0,0 +1,225 @@
+import asyncio
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+
+from app.routers.auth import require_admin
+from app.middleware.idempotency import idempotency_cache
+from app.services.jobs import job_queue
+from app.services import startup
+from app.services.ai_analyzer import analysis_cache
+from app.services.chat_service import distortion_cache
+from app.services.model_routing import route_metrics
+from app.services.ambient import ambient_metrics
+from app.services.snippet_dedup import snippet_deduplicator
+from app.services.loop_monitor import loop_monitor
+from app.services.profiler import profiler, ProfilerBusyError
+from app.services.tracing import exporter
+from app.services.usage import usage_meter, REPORT_GROUPS
+from app.services import history
+from app.services.thought_index import thought_index
+from app.services.llm_fixtures import fixture_store
+from app.services.reminders import reminder_scheduler
+from app.services.analysis_library import analysis_library
+from app.services import analytics
+from app.services.analytics import analytics_job
+from app.services.tokens import revocation_list
+from app.services.write_behind import write_behind
+from app.services.cancellation import cancellation_metrics
+from app.routers.history import export_response, EXPORT_FORMAT_PATTERN, KIND_PATTERN
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.get("/metrics")
+async def metrics():
+    """
+    Get runtime metrics for the server's caches and background subsystems.
+    """
+    return {
+        "idempotency": idempotency_cache.stats(),
+        "jobs": job_queue.stats(),
+        "startup": startup.stats(),
+        "similarity_cache": {
+            "analyze_thought": analysis_cache.stats(),
+            "analyze_cognitive_distortions": distortion_cache.stats()
+        },
+        "model_routes": route_metrics.stats(),
+        "ambient": ambient_metrics,
+        "snippet_dedup": snippet_deduplicator.stats(),
+        "event_loop": loop_monitor.stats(),
+        "profiler": profiler.stats(),
+        "tracing": exporter.stats(),
+        "usage": usage_meter.stats(),
+        "thought_index": thought_index.stats(),
+        "llm_fixtures": fixture_store.stats(),
+        "reminders": reminder_scheduler.stats(),
+        "analysis_library": analysis_library.stats(),
+        "analytics": analytics_job.stats(),
+        "token_revocation": revocation_list.stats(),
+        "write_behind": write_behind.stats(),
+        "cancellation": cancellation_metrics.stats()
+    }
+
+
+@router.get("/event-loop")
+async def event_loop(top: int = Query(10, ge=1, le=100)):
+    """
+    Get event-loop lag statistics and the code locations that blocked the loop
+    longest, with the stack captured while each one was blocking.
+    """
+    return {
+        **loop_monitor.stats(),
+        "top_offenders": loop_monitor.top_offenders(top)
+    }
+
+
+@router.get("/usage")
+async def usage_report(
+    days: int = Query(7, ge=1, le=366),
+    group_by: str = Query("user_key", pattern=f"^({'|'.join(REPORT_GROUPS)})$"),
+    user_key: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """
+    Get model token usage for the last N days, grouped by caller, endpoint,
+    model or day and ordered by total tokens. Pending counters are flushed first.
+    """
+    rows = await usage_meter.report(days, group_by, user_key, limit)
+    return {"days": days, "group_by": group_by, "rows": rows}
+
+
+@router.get("/history/export")
+async def export_all_history(
+    request: Request,
+    format: str = Query("ndjson", pattern=EXPORT_FORMAT_PATTERN),
+    kind: Optional[str] = Query(None, pattern=KIND_PATTERN),
+    user_id: Optional[str] = None,
+    since: Optional[datetime] = None
+):
+    """
+    Export stored analyses and summaries for all users (or one user) as a
+    streamed NDJSON or CSV file, for analytics.
+    """
+    rows = history.iter_history(user_id=user_id, kind=kind, since=since)
+    return export_response(request, rows, format, "clearmind-history-all")
+
+
+@router.get("/traces")
+async def list_traces(
+    limit: int = Query(20, ge=1, le=200),
+    name: Optional[str] = None,
+    min_duration_ms: float = Query(0, ge=0)
+):
+    """
+    Get recent request traces, newest first. Filter by a substring of the
+    trace name (e.g. "/api/chat") or by a minimum duration.
+    """
+    traces = exporter.recent(limit, name, min_duration_ms)
+    return {"traces": traces, "total": len(traces)}
+
+
+@router.get("/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """
+    Get one trace with all of its spans.
+    """
+    trace = exporter.find(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return trace
+
+
+def route_index(request: Request) -> dict:
+    """Map each endpoint function's code object to its route, for profile attribution."""
+    index = {}
+    for route in request.app.routes:
+        endpoint = getattr(route, "endpoint", None)
+        code = getattr(endpoint, "__code__", None)
+        if code is not None:
+            methods = ",".join(sorted(getattr(route, "methods", None) or ["WS"]))
+            index[code] = f"{methods} {route.path}"
+    return index
+
+
+@router.post("/profile")
+async def profile(
+    request: Request,
+    seconds: float = Query(10, gt=0),
+    interval_ms: float = Query(10, ge=1),
+    format: str = Query("json", pattern="^(json|collapsed)$")
+):
+    """
+    Run the sampling profiler over the live process for the given duration.
+    Returns per-route and per-function sample counts with collapsed stacks,
+    or only the collapsed stacks as text with format=collapsed.
+    """
+    if not profiler.enabled:
+        raise HTTPException(status_code=404, detail="Profiler is disabled (set PROFILER_ENABLED=true)")
+
+    try:
+        result = await asyncio.to_thread(profiler.run, seconds, interval_ms / 1000, route_index(request))
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    if format == "collapsed":
+        return PlainTextResponse("\n".join(result["collapsed"]) + "\n")
+    return result
+
+
+@router.post("/analysis-library/reload")
+async def reload_analysis_library():
+    """
+    Reload the precomputed analysis library after a rebuild
+    (python -m app.services.analysis_library build).
+    """
+    if not analysis_library.enabled:
+        raise HTTPException(status_code=404, detail="Analysis library is disabled")
+    await asyncio.to_thread(analysis_library.load)
+    if analysis_library.status == "invalid":
+        raise HTTPException(status_code=400, detail=f"Could not load analysis library: {analysis_library.error}")
+    return analysis_library.stats()
+
+
+@router.post("/analytics/run", status_code=202)
+async def run_analytics():
+    """
+    Start a run of the aggregate analytics job in the background. Results
+    replace the previous run's when it finishes.
+    """
+    if not analytics_job.enabled:
+        raise HTTPException(status_code=404, detail="Analytics needs numpy installed")
+    if not analytics_job.start():
+        raise HTTPException(status_code=409, detail="An analytics run is already in progress")
+    return analytics_job.stats()
+
+
+@router.get("/analytics")
+async def weekly_analytics(
+    metric: Optional[str] = Query(None, pattern=f"^({'|'.join(analytics.METRICS)})$"),
+    weeks: int = Query(12, ge=1, le=520)
+):
+    """
+    Get anonymized weekly label frequencies from the last analytics run:
+    distortion and exercise-suggestion prevalence among analyses, theme and
+    emotion prevalence among categorizations and summaries. Weeks with too
+    few distinct users are left out.
+    """
+    rows, last_run = await asyncio.gather(
+        asyncio.to_thread(analytics.read_weekly, metric, weeks),
+        asyncio.to_thread(analytics.read_last_run)
+    )
+    return {"last_run": last_run, "rows": rows}
+
+
+@router.get("/analytics/cooccurrence")
+async def cooccurrence_analytics(
+    matrix: str = Query("theme_emotion", pattern=f"^({'|'.join(analytics.MATRICES)})$")
+):
+    """
+    Get a co-occurrence matrix from the last analytics run, as the number of
+    records carrying both labels. Cells under the minimum count are left out.
+    """
+    return await asyncio.to_thread(analytics.read_matrix, matrix)
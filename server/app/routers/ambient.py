@@ -0,0 +1,85 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+import asyncio
+import json
+
+from app.services.ambient import AmbientSession, ambient_metrics
+
+router = APIRouter()
+
+# Longest a single transcript chunk may be
+MAX_CHUNK_CHARS = 2000
+
+# Close code for a frame type the endpoint does not accept (binary)
+UNSUPPORTED_DATA = 1003
+
+
+class BinaryFrameError(Exception):
+    """Raised when the client sends a binary frame instead of JSON text."""
+
+
+async def receive_message(websocket: WebSocket):
+    """The next text frame parsed as JSON (ValueError if it is not JSON)."""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    if message.get("text") is None:
+        raise BinaryFrameError()
+    return json.loads(message["text"])
+
+
+@router.websocket("/ambient/stream")
+async def ambient_stream(websocket: WebSocket):
+    """
+    Stream live transcript chunks for ambient listening mode.
+
+    Client messages:
+    - {"type": "chunk", "text": "..."}: the next piece of transcript
+    - {"type": "end"}: flush remaining text, wait for results, then close
+
+    Server messages:
+    - {"type": "segment", "id", "text", "themes", "emotions", "key_phrase", "method": "keyword"}
+      as soon as a thought is segmented
+    - {"type": "categorized", "items": [...]} with model categorizations, in batches
+    - {"type": "error", "detail": "..."} for malformed messages
+    Binary frames close the connection with code 1003.
+    While a connection has too many model batches outstanding, its messages
+    are not read until one completes.
+    """
+    await websocket.accept()
+    session = AmbientSession(websocket.send_json)
+    ambient_metrics["connections"] += 1
+    ambient_metrics["active_connections"] += 1
+
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(receive_message(websocket), timeout=session.next_timeout())
+            except asyncio.TimeoutError:
+                await session.tick()
+                continue
+            except BinaryFrameError:
+                await websocket.close(code=UNSUPPORTED_DATA)
+                break
+            except ValueError:
+                await session.send({"type": "error", "detail": "Messages must be JSON"})
+                continue
+
+            message_type = message.get("type") if isinstance(message, dict) else None
+            if message_type == "chunk":
+                text = message.get("text")
+                if not isinstance(text, str) or len(text) > MAX_CHUNK_CHARS:
+                    await session.send({"type": "error", "detail": f"Chunk text must be a string of at most {MAX_CHUNK_CHARS} characters"})
+                    continue
+                await session.add_chunk(text)
+            elif message_type == "end":
+                await session.finish()
+                await session.send({"type": "done"})
+                await websocket.close()
+                break
+            else:
+                await session.send({"type": "error", "detail": f"Unknown message type '{message_type}'"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        session.cancel()
+        ambient_metrics["active_connections"] -= 1
@@ -1,22 +1,29 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Header, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr, Field
 from typing import Optional
 from datetime import datetime, timedelta
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+import asyncio
+import secrets
 import os
 
+from app.services.tokens import (
+    ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS, new_token_id, revocation_list,
+    store_refresh_token, rotate_refresh_token, revoke_family
+)
+
 router = APIRouter()
 security = HTTPBearer(auto_error=False)
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing context, created on first use (passlib/bcrypt are slow to import)
+_pwd_context = None
 
 # JWT Configuration
 SECRET_KEY = os.getenv("JWT_SECRET", "clearmind-dev-secret")
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_HOURS = 24 * 7  # 1 week
+
+# Operator token for /api/admin endpoints; admin access is disabled when unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
 
 # In-memory user store (replace with database in production)
 users_db = {}
@@ -36,9 +43,19 @@ class UserLogin(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
+    expires_in: int
+    refresh_token: str
     user: dict
 
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
+
+
 class UserResponse(BaseModel):
     id: str
     email: str
@@ -46,22 +63,49 @@ class UserResponse(BaseModel):
     created_at: str
 
 
+def get_pwd_context():
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
+
+def warm_up():
+    """Load the password hashing and JWT libraries ahead of the first request."""
+    get_pwd_context()
+    import jose.jwt  # noqa: F401
+
+
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 
 def create_access_token(data: dict) -> str:
+    from jose import jwt
+
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(hours=ACCESS_TOKEN_EXPIRE_HOURS)
-    to_encode.update({"exp": expire})
+    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode.update({"exp": expire, "jti": new_token_id(), "type": "access"})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
+def create_refresh_token(user_id: str, family: str, jti: str, expires_at: datetime) -> str:
+    from jose import jwt
+
+    return jwt.encode(
+        {"sub": user_id, "fam": family, "jti": jti, "exp": expires_at, "type": "refresh"},
+        SECRET_KEY, algorithm=ALGORITHM
+    )
+
+
 def decode_token(token: str) -> Optional[dict]:
+    from jose import JWTError, jwt
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
@@ -69,6 +113,30 @@ def decode_token(token: str) -> Optional[dict]:
         return None
 
 
+def decode_access_token(token: str) -> Optional[dict]:
+    """Decode a bearer token, rejecting refresh tokens and revoked sessions (no database access)."""
+    payload = decode_token(token)
+    if not payload or payload.get("type", "access") != "access":
+        return None
+    if revocation_list.is_revoked(payload):
+        return None
+    return payload
+
+
+async def issue_tokens(user_id: str, family: Optional[str] = None) -> dict:
+    """A new access/refresh token pair; starts a new session family unless one is given."""
+    family = family or new_token_id()
+    jti = new_token_id()
+    expires_at = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    await asyncio.to_thread(store_refresh_token, jti, family, user_id, expires_at)
+    return {
+        "access_token": create_access_token({"sub": user_id, "fam": family}),
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        "refresh_token": create_refresh_token(user_id, family, jti, expires_at),
+    }
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> Optional[dict]:
@@ -79,7 +147,7 @@ async def get_current_user(
     if not credentials:
         return None
 
-    payload = decode_token(credentials.credentials)
+    payload = decode_access_token(credentials.credentials)
     if not payload:
         return None
 
@@ -118,6 +186,25 @@ async def require_auth(
     return user
 
 
+async def require_admin(x_admin_token: Optional[str] = Header(None)) -> bool:
+    """
+    Dependency for operator-only endpoints.
+    Requires the X-Admin-Token header to match ADMIN_TOKEN.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access is not configured"
+        )
+
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid admin token"
+        )
+    return True
+
+
 @router.post("/register", response_model=Token)
 async def register(user_data: UserRegister):
     """
@@ -140,12 +227,8 @@ async def register(user_data: UserRegister):
         "created_at": datetime.utcnow().isoformat()
     }
 
-    # Generate token
-    access_token = create_access_token({"sub": user_id})
-
     return {
-        "access_token": access_token,
-        "token_type": "bearer",
+        **await issue_tokens(user_id),
         "user": {
             "id": user_id,
             "email": user_data.email,
@@ -174,12 +257,47 @@ async def login(credentials: UserLogin):
             detail="Invalid email or password"
         )
 
-    # Generate token
-    access_token = create_access_token({"sub": user_id})
+    return {
+        **await issue_tokens(user_id),
+        "user": {
+            "id": user_id,
+            "email": user["email"],
+            "name": user.get("name")
+        }
+    }
+
 
+@router.post("/refresh", response_model=Token)
+async def refresh(request: RefreshRequest):
+    """
+    Exchange a refresh token for a new access token and a new refresh token.
+    Each refresh token works once; presenting a used one again ends the
+    whole session, since it means the token was copied.
+    """
+    invalid = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or expired refresh token",
+        headers={"WWW-Authenticate": "Bearer"}
+    )
+    payload = decode_token(request.refresh_token)
+    if not payload or payload.get("type") != "refresh" or payload.get("sub") not in users_db:
+        raise invalid
+
+    jti = new_token_id()
+    expires_at = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    outcome, row = await asyncio.to_thread(rotate_refresh_token, payload["jti"], jti, expires_at)
+    if outcome == "reused":
+        await asyncio.to_thread(revoke_family, row["family"])
+    if outcome != "rotated":
+        raise invalid
+
+    user_id, family = row["user_id"], row["family"]
+    user = users_db[user_id]
     return {
-        "access_token": access_token,
+        "access_token": create_access_token({"sub": user_id, "fam": family}),
         "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        "refresh_token": create_refresh_token(user_id, family, jti, expires_at),
         "user": {
             "id": user_id,
             "email": user["email"],
@@ -188,6 +306,31 @@ async def login(credentials: UserLogin):
     }
 
 
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    request: Optional[LogoutRequest] = None,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    End the session of the given access token and/or refresh token. Its
+    access tokens stop working immediately and its refresh tokens can no
+    longer be used.
+    """
+    families = set()
+    for token in (credentials.credentials if credentials else None, request.refresh_token if request else None):
+        payload = decode_token(token) if token else None
+        if payload and payload.get("fam"):
+            families.add(payload["fam"])
+    if not families:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="No valid session token given",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    for family in families:
+        await asyncio.to_thread(revoke_family, family)
+
+
 @router.get("/me", response_model=UserResponse)
 async def get_me(user: dict = Depends(require_auth)):
     """
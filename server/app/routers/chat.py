@@ -1,6 +1,10 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import List, Dict, Optional
+import asyncio
+import os
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import AsyncIterator, Awaitable, Callable, List, Dict, Literal, Optional
 
 from app.services.chat_service import (
     get_chat_response,
@@ -8,24 +12,32 @@ from app.services.chat_service import (
     categorize_thought,
     analyze_cognitive_distortions,
     generate_action_plan,
-    create_reminder
+    create_reminder,
+    format_transcript
 )
+from app.services.snippet_dedup import snippet_deduplicator
+from app.services import history
+from app.services.request_context import get_caller_key
+from app.services.conversation import Turn, MAX_HISTORY_TURNS
+from app.services.tracing import span
+from app.responses import FastResponse, dumps_json
+from app.middleware.tracing import TracedRoute
 
-router = APIRouter()
-
+router = APIRouter(route_class=TracedRoute)
 
-class Message(BaseModel):
-    role: str  # "user" or "assistant"
-    content: str
+INSIGHT_PARTS = ("distortions", "action_plan", "reminder", "categorization")
+# Most parts of one /chat/insights request that run (call the model) at once
+INSIGHTS_CONCURRENCY = int(os.getenv("INSIGHTS_CONCURRENCY", "4"))
 
 
 class ChatRequest(BaseModel):
     message: str
-    conversation_history: List[Message] = []
+    # Turns are {"role": "user" | "assistant", "content": str}
+    conversation_history: List[Turn] = Field([], max_length=MAX_HISTORY_TURNS)
 
 
 class SummarizeRequest(BaseModel):
-    conversation_history: List[Message]
+    conversation_history: List[Turn] = Field(..., max_length=MAX_HISTORY_TURNS)
 
 
 class CategorizeRequest(BaseModel):
@@ -46,7 +58,15 @@ class ReminderRequest(BaseModel):
     note: Optional[str] = ""
 
 
-@router.post("/chat")
+class InsightsRequest(BaseModel):
+    thought: str
+    parts: List[Literal[INSIGHT_PARTS]] = Field(list(INSIGHT_PARTS), min_length=1)
+    # Used by the action_plan and reminder parts
+    context: Optional[str] = ""
+    note: Optional[str] = ""
+
+
+@router.post("/chat", response_class=FastResponse)
 async def chat(request: ChatRequest):
     """
     Send a message to the coaching bot and get a response.
@@ -55,18 +75,15 @@ async def chat(request: ChatRequest):
     if not request.message or not request.message.strip():
         raise HTTPException(status_code=400, detail="Message cannot be empty")
 
-    # Convert Pydantic models to dicts
-    history = [{"role": msg.role, "content": msg.content} for msg in request.conversation_history]
-
-    result = await get_chat_response(request.message, history)
+    result = await get_chat_response(request.message, request.conversation_history)
 
     if not result.get("success"):
         raise HTTPException(status_code=500, detail="Failed to generate response")
 
-    return result
+    return FastResponse(result)
 
 
-@router.post("/chat/summarize")
+@router.post("/chat/summarize", response_class=FastResponse)
 async def summarize(request: SummarizeRequest):
     """
     Generate a summary of the conversation session.
@@ -75,32 +92,37 @@ async def summarize(request: SummarizeRequest):
     if not request.conversation_history:
         raise HTTPException(status_code=400, detail="No conversation to summarize")
 
-    # Convert Pydantic models to dicts
-    history = [{"role": msg.role, "content": msg.content} for msg in request.conversation_history]
-
-    result = await summarize_session(history)
+    result = await summarize_session(request.conversation_history)
 
     if not result.get("success"):
         raise HTTPException(status_code=500, detail="Failed to generate summary")
 
+    await history.record("summary", format_transcript(request.conversation_history), result)
+    return FastResponse(result)
+
+
+async def categorize_and_store(thought: str) -> Dict:
+    result = await categorize_thought(thought)
+    await history.record("categorization", thought, result)
     return result
 
 
-@router.post("/chat/categorize")
+@router.post("/chat/categorize", response_class=FastResponse)
 async def categorize(request: CategorizeRequest):
     """
     Categorize a thought snippet into themes and emotions.
-    Used for ambient listening mode.
+    Used for ambient listening mode; repeated and growing partial transcripts
+    from the same caller are merged so only the settled snippet is categorized.
     """
     if not request.thought or len(request.thought.strip()) < 5:
         raise HTTPException(status_code=400, detail="Thought too short to categorize")
 
-    result = await categorize_thought(request.thought)
+    result = await snippet_deduplicator.categorize(get_caller_key(), request.thought, categorize_and_store)
 
-    return result
+    return FastResponse(result)
 
 
-@router.post("/chat/analyze-distortions")
+@router.post("/chat/analyze-distortions", response_class=FastResponse)
 async def analyze_distortions(request: AnalyzeDistortionsRequest):
     """
     Analyze a thought for cognitive distortions and provide reframes.
@@ -110,10 +132,10 @@ async def analyze_distortions(request: AnalyzeDistortionsRequest):
 
     result = await analyze_cognitive_distortions(request.thought)
 
-    return result
+    return FastResponse(result)
 
 
-@router.post("/chat/action-plan")
+@router.post("/chat/action-plan", response_class=FastResponse)
 async def action_plan(request: ActionPlanRequest):
     """
     Generate an action plan from a thought or concern.
@@ -123,10 +145,10 @@ async def action_plan(request: ActionPlanRequest):
 
     result = await generate_action_plan(request.thought, request.context or "")
 
-    return result
+    return FastResponse(result)
 
 
-@router.post("/chat/reminder")
+@router.post("/chat/reminder", response_class=FastResponse)
 async def reminder(request: ReminderRequest):
     """
     Generate a reminder suggestion for a thought.
@@ -136,4 +158,74 @@ async def reminder(request: ReminderRequest):
 
     result = await create_reminder(request.thought, request.note or "")
 
-    return result
+    return FastResponse(result)
+
+
+def insight_runners(request: InsightsRequest) -> Dict[str, Callable[[], Awaitable[Dict]]]:
+    thought = request.thought
+    runners = {
+        "distortions": lambda: analyze_cognitive_distortions(thought),
+        "action_plan": lambda: generate_action_plan(thought, request.context or ""),
+        "reminder": lambda: create_reminder(thought, request.note or ""),
+        "categorization": lambda: categorize_and_store(thought),
+    }
+    return {part: runners[part] for part in dict.fromkeys(request.parts)}
+
+
+async def run_insights(runners: Dict[str, Callable[[], Awaitable[Dict]]]) -> AsyncIterator[Dict]:
+    """
+    Run the parts concurrently, at most INSIGHTS_CONCURRENCY at a time, and
+    yield {"part", "result"} (or {"part", "error"}) as each one finishes.
+    Parts still running are cancelled if the consumer stops early.
+    """
+    semaphore = asyncio.Semaphore(INSIGHTS_CONCURRENCY)
+
+    async def run(part: str, runner: Callable[[], Awaitable[Dict]]) -> Dict:
+        async with semaphore:
+            with span(f"insights.{part}"):
+                try:
+                    return {"part": part, "result": await runner()}
+                except Exception as e:
+                    print(f"Insights {part} error: {e}")
+                    return {"part": part, "error": f"Failed to generate {part}"}
+
+    tasks = [asyncio.create_task(run(part, runner)) for part, runner in runners.items()]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def insight_lines(runners: Dict[str, Callable[[], Awaitable[Dict]]]) -> AsyncIterator[bytes]:
+    async for item in run_insights(runners):
+        yield dumps_json(item) + b"\n"
+    yield dumps_json({"done": True}) + b"\n"
+
+
+@router.post("/chat/insights")
+async def insights(request: InsightsRequest, stream: bool = Query(True)):
+    """
+    Run several thought analyses in one request: distortions, action_plan,
+    reminder and categorization (all by default, or those listed in
+    "parts"). The parts run concurrently. By default each result is streamed
+    as an NDJSON line {"part", "result"} as soon as it is ready, followed by
+    {"done": true}; with stream=false one object keyed by part is returned.
+    """
+    minimum = 10 if {"distortions", "action_plan"} & set(request.parts) else 5
+    if not request.thought or len(request.thought.strip()) < minimum:
+        raise HTTPException(status_code=400, detail="Thought too short for insights")
+
+    runners = insight_runners(request)
+    if stream:
+        return StreamingResponse(
+            insight_lines(runners),
+            media_type="application/x-ndjson",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    results = {}
+    async for item in run_insights(runners):
+        results[item["part"]] = item["result"] if "result" in item else {"error": item["error"]}
+    return FastResponse({part: results[part] for part in runners})
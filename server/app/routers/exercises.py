@@ -1,16 +1,8 @@
 from fastapi import APIRouter, HTTPException
-import json
-from pathlib import Path
 
-router = APIRouter()
-
-# Load exercises data
-data_dir = Path(__file__).parent.parent / "data"
-with open(data_dir / "exercises.json", "r") as f:
-    EXERCISES_DATA = json.load(f)
+from app.services.catalog import get_exercises_data, get_exercises, get_categories
 
-EXERCISES = {e["id"]: e for e in EXERCISES_DATA["exercises"]}
-CATEGORIES = {c["id"]: c for c in EXERCISES_DATA["categories"]}
+router = APIRouter()
 
 
 @router.get("/exercises")
@@ -22,7 +14,8 @@ async def list_exercises(category: str = None, distortion: str = None):
     - category: Filter by exercise category (e.g., 'cognitive_restructuring', 'mindfulness')
     - distortion: Filter by distortion the exercise helps with (e.g., 'all_or_nothing')
     """
-    exercises = EXERCISES_DATA["exercises"]
+    exercises_data = get_exercises_data()
+    exercises = exercises_data["exercises"]
 
     if category:
         exercises = [e for e in exercises if e.get("category") == category]
@@ -32,7 +25,7 @@ async def list_exercises(category: str = None, distortion: str = None):
 
     return {
         "exercises": exercises,
-        "categories": EXERCISES_DATA["categories"],
+        "categories": exercises_data["categories"],
         "total": len(exercises)
     }
 
@@ -42,14 +35,15 @@ async def get_exercise(exercise_id: str):
     """
     Get detailed information about a specific exercise.
     """
-    if exercise_id not in EXERCISES:
+    exercises = get_exercises()
+    if exercise_id not in exercises:
         raise HTTPException(
             status_code=404,
             detail=f"Exercise '{exercise_id}' not found"
         )
 
-    exercise = EXERCISES[exercise_id]
-    category = CATEGORIES.get(exercise.get("category"), {})
+    exercise = exercises[exercise_id]
+    category = get_categories().get(exercise.get("category"), {})
 
     return {
         "exercise": exercise,
@@ -62,8 +56,9 @@ async def get_exercises_for_distortion(distortion_id: str):
     """
     Get exercises recommended for a specific cognitive distortion.
     """
+    exercises = get_exercises_data()["exercises"]
     matching = [
-        e for e in EXERCISES_DATA["exercises"]
+        e for e in exercises
         if distortion_id in e.get("helpful_for", [])
     ]
 
@@ -71,7 +66,7 @@ async def get_exercises_for_distortion(distortion_id: str):
         return {
             "exercises": [],
             "message": f"No specific exercises found for '{distortion_id}'. Here are some general exercises.",
-            "fallback": EXERCISES_DATA["exercises"][:3]
+            "fallback": exercises[:3]
         }
 
     return {
@@ -87,5 +82,5 @@ async def list_categories():
     Get all exercise categories.
     """
     return {
-        "categories": EXERCISES_DATA["categories"]
+        "categories": get_exercises_data()["categories"]
     }
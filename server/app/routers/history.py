@@ -0,0 +1,72 @@
+import asyncio
+
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Dict, Optional
+from datetime import datetime
+
+from app.routers.auth import require_auth
+from app.services import history
+from app.services.search import search_history
+
+router = APIRouter()
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", history.ndjson_lines),
+    "csv": ("text/csv; charset=utf-8", history.csv_lines),
+}
+EXPORT_FORMAT_PATTERN = f"^({'|'.join(EXPORT_FORMATS)})$"
+KIND_PATTERN = f"^({'|'.join(history.HISTORY_KINDS)})$"
+
+
+def export_response(request: Request, rows: AsyncIterator[Dict], format: str, filename: str) -> StreamingResponse:
+    """Stream rows in the requested format, gzip-compressed when the client accepts it."""
+    media_type, encode = EXPORT_FORMATS[format]
+    body = encode(rows)
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}.{format}"',
+        "Vary": "Accept-Encoding",
+    }
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        body = history.gzipped(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+
+@router.get("/history/export")
+async def export_history(
+    request: Request,
+    format: str = Query("ndjson", pattern=EXPORT_FORMAT_PATTERN),
+    kind: Optional[str] = Query(None, pattern=KIND_PATTERN),
+    since: Optional[datetime] = None,
+    user: dict = Depends(require_auth)
+):
+    """
+    Export the current user's stored thought analyses and chat summaries,
+    oldest first, as NDJSON or CSV. The response is streamed page by page.
+    """
+    rows = history.iter_history(user_id=user["id"], kind=kind, since=since)
+    return export_response(request, rows, format, "clearmind-history")
+
+
+@router.get("/history/search")
+async def search(
+    q: str = Query("", max_length=200),
+    kind: Optional[str] = Query(None, pattern=KIND_PATTERN),
+    distortion: Optional[str] = None,
+    theme: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    user: dict = Depends(require_auth)
+):
+    """
+    Full-text search over the current user's past thoughts, snippet
+    categorizations and session summaries. Results are ranked by relevance
+    (newest first without a query) and can be filtered by kind, distortion
+    id, theme and date.
+    """
+    return await asyncio.to_thread(
+        search_history, user["id"], q, kind, distortion, theme, since, until, limit, offset
+    )
@@ -0,0 +1,104 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ValidationError
+from typing import Dict, Optional, Any
+
+from app.routers.auth import get_current_user
+from app.routers import chat
+from app.responses import response_content
+from app.services.jobs import job_queue, QueueFullError, RetryableJobError, JobFailedError
+
+router = APIRouter()
+
+# Job types, mapped to the request model and handler of the equivalent endpoint
+JOB_TYPES = {
+    "summarize": (chat.SummarizeRequest, chat.summarize),
+    "action_plan": (chat.ActionPlanRequest, chat.action_plan),
+    "reminder": (chat.ReminderRequest, chat.reminder),
+}
+
+# Longest a single poll request may wait for a job to finish
+MAX_WAIT_SECONDS = 30
+
+
+def make_handler(request_model, endpoint):
+    async def handler(payload: Dict[str, Any]) -> Dict:
+        try:
+            return response_content(await endpoint(request_model.model_validate(payload)))
+        except HTTPException as e:
+            if e.status_code >= 500:
+                raise RetryableJobError(e.detail)
+            raise JobFailedError(e.detail)
+    return handler
+
+
+for job_type, (request_model, endpoint) in JOB_TYPES.items():
+    job_queue.register(job_type, make_handler(request_model, endpoint))
+
+
+class JobRequest(BaseModel):
+    type: str
+    payload: Dict[str, Any]
+
+
+def serialize_job(job: Dict) -> Dict:
+    return {
+        "job_id": job["id"],
+        "type": job["type"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "result": job["result"],
+        "error": job["error"],
+        "created_at": job["created_at"].isoformat(),
+        "updated_at": job["updated_at"].isoformat(),
+    }
+
+
+@router.post("/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def submit_job(request: JobRequest, user: Optional[dict] = Depends(get_current_user)):
+    """
+    Queue a slow generation task (summarize, action_plan or reminder).
+    Returns a job id immediately; poll GET /api/jobs/{job_id} for the result.
+    """
+    if request.type not in JOB_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown job type '{request.type}'. Expected one of: {', '.join(JOB_TYPES)}"
+        )
+
+    # Reject invalid payloads now rather than failing in the worker
+    request_model, _ = JOB_TYPES[request.type]
+    try:
+        request_model.model_validate(request.payload)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+
+    try:
+        job = await job_queue.submit(request.type, request.payload, user["id"] if user else None)
+    except QueueFullError:
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Job queue is full, please retry shortly"},
+            headers={"Retry-After": "5"}
+        )
+
+    return serialize_job(job)
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=MAX_WAIT_SECONDS, description="Seconds to wait for the job to finish"),
+    user: Optional[dict] = Depends(get_current_user)
+):
+    """
+    Get a job's status and result.
+    Pass `wait` to long-poll until the job finishes or the wait elapses.
+    """
+    job = await job_queue.wait_for(job_id, wait)
+
+    # Jobs submitted by a signed-in user are only visible to that user
+    if not job or (job["user_id"] and (not user or user["id"] != job["user_id"])):
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+
+    return serialize_job(job)
@@ -0,0 +1,131 @@
+import json
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from app.routers.auth import require_auth
+from app.services.chat_service import create_reminder
+from app.services.reminders import reminder_scheduler, parse_suggested_time, DEFAULT_SUGGESTED_TIME
+
+router = APIRouter()
+
+# Longest a single long-poll request may wait for a reminder to fall due
+MAX_WAIT_SECONDS = 60
+# SSE comment sent when nothing happened, so proxies keep the connection open
+SSE_KEEPALIVE_SECONDS = 15
+
+STATUS_PATTERN = "^(pending|due|delivered|cancelled)$"
+
+
+class ScheduleReminderRequest(BaseModel):
+    thought: str = Field(..., min_length=5, max_length=2000)
+    note: Optional[str] = ""
+    # When to remind, e.g. "tomorrow morning" or "in 3 days"; suggested by the model when omitted
+    when: Optional[str] = Field(None, max_length=64)
+    # Exact UTC time; takes precedence over `when`
+    due_at: Optional[datetime] = None
+    # The client's offset from UTC in minutes, so "morning" means the user's morning
+    tz_offset_minutes: int = Field(0, ge=-14 * 60, le=14 * 60)
+
+
+class AcknowledgeRequest(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=500)
+
+
+def require_scheduler():
+    if not reminder_scheduler.enabled:
+        raise HTTPException(status_code=404, detail="Reminder scheduling is disabled")
+
+
+@router.post("/reminders", status_code=201, dependencies=[Depends(require_scheduler)])
+async def schedule_reminder(request: ScheduleReminderRequest, user: dict = Depends(require_auth)):
+    """
+    Generate a reminder for a thought and schedule it. The suggested time is
+    parsed into a timestamp; unparseable times fall back to tomorrow morning.
+    Due reminders are delivered via GET /api/reminders/due or the SSE stream.
+    """
+    suggestion = await create_reminder(request.thought, request.note or "")
+    now = datetime.utcnow()
+
+    due_at = request.due_at
+    if due_at is not None:
+        suggested_time = request.when
+        if due_at.tzinfo is not None:
+            due_at = (due_at - due_at.utcoffset()).replace(tzinfo=None)
+    else:
+        suggested_time = request.when or suggestion["suggested_time"]
+        due_at = (parse_suggested_time(suggested_time, now, request.tz_offset_minutes)
+                  or parse_suggested_time(DEFAULT_SUGGESTED_TIME, now, request.tz_offset_minutes))
+    if due_at > now + timedelta(days=366):
+        raise HTTPException(status_code=400, detail="Reminders can be scheduled at most a year ahead")
+
+    return await reminder_scheduler.create(
+        user["id"], suggestion["reminder_text"], suggestion["category"], suggested_time, due_at
+    )
+
+
+@router.get("/reminders", dependencies=[Depends(require_scheduler)])
+async def list_reminders(
+    status: str = Query("pending", pattern=STATUS_PATTERN),
+    after_id: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
+    user: dict = Depends(require_auth)
+):
+    """List the current user's reminders with a status, oldest first; page with after_id."""
+    return {"reminders": await reminder_scheduler.list_reminders(user["id"], status, after_id, limit)}
+
+
+@router.get("/reminders/due", dependencies=[Depends(require_scheduler)])
+async def due_reminders(
+    wait: float = Query(0, ge=0, le=MAX_WAIT_SECONDS, description="Seconds to wait for a reminder to fall due"),
+    user: dict = Depends(require_auth)
+):
+    """
+    Reminders that are due and not yet acknowledged. Pass `wait` to long-poll
+    until one falls due. Acknowledge them with POST /api/reminders/ack.
+    """
+    return {"reminders": await reminder_scheduler.due(user["id"], wait)}
+
+
+@router.post("/reminders/ack", dependencies=[Depends(require_scheduler)])
+async def acknowledge_reminders(request: AcknowledgeRequest, user: dict = Depends(require_auth)):
+    """Mark due reminders as delivered so they are not returned again."""
+    return {"acknowledged": await reminder_scheduler.acknowledge(user["id"], request.ids)}
+
+
+@router.delete("/reminders/{reminder_id}", dependencies=[Depends(require_scheduler)])
+async def cancel_reminder(reminder_id: int, user: dict = Depends(require_auth)):
+    """Cancel a pending or due reminder."""
+    if not await reminder_scheduler.cancel(user["id"], reminder_id):
+        raise HTTPException(status_code=404, detail=f"Reminder {reminder_id} not found")
+    return {"cancelled": reminder_id}
+
+
+async def reminder_events(request: Request, user_id: str) -> AsyncIterator[str]:
+    # Reminders fall due out of id order, so the stream remembers what it sent
+    sent = set()
+    while not await request.is_disconnected():
+        reminders = await reminder_scheduler.due(user_id, SSE_KEEPALIVE_SECONDS, exclude=sent)
+        if not reminders:
+            yield ": keepalive\n\n"
+            continue
+        for reminder in reminders:
+            sent.add(reminder["id"])
+            yield f"id: {reminder['id']}\nevent: reminder\ndata: {json.dumps(reminder)}\n\n"
+
+
+@router.get("/reminders/stream", dependencies=[Depends(require_scheduler)])
+async def stream_reminders(request: Request, user: dict = Depends(require_auth)):
+    """
+    Server-sent events: one "reminder" event per due reminder, starting with
+    those already due. Unacknowledged reminders are sent again after a
+    reconnect; acknowledge them with POST /api/reminders/ack.
+    """
+    return StreamingResponse(
+        reminder_events(request, user["id"]),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
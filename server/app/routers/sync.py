@@ -0,0 +1,146 @@
+from fastapi import APIRouter, HTTPException, Depends
+from pydantic import BaseModel, Field, ValidationError
+from typing import List, Dict, Optional, Any
+from collections import OrderedDict
+import asyncio
+import os
+
+from app.routers.auth import get_current_user
+from app.routers import thoughts, chat
+from app.responses import response_content
+
+router = APIRouter()
+
+# Maximum number of queued operations that are replayed at the same time
+SYNC_CONCURRENCY = int(os.getenv("SYNC_CONCURRENCY", "8"))
+MAX_SYNC_ITEMS = 200
+
+# Recently completed operations of signed-in users, so a batch that is re-sent
+# after a dropped response does not run the same model calls twice
+RECENT_RESULTS_LIMIT = 2000
+recent_results: "OrderedDict[str, Dict]" = OrderedDict()
+# Operations being run, so a concurrent batch with the same key waits for them
+in_flight: Dict[str, asyncio.Task] = {}
+
+# Endpoints the offline queue may replay, mapped to their request model and handler
+SYNC_HANDLERS = {
+    "/api/analyze": (thoughts.ThoughtInput, thoughts.analyze_thought),
+    "/api/chat": (chat.ChatRequest, chat.chat),
+    "/api/chat/summarize": (chat.SummarizeRequest, chat.summarize),
+    "/api/chat/categorize": (chat.CategorizeRequest, chat.categorize),
+    "/api/chat/analyze-distortions": (chat.AnalyzeDistortionsRequest, chat.analyze_distortions),
+    "/api/chat/action-plan": (chat.ActionPlanRequest, chat.action_plan),
+    "/api/chat/reminder": (chat.ReminderRequest, chat.reminder),
+}
+
+
+class SyncItem(BaseModel):
+    """A single operation from the client's offline queue."""
+    idempotency_key: str = Field(..., min_length=1, max_length=128)
+    endpoint: str
+    method: str = "POST"
+    data: Dict[str, Any] = {}
+
+
+class SyncRequest(BaseModel):
+    items: List[SyncItem] = Field(..., max_length=MAX_SYNC_ITEMS)
+
+
+def remember_result(key: str, result: Dict):
+    recent_results[key] = result
+    recent_results.move_to_end(key)
+    while len(recent_results) > RECENT_RESULTS_LIMIT:
+        recent_results.popitem(last=False)
+
+
+def _finish_in_flight(key: str, task: asyncio.Task):
+    in_flight.pop(key, None)
+    if not task.cancelled() and task.exception() is None and task.result()["status"] < 500:
+        remember_result(key, task.result())
+
+
+async def run_sync_item(item: SyncItem) -> Dict:
+    """Validate and dispatch one queued operation, returning its per-item result."""
+    handler = SYNC_HANDLERS.get(item.endpoint)
+    if handler is None or item.method.upper() != "POST":
+        return {
+            "status": 404,
+            "detail": f"Endpoint '{item.method} {item.endpoint}' cannot be synced"
+        }
+
+    request_model, endpoint = handler
+    try:
+        payload = request_model.model_validate(item.data)
+    except ValidationError as e:
+        return {"status": 422, "detail": e.errors(include_url=False, include_context=False)}
+
+    try:
+        result = response_content(await endpoint(payload))
+    except HTTPException as e:
+        return {"status": e.status_code, "detail": e.detail}
+    except Exception as e:
+        print(f"Sync item error: {e}")
+        return {"status": 500, "detail": "Failed to process item"}
+
+    return {"status": 200, "result": result}
+
+
+@router.post("/sync")
+async def sync(request: SyncRequest, user: Optional[dict] = Depends(get_current_user)):
+    """
+    Replay a batch of queued offline operations in a single request.
+
+    Each item carries a client idempotency key; items are dispatched
+    concurrently and a result is returned for every item in order.
+    For signed-in users, re-sending a key that was already processed returns
+    the stored result, and a key still being processed by another batch
+    waits for that run. Results of anonymous callers are not kept, since
+    there is nothing to tell their keys apart.
+    """
+    semaphore = asyncio.Semaphore(SYNC_CONCURRENCY)
+    pending: Dict[str, asyncio.Task] = {}
+
+    async def run_limited(item: SyncItem) -> Dict:
+        async with semaphore:
+            return await run_sync_item(item)
+
+    async def process(item: SyncItem) -> Dict:
+        if user is None:
+            return await run_limited(item)
+
+        cache_key = f"{user['id']}:{item.idempotency_key}"
+        if cache_key in recent_results:
+            return {**recent_results[cache_key], "replayed": True}
+
+        task = in_flight.get(cache_key)
+        if task is not None:
+            return {**await asyncio.shield(task), "replayed": True}
+
+        task = asyncio.ensure_future(run_limited(item))
+        in_flight[cache_key] = task
+        task.add_done_callback(lambda done: _finish_in_flight(cache_key, done))
+        return await asyncio.shield(task)
+
+    # Duplicate keys within one batch share a single execution
+    for item in request.items:
+        if item.idempotency_key not in pending:
+            pending[item.idempotency_key] = asyncio.ensure_future(process(item))
+
+    await asyncio.gather(*pending.values())
+
+    results = []
+    for item in request.items:
+        outcome = pending[item.idempotency_key].result()
+        results.append({
+            "idempotency_key": item.idempotency_key,
+            "ok": outcome["status"] == 200,
+            **outcome
+        })
+
+    succeeded = sum(1 for r in results if r["ok"])
+    return {
+        "results": results,
+        "total": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded
+    }
@@ -2,8 +2,12 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
 from typing import Optional
 from app.services.ai_analyzer import analyze_thought_with_ai
+from app.services.catalog import get_distortions_data
+from app.services import history
+from app.responses import FastResponse
+from app.middleware.tracing import TracedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
 
 
 class ThoughtInput(BaseModel):
@@ -27,7 +31,8 @@ class AnalysisResponse(BaseModel):
     analysis_method: str
 
 
-@router.post("/analyze", response_model=AnalysisResponse)
+# The service already returns this shape, so it is documented rather than re-validated
+@router.post("/analyze", response_class=FastResponse, responses={200: {"model": AnalysisResponse}})
 async def analyze_thought(input_data: ThoughtInput):
     """
     Analyze a thought for cognitive distortions and provide reframes.
@@ -39,7 +44,8 @@ async def analyze_thought(input_data: ThoughtInput):
     """
     try:
         result = await analyze_thought_with_ai(input_data.thought)
-        return result
+        await history.record("analysis", input_data.thought, result)
+        return FastResponse(result)
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -52,12 +58,7 @@ async def list_distortions():
     """
     Get a list of all cognitive distortions with descriptions.
     """
-    import json
-    from pathlib import Path
-
-    data_dir = Path(__file__).parent.parent / "data"
-    with open(data_dir / "distortions.json", "r") as f:
-        data = json.load(f)
+    data = get_distortions_data()
 
     return {
         "distortions": [
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends
+
+from app.routers.auth import require_auth
+from app.services.usage import usage_meter
+
+router = APIRouter()
+
+
+@router.get("/usage/me")
+async def my_usage(user: dict = Depends(require_auth)):
+    """
+    Get today's model token usage and remaining daily quota for the current user,
+    with per-endpoint totals for the last 30 days.
+    """
+    user_key = f"user:{user['id']}"
+    return {
+        "today": usage_meter.caller_usage(user_key),
+        "last_30_days": await usage_meter.report(30, "endpoint", user_key)
+    }
@@ -1,36 +1,47 @@
-import os
+import asyncio
 import json
-from anthropic import Anthropic
-from pathlib import Path
-
-# Load distortions data
-data_dir = Path(__file__).parent.parent / "data"
-with open(data_dir / "distortions.json", "r") as f:
-    DISTORTIONS_DATA = json.load(f)
-
-DISTORTIONS = {d["id"]: d for d in DISTORTIONS_DATA["distortions"]}
-
-
-def get_anthropic_client():
-    """Get Anthropic client, returns None if API key not configured."""
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    if not api_key or api_key == "your_api_key_here":
-        return None
-    return Anthropic(api_key=api_key)
-
-
-def create_analysis_prompt(thought: str) -> str:
+from typing import Dict, List, Optional
+
+from app.services.catalog import get_distortions_data, get_distortions
+from app.services.llm import get_anthropic_client, create_message, unavailable_reason
+from app.services.model_routing import select_route
+from app.services.similarity_cache import SimilarityCache
+from app.services.tracing import traced, set_attribute, record_fallback
+from app.services.request_context import get_user_id
+from app.services.thought_index import thought_index, related_analyses, THOUGHT_REUSE_SIMILARITY
+from app.services.analysis_library import analysis_library
+
+# Reuses AI analyses for near-duplicate thoughts
+analysis_cache = SimilarityCache("analyze_thought")
+
+
+def format_related(related: List[Dict]) -> str:
+    """Describe the user's similar past thoughts and the reframes offered then."""
+    lines = []
+    for item in related:
+        lines.append(f'- "{item["thought"]}"')
+        for reframe in item["result"].get("reframes", [])[:2]:
+            lines.append(f"    Reframe offered: {reframe.get('perspective', '')}")
+    return f"""
+THIS PERSON HAS HAD SIMILAR THOUGHTS BEFORE:
+{chr(10).join(lines)}
+Acknowledge the recurring pattern where it helps, build on the earlier reframes and avoid repeating them word for word.
+"""
+
+
+def create_analysis_prompt(thought: str, related: Optional[List[Dict]] = None) -> str:
     """Create the prompt for analyzing a thought."""
     distortions_list = "\n".join([
         f"- {d['id']}: {d['name']} - {d['description']}"
-        for d in DISTORTIONS_DATA["distortions"]
+        for d in get_distortions_data()["distortions"]
     ])
+    related_section = format_related(related) if related else ""
 
     return f"""You are a compassionate cognitive behavioral therapy (CBT) assistant. Analyze the following thought and identify any cognitive distortions present.
 
 THOUGHT TO ANALYZE:
 "{thought}"
-
+{related_section}
 COGNITIVE DISTORTIONS TO CHECK FOR:
 {distortions_list}
 
@@ -63,25 +74,71 @@ Guidelines:
 Respond ONLY with valid JSON, no additional text."""
 
 
+def summarize_related(related: List[Dict]) -> List[Dict]:
+    return [
+        {
+            "id": item["id"],
+            "thought": item["thought"],
+            "similarity": item["similarity"],
+            "reframes": item["result"].get("reframes", []),
+        }
+        for item in related
+    ]
+
+
+@traced("analyzer.analyze_thought_with_ai")
 async def analyze_thought_with_ai(thought: str) -> dict:
     """
     Analyze a thought using Claude API to identify cognitive distortions
     and generate reframes.
     """
+    # Precomputed analyses need neither the model nor an API key
+    precomputed = analysis_library.get(thought)
+    set_attribute("library_hit", precomputed is not None)
+    if precomputed is not None:
+        return {**precomputed, "original_thought": thought}
+
     client = get_anthropic_client()
+    route = select_route("analyze", thought)
 
-    if client is None:
+    if client is None or route is None:
         # Fallback to rule-based analysis if no API key
+        record_fallback(unavailable_reason(client, route))
         return analyze_thought_rule_based(thought)
 
+    user_id = get_user_id()
+    cached = analysis_cache.get(thought, user_id)
+    set_attribute("cache_hit", cached is not None)
+    if cached is not None:
+        analysis, similarity = cached
+        set_attribute("cache_similarity", similarity)
+        return {**analysis, "original_thought": thought}
+
+    # The signed-in user's own similar past analyses
+    related = []
+    if user_id is not None and thought_index.enabled:
+        try:
+            related = await asyncio.to_thread(related_analyses, user_id, thought)
+        except Exception as e:
+            print(f"Thought index error: {e}")
+    set_attribute("related_thoughts", len(related))
+
+    if related and related[0]["similarity"] >= THOUGHT_REUSE_SIMILARITY \
+            and related[0]["result"].get("analysis_method") == "ai":
+        thought_index.count("reused")
+        set_attribute("reused_history_id", related[0]["id"])
+        return {**related[0]["result"], "original_thought": thought, "related_thoughts": summarize_related(related)}
+    if related:
+        thought_index.count("context_matches")
+
     try:
-        message = client.messages.create(
-            model="claude-3-haiku-20240307",
-            max_tokens=1024,
+        message = await create_message(
+            client,
+            route,
             messages=[
                 {
                     "role": "user",
-                    "content": create_analysis_prompt(thought)
+                    "content": create_analysis_prompt(thought, related)
                 }
             ]
         )
@@ -90,17 +147,18 @@ async def analyze_thought_with_ai(thought: str) -> dict:
         result = json.loads(response_text)
 
         # Enrich with full distortion data
+        distortions = get_distortions()
         enriched_distortions = []
         for d in result.get("identified_distortions", []):
             distortion_id = d.get("distortion_id")
-            if distortion_id in DISTORTIONS:
+            if distortion_id in distortions:
                 enriched_distortions.append({
-                    **DISTORTIONS[distortion_id],
+                    **distortions[distortion_id],
                     "confidence": d.get("confidence", 0.7),
                     "specific_explanation": d.get("explanation", "")
                 })
 
-        return {
+        analysis = {
             "success": True,
             "original_thought": thought,
             "identified_distortions": enriched_distortions,
@@ -109,15 +167,24 @@ async def analyze_thought_with_ai(thought: str) -> dict:
             "suggested_exercises": result.get("suggested_exercises", []),
             "analysis_method": "ai"
         }
-
-    except json.JSONDecodeError:
+        if related:
+            # Built from this user's history, so not shared through the cache
+            analysis["related_thoughts"] = summarize_related(related)
+        else:
+            analysis_cache.put(thought, analysis, user_id)
+        return analysis
+
+    except json.JSONDecodeError as e:
         # If AI response isn't valid JSON, fall back to rule-based
+        record_fallback("invalid_json", e)
         return analyze_thought_rule_based(thought)
     except Exception as e:
         print(f"AI analysis error: {e}")
+        record_fallback("upstream_error", e)
         return analyze_thought_rule_based(thought)
 
 
+@traced("analyzer.analyze_thought_rule_based")
 def analyze_thought_rule_based(thought: str) -> dict:
     """
     Fallback rule-based analysis using keyword matching.
@@ -126,7 +193,7 @@ def analyze_thought_rule_based(thought: str) -> dict:
     thought_lower = thought.lower()
     identified = []
 
-    for distortion in DISTORTIONS_DATA["distortions"]:
+    for distortion in get_distortions_data()["distortions"]:
         for keyword in distortion.get("keywords", []):
             if keyword.lower() in thought_lower:
                 identified.append({
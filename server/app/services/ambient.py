@@ -0,0 +1,196 @@
+import asyncio
+import os
+import re
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.services.chat_service import get_fallback_categorization, categorize_thoughts_batch
+
+# Silence after which buffered transcript is treated as a complete thought
+AMBIENT_PAUSE_SECONDS = float(os.getenv("AMBIENT_PAUSE_SECONDS", "1.5"))
+# Segments are sent to the model in batches of this size, or after this long
+AMBIENT_BATCH_SIZE = int(os.getenv("AMBIENT_BATCH_SIZE", "5"))
+AMBIENT_BATCH_SECONDS = float(os.getenv("AMBIENT_BATCH_SECONDS", "8"))
+# Model calls one connection may have in flight; further batches wait their turn
+AMBIENT_MAX_CONCURRENT_BATCHES = int(os.getenv("AMBIENT_MAX_CONCURRENT_BATCHES", "2"))
+# Batches one connection may have waiting for a slot; beyond that the
+# connection stops reading transcript until a batch finishes
+AMBIENT_MAX_QUEUED_BATCHES = int(os.getenv("AMBIENT_MAX_QUEUED_BATCHES", "2"))
+
+# Shorter segments ("Um.", "Okay.") are carried into the next one
+MIN_SEGMENT_CHARS = 12
+# Run-on speech without punctuation or pauses is cut at a word boundary
+MAX_SEGMENT_CHARS = 400
+
+SENTENCE_END = re.compile(r"[.!?]+(?:\s+|$)")
+
+ambient_metrics = {
+    "connections": 0,
+    "active_connections": 0,
+    "chunks": 0,
+    "segments": 0,
+    "batches": 0,
+    "batched_segments": 0,
+    "batches_queued": 0,
+    "backpressure_waits": 0,
+}
+
+
+class TranscriptSegmenter:
+    """Splits a live transcript into thoughts on sentence punctuation and pauses."""
+
+    def __init__(self, pause_seconds: float = AMBIENT_PAUSE_SECONDS,
+                 min_chars: int = MIN_SEGMENT_CHARS, max_chars: int = MAX_SEGMENT_CHARS):
+        self.pause_seconds = pause_seconds
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self.buffer = ""
+        self.last_chunk_at: Optional[float] = None
+
+    def add(self, text: str, now: float) -> List[str]:
+        """Append a transcript chunk and return any segments it completes."""
+        text = text.strip()
+        if not text:
+            return []
+        self.buffer = f"{self.buffer} {text}" if self.buffer else text
+        self.last_chunk_at = now
+
+        segments = []
+        start = 0
+        for match in SENTENCE_END.finditer(self.buffer):
+            candidate = self.buffer[start:match.end()].strip()
+            if len(candidate) >= self.min_chars:
+                segments.append(candidate)
+                start = match.end()
+        self.buffer = self.buffer[start:].strip()
+
+        while len(self.buffer) > self.max_chars:
+            cut = self.buffer.rfind(" ", 0, self.max_chars)
+            cut = cut if cut > 0 else self.max_chars
+            segments.append(self.buffer[:cut].strip())
+            self.buffer = self.buffer[cut:].strip()
+
+        return segments
+
+    def seconds_until_pause(self, now: float) -> Optional[float]:
+        if not self.buffer or self.last_chunk_at is None:
+            return None
+        return max(0.0, self.last_chunk_at + self.pause_seconds - now)
+
+    def flush(self) -> Optional[str]:
+        """Return whatever is buffered as a final segment, if it is long enough."""
+        segment, self.buffer = self.buffer.strip(), ""
+        return segment if len(segment) >= self.min_chars else None
+
+
+class AmbientSession:
+    """
+    State for one ambient streaming connection: segments the transcript,
+    answers each segment at once with keyword categorization and pushes
+    batched model categorizations as they complete. At most
+    AMBIENT_MAX_CONCURRENT_BATCHES + AMBIENT_MAX_QUEUED_BATCHES batches exist
+    at a time; starting another waits, which stops the receive loop reading.
+    """
+
+    def __init__(self, send: Callable[[Dict], Awaitable[None]]):
+        self._send = send
+        self.send_lock = asyncio.Lock()
+        self.segmenter = TranscriptSegmenter()
+        self.next_segment_id = 0
+        self.pending: List[Dict] = []
+        self.pending_since: Optional[float] = None
+        self.batch_tasks = set()
+        self.batch_slots = asyncio.Semaphore(AMBIENT_MAX_CONCURRENT_BATCHES)
+        self.max_batches = AMBIENT_MAX_CONCURRENT_BATCHES + AMBIENT_MAX_QUEUED_BATCHES
+
+    async def send(self, message: Dict):
+        async with self.send_lock:
+            await self._send(message)
+
+    def next_timeout(self) -> Optional[float]:
+        """Seconds until the next pause or batch deadline, for the receive loop."""
+        now = time.monotonic()
+        deadlines = []
+        pause = self.segmenter.seconds_until_pause(now)
+        if pause is not None:
+            deadlines.append(pause)
+        if self.pending_since is not None:
+            deadlines.append(max(0.0, self.pending_since + AMBIENT_BATCH_SECONDS - now))
+        return min(deadlines) if deadlines else None
+
+    async def add_chunk(self, text: str):
+        ambient_metrics["chunks"] += 1
+        for segment in self.segmenter.add(text, time.monotonic()):
+            await self.add_segment(segment)
+
+    async def add_segment(self, text: str):
+        segment_id = self.next_segment_id
+        self.next_segment_id += 1
+        ambient_metrics["segments"] += 1
+
+        await self.send({
+            "type": "segment",
+            "id": segment_id,
+            "text": text,
+            "method": "keyword",
+            **get_fallback_categorization(text)
+        })
+
+        self.pending.append({"id": segment_id, "text": text})
+        if self.pending_since is None:
+            self.pending_since = time.monotonic()
+        if len(self.pending) >= AMBIENT_BATCH_SIZE:
+            await self.start_batch()
+
+    async def tick(self):
+        """Handle pause and batch deadlines when no chunk has arrived."""
+        now = time.monotonic()
+        pause = self.segmenter.seconds_until_pause(now)
+        if pause is not None and pause <= 0:
+            segment = self.segmenter.flush()
+            if segment:
+                await self.add_segment(segment)
+        if self.pending_since is not None and now - self.pending_since >= AMBIENT_BATCH_SECONDS:
+            await self.start_batch()
+
+    async def start_batch(self):
+        if not self.pending:
+            return
+        batch, self.pending, self.pending_since = self.pending, [], None
+        running = [task for task in self.batch_tasks if not task.done()]
+        if len(running) >= self.max_batches:
+            ambient_metrics["backpressure_waits"] += 1
+            while len(running) >= self.max_batches:
+                await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                running = [task for task in running if not task.done()]
+        task = asyncio.create_task(self.categorize_batch(batch))
+        self.batch_tasks.add(task)
+        task.add_done_callback(self.batch_tasks.discard)
+
+    async def categorize_batch(self, batch: List[Dict]):
+        if self.batch_slots.locked():
+            ambient_metrics["batches_queued"] += 1
+        async with self.batch_slots:
+            ambient_metrics["batches"] += 1
+            ambient_metrics["batched_segments"] += len(batch)
+            results = await categorize_thoughts_batch([item["text"] for item in batch])
+        await self.send({
+            "type": "categorized",
+            "items": [
+                {"id": item["id"], **result}
+                for item, result in zip(batch, results)
+            ]
+        })
+
+    async def finish(self):
+        """Flush everything buffered and wait for outstanding batches."""
+        segment = self.segmenter.flush()
+        if segment:
+            await self.add_segment(segment)
+        await self.start_batch()
+        if self.batch_tasks:
+            await asyncio.gather(*self.batch_tasks, return_exceptions=True)
+
+    def cancel(self):
+        for task in list(self.batch_tasks):
+            task.cancel()
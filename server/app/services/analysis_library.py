@@ -0,0 +1,315 @@
+"""
+Precomputed analyses for a stable corpus of thoughts (the distortion
+catalog examples, frequent production inputs and an optional corpus file),
+served by exact lookup on the normalized text instead of a model call.
+
+Build or rebuild the library (from the server directory):
+    python -m app.services.analysis_library build [--corpus thoughts.txt] [--top-history 500]
+Show what an existing library contains:
+    python -m app.services.analysis_library info
+
+Library file layout (little-endian):
+    header   "CMAL", format version (u32), metadata length (u32), entry count (u32)
+    metadata JSON: catalog digest, build time, sources
+    index    entry count x (key u64, data offset u32, data length u32), sorted by key
+    data     zlib-compressed JSON records {"input": normalized text, "analysis": {...}}
+The file is memory-mapped and searched in place, so loading it only checks
+the index bounds and its pages are shared between worker processes.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from app.services.catalog import data_dir
+from app.services.similarity_cache import normalize
+
+ANALYSIS_LIBRARY_ENABLED = os.getenv("ANALYSIS_LIBRARY_ENABLED", "true").lower() in ("1", "true", "yes")
+ANALYSIS_LIBRARY_FILE = os.getenv("ANALYSIS_LIBRARY_FILE", "./analysis_library.bin")
+
+MAGIC = b"CMAL"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sIII")
+INDEX_ENTRY = struct.Struct("<QII")
+
+
+def library_key(normalized: str) -> int:
+    return int.from_bytes(hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def catalog_digest() -> str:
+    """
+    Digest of everything a stored analysis depends on: the distortion and
+    exercise catalogs and the analysis prompt. A library built against a
+    different digest is stale and is not served.
+    """
+    from app.services.ai_analyzer import create_analysis_prompt
+
+    digest = hashlib.sha1()
+    for name in ("distortions.json", "exercises.json"):
+        digest.update((data_dir / name).read_bytes())
+    digest.update(create_analysis_prompt("{thought}").encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class LibraryFile:
+    """A loaded, memory-mapped library file."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, meta_length, self.count = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} analysis library")
+        self.meta = json.loads(self.buffer[HEADER.size:HEADER.size + meta_length])
+        self.index_offset = HEADER.size + meta_length
+        self.data_offset = self.index_offset + self.count * INDEX_ENTRY.size
+        self.size = len(self.buffer)
+        if self.data_offset > self.size:
+            raise ValueError(f"{path} is truncated")
+        # One pass over the index so a truncated data section fails here, not in a lookup
+        data_end = max((offset + length for _, offset, length
+                        in INDEX_ENTRY.iter_unpack(self.buffer[self.index_offset:self.data_offset])), default=0)
+        if self.data_offset + data_end > self.size:
+            raise ValueError(f"{path} is truncated")
+
+    def get(self, normalized: str) -> Optional[Dict]:
+        """Binary search of the sorted key index, then decode the one matching record."""
+        key = library_key(normalized)
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if struct.unpack_from("<Q", self.buffer, self.index_offset + middle * INDEX_ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        # Equal keys are adjacent; the stored text rules out hash collisions
+        while low < self.count:
+            entry_key, offset, length = INDEX_ENTRY.unpack_from(self.buffer, self.index_offset + low * INDEX_ENTRY.size)
+            if entry_key != key:
+                return None
+            start = self.data_offset + offset
+            record = json.loads(zlib.decompress(self.buffer[start:start + length]))
+            if record["input"] == normalized:
+                return record["analysis"]
+            low += 1
+        return None
+
+
+def write_library(path: str, analyses: Dict[str, Dict], meta: Dict):
+    """Write normalized text -> analysis pairs as a library file, replacing `path` atomically."""
+    entries = []
+    data = bytearray()
+    for normalized, analysis in analyses.items():
+        record = zlib.compress(json.dumps({"input": normalized, "analysis": analysis},
+                                          ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 9)
+        entries.append((library_key(normalized), len(data), len(record)))
+        data += record
+    entries.sort()
+
+    meta_bytes = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(meta_bytes), len(entries)))
+        f.write(meta_bytes)
+        for entry in entries:
+            f.write(INDEX_ENTRY.pack(*entry))
+        f.write(data)
+    os.replace(temporary, path)
+
+
+class AnalysisLibrary:
+    """Serves analyses from the library file; loaded during warm-up and on admin reload."""
+
+    def __init__(self, path: str = ANALYSIS_LIBRARY_FILE, enabled: bool = ANALYSIS_LIBRARY_ENABLED):
+        self.path = path
+        self.enabled = enabled
+        self.file: Optional[LibraryFile] = None
+        self.status = "not_loaded"
+        self.error: Optional[str] = None
+        self.lock = threading.Lock()
+        self.counters = {"lookups": 0, "hits": 0, "loads": 0}
+
+    def load(self):
+        """(Re)load the library file; keeps serving the previous one if the new one is unusable."""
+        if not self.enabled:
+            return
+        with self.lock:
+            if not os.path.exists(self.path):
+                self.status = "missing"
+                return
+            try:
+                library = LibraryFile(self.path)
+            except (OSError, ValueError, struct.error) as e:
+                # Truncated or half-written file: keep serving the current mapping
+                self.status = "invalid"
+                self.error = str(e) or type(e).__name__
+                print(f"Analysis library {self.path} could not be loaded: {self.error}")
+                return
+            self.error = None
+            if library.meta.get("catalog_digest") != catalog_digest():
+                self.status = "stale"
+                print(f"Analysis library {self.path} was built for a different catalog or prompt; rebuild it")
+                return
+            # Lookups in flight keep the old mapping alive until they finish
+            self.file = library
+            self.status = "loaded"
+            self.counters["loads"] += 1
+
+    def get(self, thought: str) -> Optional[Dict]:
+        library = self.file
+        if library is None:
+            return None
+        self.counters["lookups"] += 1
+        analysis = library.get(normalize(thought))
+        if analysis is not None:
+            self.counters["hits"] += 1
+        return analysis
+
+    def stats(self) -> Dict:
+        lookups = self.counters["lookups"]
+        library = self.file
+        return {
+            **self.counters,
+            "enabled": self.enabled,
+            "status": self.status,
+            "error": self.error,
+            "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": library.count if library else 0,
+            "file_bytes": library.size if library else 0,
+            "built_at": library.meta.get("built_at") if library else None,
+        }
+
+
+analysis_library = AnalysisLibrary()
+
+
+# Offline builder
+
+def catalog_examples() -> List[str]:
+    from app.services.catalog import get_distortions_data
+
+    return [example for d in get_distortions_data()["distortions"] for example in d.get("examples", [])]
+
+
+def frequent_inputs(limit: int, min_count: int) -> List[str]:
+    """The most frequently analyzed production inputs, counted after normalization."""
+    from sqlalchemy import func, select
+    from app.database import get_engine
+    from app.models import history
+
+    query = (
+        select(history.c.input, func.count())
+        .where(history.c.kind == "analysis")
+        .group_by(history.c.input)
+    )
+    counts, originals = Counter(), {}
+    with get_engine().connect() as conn:
+        for text, count in conn.execute(query):
+            normalized = normalize(text)
+            counts[normalized] += count
+            originals.setdefault(normalized, text)
+    return [originals[normalized] for normalized, count in counts.most_common(limit) if count >= min_count]
+
+
+def read_corpus(path: str) -> List[str]:
+    """One thought per line, or JSON lines with a "thought" field."""
+    thoughts = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            thoughts.append(json.loads(line)["thought"] if line.startswith("{") else line)
+    return thoughts
+
+
+async def build(thoughts: Iterable[str], path: str, concurrency: int = 4, sources: Optional[Dict] = None) -> Dict:
+    """
+    Analyze each distinct thought with analyze_thought_with_ai, at most
+    `concurrency` at a time, and write the model-backed results as a library.
+    Rule-based fallbacks are left out so they never shadow a real analysis.
+    """
+    from app.services.ai_analyzer import analyze_thought_with_ai, analysis_cache
+
+    # Every entry must be analyzed on its own, not copied from a near-duplicate
+    analysis_cache.enabled = False
+    distinct: Dict[str, str] = {}
+    for thought in thoughts:
+        distinct.setdefault(normalize(thought), thought)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    analyses: Dict[str, Dict] = {}
+    failed = 0
+
+    async def analyze(normalized: str, thought: str):
+        nonlocal failed
+        async with semaphore:
+            result = await analyze_thought_with_ai(thought)
+        if result.get("analysis_method") != "ai":
+            failed += 1
+            return
+        analyses[normalized] = {key: value for key, value in result.items() if key != "original_thought"}
+
+    await asyncio.gather(*(analyze(normalized, thought) for normalized, thought in distinct.items()))
+
+    meta = {
+        "catalog_digest": catalog_digest(),
+        "built_at": datetime.utcnow().isoformat(),
+        "entries": len(analyses),
+        "sources": sources or {},
+    }
+    write_library(path, analyses, meta)
+    return {**meta, "requested": len(distinct), "failed": failed, "file_bytes": os.path.getsize(path)}
+
+
+def main():
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Build or inspect the precomputed analysis library.")
+    parser.add_argument("command", choices=["build", "info"])
+    parser.add_argument("--output", default=ANALYSIS_LIBRARY_FILE)
+    parser.add_argument("--corpus", help="file with one thought per line (or JSON lines with a \"thought\" field)")
+    parser.add_argument("--top-history", type=int, default=500, help="most frequent stored inputs to include (0 = none)")
+    parser.add_argument("--min-count", type=int, default=3, help="times an input must have been seen")
+    parser.add_argument("--no-examples", action="store_true", help="leave out the distortion catalog examples")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.command == "info":
+        library = LibraryFile(args.output)
+        fresh = library.meta.get("catalog_digest") == catalog_digest()
+        print(json.dumps({**library.meta, "file_bytes": library.size, "fresh": fresh}, indent=2))
+        return
+
+    sources = {}
+    thoughts: List[str] = []
+    if not args.no_examples:
+        examples = catalog_examples()
+        sources["catalog_examples"] = len(examples)
+        thoughts += examples
+    if args.top_history > 0:
+        frequent = frequent_inputs(args.top_history, args.min_count)
+        sources["history"] = len(frequent)
+        thoughts += frequent
+    if args.corpus:
+        corpus = read_corpus(args.corpus)
+        sources["corpus"] = len(corpus)
+        thoughts += corpus
+
+    summary = asyncio.run(build(thoughts, args.output, args.concurrency, sources))
+    print(json.dumps(summary, indent=2))
+    print("Reload a running server with POST /api/admin/analysis-library/reload")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+"""
+Population-level analytics over stored history: distortion prevalence,
+theme/emotion and exercise-suggestion frequency by week, and co-occurrence
+matrices. Results are written to the analytics_* summary tables and served
+read-only by the admin API.
+
+Run the job (from the server directory):
+    python -m app.services.analytics
+or trigger it on a running server with POST /api/admin/analytics/run.
+"""
+import asyncio
+import importlib.util
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+# Rows read from the history table per chunk
+ANALYTICS_CHUNK_SIZE = int(os.getenv("ANALYTICS_CHUNK_SIZE", "20000"))
+# Weeks with fewer distinct users, and matrix cells with fewer records, are not published
+ANALYTICS_MIN_USERS = int(os.getenv("ANALYTICS_MIN_USERS", "5"))
+ANALYTICS_MIN_COUNT = int(os.getenv("ANALYTICS_MIN_COUNT", "5"))
+
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+
+# Labels the summary and categorization prompts ask for; anything else counts as "other"
+THEMES = ["work", "relationships", "health", "finance", "self", "family", "social", "future", "past", "other"]
+EMOTIONS = ["anxious", "overwhelmed", "sad", "angry", "frustrated", "confused", "hopeful", "relieved", "other"]
+METRICS = ("distortion", "theme", "emotion", "exercise")
+MATRICES = ("theme_emotion", "distortion_distortion", "distortion_exercise")
+
+_EPOCH = date(1970, 1, 1)
+
+
+class AnalyticsBusyError(Exception):
+    """Raised when a run is requested while one is in progress."""
+
+
+def week_start(week: int) -> str:
+    # Week numbers count Monday-based weeks; 1970-01-01 was a Thursday
+    return (_EPOCH + timedelta(days=week * 7 - 3)).isoformat()
+
+
+class Vocabulary:
+    def __init__(self, labels: List[str], other: Optional[str] = None):
+        self.labels = list(labels)
+        self.index = {label: i for i, label in enumerate(self.labels)}
+        self.other = self.index.get(other) if other else None
+
+    def lookup(self, label) -> Optional[int]:
+        index = self.index.get(str(label).lower()) if label is not None else None
+        return index if index is not None else self.other
+
+
+class Accumulator:
+    """Running totals for one run; each chunk is added with vectorized operations."""
+
+    def __init__(self, vocabularies: Dict[str, Vocabulary]):
+        import numpy as np
+
+        self.vocabularies = vocabularies
+        # week -> per-label counts, per metric
+        self.weekly: Dict[str, Dict[int, "np.ndarray"]] = {metric: {} for metric in METRICS}
+        # week -> records of the kind each metric is computed over
+        self.analyses: Dict[int, int] = {}
+        self.labelled: Dict[int, int] = {}
+        sizes = {metric: len(vocabularies[metric].labels) for metric in METRICS}
+        self.matrices = {
+            "theme_emotion": np.zeros((sizes["theme"], sizes["emotion"]), dtype=np.int64),
+            "distortion_distortion": np.zeros((sizes["distortion"], sizes["distortion"]), dtype=np.int64),
+            "distortion_exercise": np.zeros((sizes["distortion"], sizes["exercise"]), dtype=np.int64),
+        }
+        self.week_users: List["np.ndarray"] = []
+        self.records = 0
+
+    @staticmethod
+    def _add_weekly(target: Dict, weeks, onehot):
+        """Sum the rows of a (records x labels) one-hot matrix per week."""
+        import numpy as np
+
+        if not len(weeks):
+            return
+        unique_weeks, inverse = np.unique(weeks, return_inverse=True)
+        sums = np.zeros((len(unique_weeks), onehot.shape[1]), dtype=np.int64)
+        np.add.at(sums, inverse, onehot)
+        for week, counts in zip(unique_weeks.tolist(), sums):
+            if week in target:
+                target[week] += counts
+            else:
+                target[week] = counts
+
+    @staticmethod
+    def _add_counts(target: Dict[int, int], weeks):
+        import numpy as np
+
+        unique_weeks, counts = np.unique(weeks, return_counts=True)
+        for week, count in zip(unique_weeks.tolist(), counts.tolist()):
+            target[week] = target.get(week, 0) + count
+
+    def add(self, columns: Dict):
+        import numpy as np
+
+        weeks = columns["weeks"]
+        analysis = columns["is_analysis"]
+        labelled = columns["is_labelled"]
+        onehot = columns["onehot"]
+
+        self._add_counts(self.analyses, weeks[analysis])
+        self._add_counts(self.labelled, weeks[labelled])
+        for metric, mask in (("distortion", analysis), ("exercise", analysis), ("theme", labelled), ("emotion", labelled)):
+            self._add_weekly(self.weekly[metric], weeks[mask], onehot[metric][mask])
+
+        themes, emotions = onehot["theme"].astype(np.int64), onehot["emotion"].astype(np.int64)
+        distortions, exercises = onehot["distortion"].astype(np.int64), onehot["exercise"].astype(np.int64)
+        self.matrices["theme_emotion"] += themes.T @ emotions
+        self.matrices["distortion_distortion"] += distortions.T @ distortions
+        self.matrices["distortion_exercise"] += distortions.T @ exercises
+
+        # Distinct (week, user) pairs, for the minimum-users rule
+        pairs = (weeks.astype(np.int64) << 32) | columns["users"].astype(np.int64)
+        self.week_users.append(np.unique(pairs))
+        self.records += len(weeks)
+
+    def distinct_users(self):
+        """Distinct users per week, and over the whole run."""
+        import numpy as np
+
+        if not self.week_users:
+            return {}, 0
+        pairs = np.unique(np.concatenate(self.week_users))
+        weeks, counts = np.unique(pairs >> 32, return_counts=True)
+        total = len(np.unique(pairs & 0xFFFFFFFF))
+        return dict(zip(weeks.tolist(), counts.tolist())), total
+
+
+def to_columns(rows: List[Dict], vocabularies: Dict[str, Vocabulary], user_codes: Dict[str, int]) -> Dict:
+    """
+    Turn a chunk of history rows into columnar arrays: week numbers, kind
+    masks, a user code per row and a (rows x labels) one-hot matrix per
+    metric. Only label extraction from each stored JSON result is per row.
+    """
+    import numpy as np
+
+    size = len(rows)
+    kinds = np.array([row["kind"] for row in rows])
+    days = np.array([row["created_at"] for row in rows], dtype="datetime64[D]").astype(np.int64)
+    users = np.array([user_codes.setdefault(row["user_id"], len(user_codes)) for row in rows], dtype=np.int64)
+
+    coordinates = {metric: ([], []) for metric in METRICS}
+
+    def collect(metric: str, row_index: int, labels):
+        vocabulary = vocabularies[metric]
+        row_indexes, label_indexes = coordinates[metric]
+        for label in labels or ():
+            index = vocabulary.lookup(label)
+            if index is not None:
+                row_indexes.append(row_index)
+                label_indexes.append(index)
+
+    for i, row in enumerate(rows):
+        result = row["result"] or {}
+        if row["kind"] == "analysis":
+            collect("distortion", i, [d.get("id") or d.get("distortion_id")
+                                      for d in result.get("identified_distortions", []) if isinstance(d, dict)])
+            collect("exercise", i, result.get("suggested_exercises"))
+        else:
+            collect("theme", i, result.get("themes"))
+            collect("emotion", i, result.get("emotions"))
+
+    onehot = {}
+    for metric, (row_indexes, label_indexes) in coordinates.items():
+        matrix = np.zeros((size, len(vocabularies[metric].labels)), dtype=np.uint8)
+        matrix[row_indexes, label_indexes] = 1
+        onehot[metric] = matrix
+
+    return {
+        # Monday-based week number
+        "weeks": (days + 3) // 7,
+        "is_analysis": kinds == "analysis",
+        "is_labelled": (kinds == "categorization") | (kinds == "summary"),
+        "users": users,
+        "onehot": onehot,
+    }
+
+
+def default_vocabularies() -> Dict[str, Vocabulary]:
+    from app.services.catalog import get_distortions, get_exercises
+
+    return {
+        "distortion": Vocabulary(list(get_distortions())),
+        "exercise": Vocabulary(list(get_exercises())),
+        "theme": Vocabulary(THEMES, other="other"),
+        "emotion": Vocabulary(EMOTIONS, other="other"),
+    }
+
+
+def summarize(accumulator: Accumulator, min_users: int, min_count: int):
+    """Weekly and co-occurrence rows to publish, applying the anonymity thresholds."""
+    users, total_users = accumulator.distinct_users()
+    published_weeks = {week for week, count in users.items() if count >= min_users}
+
+    weekly_rows = []
+    for metric in METRICS:
+        labels = accumulator.vocabularies[metric].labels
+        totals = accumulator.analyses if metric in ("distortion", "exercise") else accumulator.labelled
+        for week, counts in accumulator.weekly[metric].items():
+            if week not in published_weeks:
+                continue
+            for index in counts.nonzero()[0].tolist():
+                weekly_rows.append({
+                    "week": week_start(week), "metric": metric, "label": labels[index],
+                    "count": int(counts[index]), "share": round(int(counts[index]) / totals[week], 6),
+                })
+
+    matrix_rows = []
+    if total_users >= min_users:
+        for name, matrix in accumulator.matrices.items():
+            row_metric, col_metric = name.split("_")
+            row_labels = accumulator.vocabularies[row_metric].labels
+            col_labels = accumulator.vocabularies[col_metric].labels
+            for i, j in zip(*(matrix >= min_count).nonzero()):
+                matrix_rows.append({
+                    "matrix": name, "row_label": row_labels[i], "col_label": col_labels[j],
+                    "count": int(matrix[i, j]),
+                })
+    return weekly_rows, matrix_rows, len(published_weeks)
+
+
+class AnalyticsJob:
+    """Runs the aggregate job in a worker thread, one run at a time."""
+
+    def __init__(self, chunk_size: int = ANALYTICS_CHUNK_SIZE, min_users: int = ANALYTICS_MIN_USERS,
+                 min_count: int = ANALYTICS_MIN_COUNT):
+        self.chunk_size = chunk_size
+        self.min_users = min_users
+        self.min_count = min_count
+        self.lock = threading.Lock()
+        self.task: Optional[asyncio.Task] = None
+        self.last_run: Optional[Dict] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        return NUMPY_AVAILABLE
+
+    def run(self) -> Dict:
+        """Stream all history through the accumulator and replace the summary tables (blocking)."""
+        from sqlalchemy import select
+        from app.database import get_engine
+        from app.models import history, analytics_weekly, analytics_cooccurrence, analytics_runs
+
+        if not self.lock.acquire(blocking=False):
+            raise AnalyticsBusyError("An analytics run is already in progress")
+        try:
+            started_at, started = datetime.utcnow(), time.perf_counter()
+            vocabularies = default_vocabularies()
+            accumulator = Accumulator(vocabularies)
+            user_codes: Dict[str, int] = {}
+            columns = [history.c.id, history.c.user_id, history.c.kind, history.c.created_at, history.c.result]
+
+            engine = get_engine()
+            after_id = 0
+            while True:
+                query = select(*columns).where(history.c.id > after_id).order_by(history.c.id).limit(self.chunk_size)
+                with engine.connect() as conn:
+                    rows = conn.execute(query).mappings().all()
+                if not rows:
+                    break
+                accumulator.add(to_columns(rows, vocabularies, user_codes))
+                after_id = rows[-1]["id"]
+                if len(rows) < self.chunk_size:
+                    break
+
+            weekly_rows, matrix_rows, weeks = summarize(accumulator, self.min_users, self.min_count)
+            run = {
+                "started_at": started_at,
+                "finished_at": datetime.utcnow(),
+                "records": accumulator.records,
+                "weeks": weeks,
+                "seconds": round(time.perf_counter() - started, 3),
+            }
+            # Replace the previous results in one transaction, so readers never see a partial run
+            with engine.begin() as conn:
+                conn.execute(analytics_weekly.delete())
+                conn.execute(analytics_cooccurrence.delete())
+                if weekly_rows:
+                    conn.execute(analytics_weekly.insert(), weekly_rows)
+                if matrix_rows:
+                    conn.execute(analytics_cooccurrence.insert(), matrix_rows)
+                conn.execute(analytics_runs.insert().values(**run))
+
+            self.last_run = {**run, "started_at": started_at.isoformat(), "finished_at": run["finished_at"].isoformat(),
+                             "weekly_rows": len(weekly_rows), "matrix_rows": len(matrix_rows)}
+            self.last_error = None
+            return self.last_run
+        except Exception as e:
+            self.last_error = str(e)
+            raise
+        finally:
+            self.lock.release()
+
+    def start(self) -> bool:
+        """Run in the background; False when a run is already in progress."""
+        if self.running:
+            return False
+        self.task = asyncio.create_task(self._run_in_thread(), name="analytics")
+        return True
+
+    async def _run_in_thread(self):
+        try:
+            await asyncio.to_thread(self.run)
+        except Exception as e:
+            print(f"Analytics job error: {e}")
+
+    @property
+    def running(self) -> bool:
+        return self.lock.locked() or (self.task is not None and not self.task.done())
+
+    def stats(self) -> Dict:
+        return {
+            "numpy_available": NUMPY_AVAILABLE,
+            "running": self.running,
+            "last_run": self.last_run,
+            "last_error": self.last_error,
+            "min_users": self.min_users,
+            "min_count": self.min_count,
+        }
+
+
+analytics_job = AnalyticsJob()
+
+
+def read_weekly(metric: Optional[str], weeks: int) -> List[Dict]:
+    from sqlalchemy import select
+    from app.database import get_engine
+    from app.models import analytics_weekly as table
+
+    since = (date.today() - timedelta(weeks=weeks)).isoformat()
+    query = select(table).where(table.c.week >= since).order_by(table.c.week, table.c.metric, table.c.count.desc())
+    if metric is not None:
+        query = query.where(table.c.metric == metric)
+    with get_engine().connect() as conn:
+        return [dict(row) for row in conn.execute(query).mappings()]
+
+
+def read_matrix(matrix: str) -> Dict:
+    from sqlalchemy import select
+    from app.database import get_engine
+    from app.models import analytics_cooccurrence as table
+
+    query = select(table.c.row_label, table.c.col_label, table.c.count).where(table.c.matrix == matrix)
+    with get_engine().connect() as conn:
+        cells = [dict(row) for row in conn.execute(query).mappings()]
+    return {"matrix": matrix, "cells": cells}
+
+
+def read_last_run() -> Optional[Dict]:
+    from sqlalchemy import select
+    from app.database import get_engine
+    from app.models import analytics_runs as table
+
+    with get_engine().connect() as conn:
+        row = conn.execute(select(table).order_by(table.c.id.desc()).limit(1)).mappings().first()
+    if row is None:
+        return None
+    return {**row, "started_at": row["started_at"].isoformat(), "finished_at": row["finished_at"].isoformat()}
+
+
+if __name__ == "__main__":
+    import json
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    print(json.dumps(analytics_job.run(), indent=2))
@@ -0,0 +1,62 @@
+import os
+from typing import Dict, Optional
+
+from app.services.model_routing import route_metrics
+
+# Abort model-backed requests whose client has disconnected. Requests sent
+# with an Idempotency-Key by signed-in callers are left to finish, so a retry can attach to them.
+CANCEL_ON_DISCONNECT = os.getenv("CANCEL_ON_DISCONNECT", "true").lower() in ("1", "true", "yes")
+# Client deadline header: milliseconds the client is willing to wait for the response
+DEADLINE_HEADER = "x-request-deadline-ms"
+# Longest deadline honoured; larger values are capped
+MAX_DEADLINE_SECONDS = float(os.getenv("MAX_DEADLINE_SECONDS", "300"))
+
+
+def parse_deadline(value: Optional[str]) -> Optional[float]:
+    """Seconds allowed by a deadline header value, or None when absent or malformed."""
+    if not value:
+        return None
+    try:
+        milliseconds = float(value)
+    except ValueError:
+        return None
+    if milliseconds != milliseconds or milliseconds <= 0:
+        return None
+    return min(milliseconds / 1000, MAX_DEADLINE_SECONDS)
+
+
+class CancellationMetrics:
+    """Counts of requests and upstream model calls aborted early, and the output tokens not generated."""
+
+    def __init__(self):
+        self.requests = {"disconnect": 0, "deadline": 0}
+        self.counters = {
+            "upstream_calls_cancelled": 0,
+            # Expected output tokens of the cancelled calls (the route's average so far)
+            "estimated_output_tokens_saved": 0,
+            # Upper bound: the max_tokens of the cancelled calls
+            "max_output_tokens_saved": 0,
+            "deadline_responses": 0,
+        }
+        self.paths: Dict[str, int] = {}
+
+    def record_request(self, path: str, reason: str):
+        self.requests[reason] += 1
+        self.paths[path] = self.paths.get(path, 0) + 1
+
+    def record_upstream_call(self, route: Dict):
+        expected = route_metrics.average_output_tokens(route) or route["max_tokens"]
+        self.counters["upstream_calls_cancelled"] += 1
+        self.counters["estimated_output_tokens_saved"] += int(min(expected, route["max_tokens"]))
+        self.counters["max_output_tokens_saved"] += route["max_tokens"]
+
+    def stats(self) -> Dict:
+        return {
+            "cancel_on_disconnect": CANCEL_ON_DISCONNECT,
+            "requests_cancelled": dict(self.requests),
+            "by_path": dict(self.paths),
+            **self.counters,
+        }
+
+
+cancellation_metrics = CancellationMetrics()
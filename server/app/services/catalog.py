@@ -0,0 +1,37 @@
+import json
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict
+
+# Static CBT catalogs, loaded on first use and kept for the life of the process
+data_dir = Path(__file__).parent.parent / "data"
+
+
+@lru_cache(maxsize=None)
+def get_distortions_data() -> Dict:
+    with open(data_dir / "distortions.json", "r") as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=None)
+def get_distortions() -> Dict[str, Dict]:
+    """Distortions keyed by id."""
+    return {d["id"]: d for d in get_distortions_data()["distortions"]}
+
+
+@lru_cache(maxsize=None)
+def get_exercises_data() -> Dict:
+    with open(data_dir / "exercises.json", "r") as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=None)
+def get_exercises() -> Dict[str, Dict]:
+    """Exercises keyed by id."""
+    return {e["id"]: e for e in get_exercises_data()["exercises"]}
+
+
+@lru_cache(maxsize=None)
+def get_categories() -> Dict[str, Dict]:
+    """Exercise categories keyed by id."""
+    return {c["id"]: c for c in get_exercises_data()["categories"]}
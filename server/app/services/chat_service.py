@@ -1,8 +1,13 @@
-import os
 import json
-from anthropic import Anthropic
 from typing import List, Dict, Optional
 
+from app.services.llm import get_anthropic_client, create_message, unavailable_reason
+from app.services.model_routing import select_route
+from app.services.similarity_cache import SimilarityCache
+from app.services.request_context import get_user_id
+from app.services.tracing import traced, set_attribute, record_fallback
+from app.services.conversation import Turn, recent_turns, fit_turns, SUMMARY_MAX_CHARS
+
 COACH_SYSTEM_PROMPT = """You are a practical life coach helping someone process racing thoughts. Your style:
 - Acknowledge their feelings briefly, then focus on understanding the core issue
 - Ask clarifying questions to break down vague worries into specific concerns
@@ -31,36 +36,36 @@ If no clear action items emerged, provide 1-2 gentle suggestions based on what w
 
 Respond ONLY with valid JSON."""
 
-
-def get_anthropic_client():
-    """Get Anthropic client, returns None if API key not configured."""
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    if not api_key or api_key == "your_api_key_here":
-        return None
-    return Anthropic(api_key=api_key)
+# Reuses AI distortion analyses for near-duplicate thoughts
+distortion_cache = SimilarityCache("analyze_cognitive_distortions")
 
 
+@traced("chat.get_chat_response")
 async def get_chat_response(
     message: str,
-    conversation_history: List[Dict[str, str]]
+    conversation_history: List[Turn]
 ) -> Dict:
     """
     Get a coaching response from Claude based on the user's message
-    and conversation history.
+    and the most recent turns of the conversation history.
     """
     client = get_anthropic_client()
-
-    if client is None:
+    context = recent_turns(conversation_history)
+    set_attribute("history_turns", len(conversation_history))
+    set_attribute("context_turns", len(context))
+    route = select_route(
+        "chat",
+        message + "".join(turn.content for turn in context),
+        turns=len(context) + 1
+    )
+
+    if client is None or route is None:
+        record_fallback(unavailable_reason(client, route))
         return get_fallback_response(message, conversation_history)
 
     try:
         # Build messages list from history
-        messages = []
-        for msg in conversation_history:
-            messages.append({
-                "role": msg["role"],
-                "content": msg["content"]
-            })
+        messages = [turn.as_message() for turn in context]
 
         # Add current message
         messages.append({
@@ -68,9 +73,9 @@ async def get_chat_response(
             "content": message
         })
 
-        response = client.messages.create(
-            model="claude-3-haiku-20240307",
-            max_tokens=300,
+        response = await create_message(
+            client,
+            route,
             system=COACH_SYSTEM_PROMPT,
             messages=messages
         )
@@ -88,9 +93,11 @@ async def get_chat_response(
 
     except Exception as e:
         print(f"Chat error: {e}")
+        record_fallback("upstream_error", e)
         return get_fallback_response(message, conversation_history)
 
 
+@traced("chat.analyze_message_metadata")
 async def analyze_message_metadata(user_message: str, bot_response: str) -> Dict:
     """Analyze the message for emotion and theme metadata."""
     # Simple keyword-based detection for real-time metadata
@@ -141,7 +148,20 @@ async def analyze_message_metadata(user_message: str, bot_response: str) -> Dict
     }
 
 
-async def summarize_session(conversation_history: List[Dict[str, str]]) -> Dict:
+def format_transcript(conversation_history: List[Turn], max_chars: int = SUMMARY_MAX_CHARS) -> str:
+    """
+    Render a conversation as "User: ..." / "Coach: ..." lines, leaving out
+    turns (see fit_turns) when it is longer than max_chars.
+    """
+    return "\n".join([
+        f"{'User' if turn.role == 'user' else 'Coach'}: {turn.content}"
+        if turn is not None else "[... earlier messages omitted ...]"
+        for turn in fit_turns(conversation_history, max_chars)
+    ])
+
+
+@traced("chat.summarize_session")
+async def summarize_session(conversation_history: List[Turn]) -> Dict:
     """
     Generate a summary of the conversation session including
     themes, emotions, and action items.
@@ -149,18 +169,21 @@ async def summarize_session(conversation_history: List[Dict[str, str]]) -> Dict:
     client = get_anthropic_client()
 
     if client is None:
+        record_fallback("no_api_key")
+        return get_fallback_summary(conversation_history)
+
+    # Format conversation for analysis
+    conversation_text = format_transcript(conversation_history)
+
+    route = select_route("summarize", conversation_text, turns=len(conversation_history))
+    if route is None:
+        record_fallback("rule_based_route")
         return get_fallback_summary(conversation_history)
 
     try:
-        # Format conversation for analysis
-        conversation_text = "\n".join([
-            f"{'User' if msg['role'] == 'user' else 'Coach'}: {msg['content']}"
-            for msg in conversation_history
-        ])
-
-        response = client.messages.create(
-            model="claude-3-haiku-20240307",
-            max_tokens=500,
+        response = await create_message(
+            client,
+            route,
             system=SUMMARY_SYSTEM_PROMPT,
             messages=[{
                 "role": "user",
@@ -178,14 +201,17 @@ async def summarize_session(conversation_history: List[Dict[str, str]]) -> Dict:
             "action_items": result.get("action_items", [])
         }
 
-    except json.JSONDecodeError:
+    except json.JSONDecodeError as e:
+        record_fallback("invalid_json", e)
         return get_fallback_summary(conversation_history)
     except Exception as e:
         print(f"Summary error: {e}")
+        record_fallback("upstream_error", e)
         return get_fallback_summary(conversation_history)
 
 
-def get_fallback_response(message: str, history: List[Dict]) -> Dict:
+@traced("chat.get_fallback_response")
+def get_fallback_response(message: str, history: List[Turn]) -> Dict:
     """Fallback response when AI is unavailable."""
     # Simple rule-based responses
     message_lower = message.lower()
@@ -212,20 +238,23 @@ def get_fallback_response(message: str, history: List[Dict]) -> Dict:
     }
 
 
+@traced("chat.categorize_thought")
 async def categorize_thought(thought: str) -> Dict:
     """
     Categorize a single thought/rambling into themes and emotions.
     Used for ambient listening mode.
     """
     client = get_anthropic_client()
+    route = select_route("categorize", thought)
 
-    if client is None or len(thought.strip()) < 10:
+    if client is None or route is None or len(thought.strip()) < 10:
+        record_fallback(unavailable_reason(client, route) or "too_short")
         return get_fallback_categorization(thought)
 
     try:
-        response = client.messages.create(
-            model="claude-3-haiku-20240307",
-            max_tokens=200,
+        response = await create_message(
+            client,
+            route,
             messages=[{
                 "role": "user",
                 "content": f"""Categorize this thought snippet. Respond in JSON only:
@@ -254,9 +283,78 @@ JSON:"""
 
     except Exception as e:
         print(f"Categorization error: {e}")
+        record_fallback("upstream_error", e)
         return get_fallback_categorization(thought)
 
 
+@traced("chat.categorize_thoughts_batch")
+async def categorize_thoughts_batch(thoughts: List[str]) -> List[Dict]:
+    """
+    Categorize several thought snippets with a single model call.
+    Used by the ambient streaming endpoint; results are in input order and
+    say whether they came from the model or the keyword fallback.
+    """
+    client = get_anthropic_client()
+    route = select_route("categorize_batch", "\n".join(thoughts), turns=len(thoughts))
+
+    if client is None or route is None or not thoughts:
+        record_fallback(unavailable_reason(client, route) or "empty_batch")
+        return [{**get_fallback_categorization(t), "method": "keyword"} for t in thoughts]
+
+    numbered = "\n".join(f'{i}. "{t}"' for i, t in enumerate(thoughts))
+
+    try:
+        response = await create_message(
+            client,
+            route,
+            messages=[{
+                "role": "user",
+                "content": f"""Categorize each of these thought snippets. Respond in JSON only, one entry per snippet:
+[
+    {{
+        "index": 0,
+        "themes": ["theme1"],
+        "emotions": ["emotion1"],
+        "key_phrase": "short summary phrase"
+    }}
+]
+
+Themes: work, relationships, family, health, finance, social, future, self, past, other
+Emotions: anxious, overwhelmed, sad, angry, frustrated, confused, hopeful, relieved, neutral
+
+Snippets:
+{numbered}
+
+JSON:"""
+            }]
+        )
+
+        by_index = {
+            item.get("index"): item
+            for item in json.loads(response.content[0].text)
+            if isinstance(item, dict)
+        }
+    except Exception as e:
+        print(f"Batch categorization error: {e}")
+        record_fallback("upstream_error", e)
+        by_index = {}
+
+    results = []
+    for i, thought in enumerate(thoughts):
+        item = by_index.get(i)
+        if item is None:
+            results.append({**get_fallback_categorization(thought), "method": "keyword"})
+            continue
+        results.append({
+            "success": True,
+            "themes": item.get("themes", ["general"])[:2],
+            "emotions": item.get("emotions", ["neutral"])[:2],
+            "key_phrase": item.get("key_phrase", thought[:50]),
+            "method": "model"
+        })
+    return results
+
+
 def get_fallback_categorization(thought: str) -> Dict:
     """Fallback categorization using keywords."""
     thought_lower = thought.lower()
@@ -297,19 +395,28 @@ def get_fallback_categorization(thought: str) -> Dict:
     }
 
 
+@traced("chat.analyze_cognitive_distortions")
 async def analyze_cognitive_distortions(thought: str) -> Dict:
     """
     Analyze a thought for cognitive distortions and provide reframes.
     """
     client = get_anthropic_client()
+    route = select_route("distortions", thought)
 
-    if client is None or len(thought.strip()) < 10:
+    if client is None or route is None or len(thought.strip()) < 10:
+        record_fallback(unavailable_reason(client, route) or "too_short")
         return get_fallback_distortion_analysis(thought)
 
+    cached = distortion_cache.get(thought, get_user_id())
+    set_attribute("cache_hit", cached is not None)
+    if cached is not None:
+        set_attribute("cache_similarity", cached[1])
+        return cached[0]
+
     try:
-        response = client.messages.create(
-            model="claude-3-haiku-20240307",
-            max_tokens=500,
+        response = await create_message(
+            client,
+            route,
             messages=[{
                 "role": "user",
                 "content": f"""Analyze this thought for cognitive distortions. Respond in JSON only:
@@ -333,14 +440,17 @@ JSON:"""
         )
 
         result = json.loads(response.content[0].text)
-        return {
+        analysis = {
             "success": True,
             "distortions": result.get("distortions", []),
             "balanced_thought": result.get("balanced_thought", thought)
         }
+        distortion_cache.put(thought, analysis, get_user_id())
+        return analysis
 
     except Exception as e:
         print(f"Distortion analysis error: {e}")
+        record_fallback("upstream_error", e)
         return get_fallback_distortion_analysis(thought)
 
 
@@ -399,19 +509,22 @@ def get_fallback_distortion_analysis(thought: str) -> Dict:
     }
 
 
+@traced("chat.generate_action_plan")
 async def generate_action_plan(thought: str, context: str = "") -> Dict:
     """
     Break down a thought/concern into actionable steps.
     """
     client = get_anthropic_client()
+    route = select_route("action_plan", thought)
 
-    if client is None or len(thought.strip()) < 10:
+    if client is None or route is None or len(thought.strip()) < 10:
+        record_fallback(unavailable_reason(client, route) or "too_short")
         return get_fallback_action_plan(thought)
 
     try:
-        response = client.messages.create(
-            model="claude-3-haiku-20240307",
-            max_tokens=400,
+        response = await create_message(
+            client,
+            route,
             messages=[{
                 "role": "user",
                 "content": f"""Create an action plan for this concern. Respond in JSON only:
@@ -446,6 +559,7 @@ JSON:"""
 
     except Exception as e:
         print(f"Action plan error: {e}")
+        record_fallback("upstream_error", e)
         return get_fallback_action_plan(thought)
 
 
@@ -464,13 +578,16 @@ def get_fallback_action_plan(thought: str) -> Dict:
     }
 
 
+@traced("chat.create_reminder")
 async def create_reminder(thought: str, note: str = "") -> Dict:
     """
     Generate a reminder suggestion based on a thought.
     """
     client = get_anthropic_client()
+    route = select_route("reminder", thought + note)
 
-    if client is None:
+    if client is None or route is None:
+        record_fallback(unavailable_reason(client, route))
         return {
             "success": True,
             "reminder_text": note or "Check in on this thought",
@@ -479,9 +596,9 @@ async def create_reminder(thought: str, note: str = "") -> Dict:
         }
 
     try:
-        response = client.messages.create(
-            model="claude-3-haiku-20240307",
-            max_tokens=150,
+        response = await create_message(
+            client,
+            route,
             messages=[{
                 "role": "user",
                 "content": f"""Create a gentle reminder for someone who had this thought. Respond in JSON:
@@ -508,6 +625,7 @@ JSON:"""
 
     except Exception as e:
         print(f"Reminder error: {e}")
+        record_fallback("upstream_error", e)
         return {
             "success": True,
             "reminder_text": note or "Take a moment to reflect on your progress",
@@ -516,10 +634,10 @@ JSON:"""
         }
 
 
-def get_fallback_summary(conversation_history: List[Dict]) -> Dict:
+def get_fallback_summary(conversation_history: List[Turn]) -> Dict:
     """Fallback summary when AI is unavailable."""
     # Count user messages to estimate themes
-    user_messages = [m["content"].lower() for m in conversation_history if m["role"] == "user"]
+    user_messages = [turn.content.lower() for turn in conversation_history if turn.role == "user"]
     all_text = " ".join(user_messages)
 
     themes = []
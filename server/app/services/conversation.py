@@ -0,0 +1,92 @@
+import os
+import sys
+from typing import Any, List, Optional
+
+# Requests with more turns than this are rejected (422)
+MAX_HISTORY_TURNS = int(os.getenv("MAX_HISTORY_TURNS", "1000"))
+# Longer turn contents are cut to this many characters
+MAX_TURN_CHARS = int(os.getenv("MAX_TURN_CHARS", "8000"))
+# Most recent turns sent to the model as chat context
+CHAT_CONTEXT_TURNS = int(os.getenv("CHAT_CONTEXT_TURNS", "40"))
+# Longest transcript summarized (and stored); longer sessions are truncated
+SUMMARY_MAX_CHARS = int(os.getenv("SUMMARY_MAX_CHARS", "60000"))
+# "head_tail" keeps the start of the session and as much of the end as fits;
+# "recent" keeps only the end
+HISTORY_TRUNCATION = os.getenv("HISTORY_TRUNCATION", "head_tail")
+
+# Share one string object per role across all turns
+_ROLES = {"user": "user", "assistant": "assistant"}
+# Part of the budget given to the start of the session with head_tail
+HEAD_SHARE = 0.25
+
+
+class Turn:
+    """
+    One conversation message. Request models validate history straight into
+    these (role interned, content cut to MAX_TURN_CHARS) instead of a model
+    or dict per message.
+    """
+    __slots__ = ("role", "content")
+
+    def __init__(self, role: str, content: str):
+        self.role = _ROLES.get(role) or sys.intern(role)
+        self.content = content
+
+    def as_message(self) -> dict:
+        return {"role": self.role, "content": self.content}
+
+    def __repr__(self):
+        return f"Turn({self.role!r}, {self.content[:40]!r})"
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source: Any, handler: Any):
+        from pydantic_core import core_schema
+
+        fields = core_schema.typed_dict_schema({
+            "role": core_schema.typed_dict_field(core_schema.str_schema(max_length=16)),
+            "content": core_schema.typed_dict_field(core_schema.str_schema()),
+        })
+        return core_schema.no_info_after_validator_function(
+            lambda value: cls(value["role"], value["content"][:MAX_TURN_CHARS]),
+            fields,
+            serialization=core_schema.plain_serializer_function_ser_schema(cls.as_message),
+        )
+
+
+def recent_turns(turns: List[Turn], max_turns: int = CHAT_CONTEXT_TURNS) -> List[Turn]:
+    """The last max_turns turns, starting with a user turn as the Messages API requires."""
+    window = turns[-max_turns:] if max_turns > 0 else []
+    start = 0
+    while start < len(window) and window[start].role != "user":
+        start += 1
+    return window[start:]
+
+
+def fit_turns(turns: List[Turn], max_chars: int = SUMMARY_MAX_CHARS,
+              strategy: str = HISTORY_TRUNCATION) -> List[Optional[Turn]]:
+    """
+    Drop whole turns until the contents fit in max_chars. Returns the turns
+    to keep, with None where turns were left out.
+    """
+    if sum(len(turn.content) for turn in turns) <= max_chars:
+        return turns
+
+    head: List[Turn] = []
+    budget = max_chars
+    if strategy == "head_tail":
+        head_budget = int(max_chars * HEAD_SHARE)
+        for turn in turns:
+            if len(turn.content) > head_budget:
+                break
+            head.append(turn)
+            head_budget -= len(turn.content)
+            budget -= len(turn.content)
+
+    tail: List[Turn] = []
+    for turn in reversed(turns[len(head):]):
+        if len(turn.content) > budget:
+            break
+        tail.append(turn)
+        budget -= len(turn.content)
+    tail.reverse()
+    return head + [None] + tail
@@ -0,0 +1,123 @@
+import asyncio
+import csv
+import io
+import json
+import os
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+
+from app.responses import dumps_json
+from app.services.request_context import get_user_id
+from app.services.write_behind import write_behind
+
+HISTORY_ENABLED = os.getenv("HISTORY_ENABLED", "true").lower() in ("1", "true", "yes")
+# Rows fetched per keyset page while streaming an export
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "500"))
+
+HISTORY_KINDS = ("analysis", "categorization", "summary")
+EXPORT_COLUMNS = ["id", "user_id", "kind", "created_at", "input", "result"]
+
+
+def write_batch(conn, records: List[Dict]):
+    """Insert history rows and their search index entries (write-behind writer)."""
+    from app.models import history
+    from app.services.search import index_entry
+    from app.services.thought_index import thought_index
+
+    inserted = conn.execute(history.insert().returning(history.c.id, sort_by_parameter_order=True), records)
+    entry_ids = inserted.scalars().all()
+    for entry_id, record in zip(entry_ids, records):
+        index_entry(conn, entry_id, record["user_id"], record["kind"], record["input"], record["result"])
+
+    def add_to_thought_index():
+        for entry_id, record in zip(entry_ids, records):
+            if record["kind"] == "analysis":
+                thought_index.add(record["user_id"], entry_id, record["input"])
+
+    return add_to_thought_index
+
+
+async def record(kind: str, text: str, result: Dict):
+    """
+    Queue a result of the signed-in caller for storage; anonymous calls are
+    not kept. Returns once queued (the write is group-committed later).
+    """
+    user_id = get_user_id()
+    if not HISTORY_ENABLED or user_id is None:
+        return
+    await write_behind.enqueue(write_batch, {
+        "user_id": user_id, "kind": kind, "input": text, "result": result, "created_at": datetime.utcnow()
+    })
+
+
+def fetch_page(after_id: int, limit: int, user_id: Optional[str] = None,
+               kind: Optional[str] = None, since: Optional[datetime] = None) -> List[Dict]:
+    from app.database import get_engine
+    from app.models import history
+
+    query = history.select().where(history.c.id > after_id).order_by(history.c.id).limit(limit)
+    if user_id is not None:
+        query = query.where(history.c.user_id == user_id)
+    if kind is not None:
+        query = query.where(history.c.kind == kind)
+    if since is not None:
+        query = query.where(history.c.created_at >= since)
+    with get_engine().connect() as conn:
+        return [dict(row) for row in conn.execute(query).mappings()]
+
+
+async def iter_history(user_id: Optional[str] = None, kind: Optional[str] = None,
+                       since: Optional[datetime] = None,
+                       page_size: int = EXPORT_PAGE_SIZE) -> AsyncIterator[Dict]:
+    """
+    Yield history rows in id order, one keyset page at a time
+    (WHERE id > last_id ORDER BY id LIMIT n), so memory use does not grow
+    with the size of the history.
+    """
+    after_id = 0
+    while True:
+        rows = await asyncio.to_thread(fetch_page, after_id, page_size, user_id, kind, since)
+        for row in rows:
+            yield row
+        if len(rows) < page_size:
+            return
+        after_id = rows[-1]["id"]
+
+
+def to_record(row: Dict) -> Dict:
+    # Plain str keys: SQLAlchemy's column-name subclass is rejected by orjson
+    record = {column: row[column] for column in EXPORT_COLUMNS}
+    record["created_at"] = record["created_at"].isoformat()
+    return record
+
+
+async def ndjson_lines(rows: AsyncIterator[Dict]) -> AsyncIterator[bytes]:
+    async for row in rows:
+        yield dumps_json(to_record(row)) + b"\n"
+
+
+async def csv_lines(rows: AsyncIterator[Dict]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    async for row in rows:
+        record = to_record(row)
+        record["result"] = json.dumps(record["result"], ensure_ascii=False)
+        writer.writerow(record)
+        # Emit in chunks rather than per row to keep the number of writes down
+        if buffer.tell() >= 64 * 1024:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+async def gzipped(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Compress a byte stream on the fly into a single gzip member."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
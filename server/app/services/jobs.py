@@ -0,0 +1,319 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.services.request_context import current_request
+from app.services.tracing import recorded_fallbacks
+
+# Number of in-process workers and how many jobs may wait for one
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "100"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BACKOFF_SECONDS = float(os.getenv("JOB_RETRY_BACKOFF_SECONDS", "1.0"))
+
+# "memory" keeps jobs in this process; "database" stores them via DATABASE_URL
+JOB_STORE = os.getenv("JOB_STORE", "memory")
+
+# Finished jobs kept by the in-memory store
+MEMORY_STORE_LIMIT = 5000
+
+TERMINAL_STATUSES = {"succeeded", "failed"}
+
+# Fallbacks caused by a failed model call; the job is attempted again, and
+# keeps the rule-based result if the last attempt falls back too
+RETRYABLE_FALLBACKS = {"upstream_error", "invalid_json"}
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue has no room; callers should retry later."""
+
+
+class RetryableJobError(Exception):
+    """Raised by a job handler to ask for the job to be attempted again."""
+
+
+class JobFailedError(Exception):
+    """Raised by a job handler when the job cannot succeed, e.g. invalid input."""
+
+
+class MemoryJobStore:
+    """Job store backed by a bounded in-process dict."""
+
+    def __init__(self, limit: int = MEMORY_STORE_LIMIT):
+        self.limit = limit
+        self.jobs: "OrderedDict[str, Dict]" = OrderedDict()
+
+    async def save(self, job: Dict):
+        self.jobs[job["id"]] = dict(job)
+        while len(self.jobs) > self.limit:
+            oldest_id = next(iter(self.jobs))
+            if self.jobs[oldest_id]["status"] not in TERMINAL_STATUSES:
+                break
+            self.jobs.popitem(last=False)
+
+    async def update(self, job_id: str, **fields):
+        if job_id in self.jobs:
+            self.jobs[job_id].update(fields)
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        job = self.jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def unfinished(self):
+        # Nothing survives a restart
+        return []
+
+
+class DatabaseJobStore:
+    """Job store backed by the jobs table (SQLite by default)."""
+
+    def __init__(self):
+        from app.database import get_engine
+        from app.models import jobs
+
+        self.engine = get_engine()
+        self.table = jobs
+
+    def _save(self, job: Dict):
+        with self.engine.begin() as conn:
+            conn.execute(self.table.insert().values(**job))
+
+    def _update(self, job_id: str, fields: Dict):
+        with self.engine.begin() as conn:
+            conn.execute(self.table.update().where(self.table.c.id == job_id).values(**fields))
+
+    def _get(self, job_id: str) -> Optional[Dict]:
+        with self.engine.connect() as conn:
+            row = conn.execute(self.table.select().where(self.table.c.id == job_id)).mappings().first()
+        return dict(row) if row else None
+
+    def _unfinished(self):
+        query = (
+            self.table.select()
+            .where(self.table.c.status.in_(("queued", "running")))
+            .order_by(self.table.c.created_at)
+        )
+        with self.engine.connect() as conn:
+            return [dict(row) for row in conn.execute(query).mappings()]
+
+    async def save(self, job: Dict):
+        await asyncio.to_thread(self._save, job)
+
+    async def update(self, job_id: str, **fields):
+        await asyncio.to_thread(self._update, job_id, fields)
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        return await asyncio.to_thread(self._get, job_id)
+
+    async def unfinished(self):
+        """Jobs left queued or running by a previous run of the server."""
+        return await asyncio.to_thread(self._unfinished)
+
+
+def create_job_store():
+    if JOB_STORE == "database":
+        return DatabaseJobStore()
+    return MemoryJobStore()
+
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Dict]]
+
+
+class JobQueue:
+    """
+    Bounded queue of slow generation tasks run by a pool of in-process workers.
+
+    Submitting returns a job id straight away; results are written to the
+    job store and can be polled, or awaited with wait_for().
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, max_size: int = JOB_QUEUE_SIZE,
+                 max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.worker_count = workers
+        self.max_size = max_size
+        self.max_attempts = max_attempts
+        self.handlers: Dict[str, JobHandler] = {}
+        self.store = None
+        self.queue: Optional[asyncio.Queue] = None
+        self.workers = []
+        self.finished: Dict[str, asyncio.Event] = {}
+        self.running = 0
+        self.counters = {
+            "submitted": 0,
+            "rejected": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "retries": 0,
+            "fallback_results": 0,
+            "recovered": 0,
+        }
+        self.total_run_seconds = 0.0
+
+    def register(self, job_type: str, handler: JobHandler):
+        self.handlers[job_type] = handler
+
+    async def start(self):
+        self.store = create_job_store()
+        self.queue = asyncio.Queue(maxsize=self.max_size)
+        await self._recover()
+        self.workers = [
+            asyncio.create_task(self._worker(), name=f"job-worker-{i}")
+            for i in range(self.worker_count)
+        ]
+
+    async def _recover(self):
+        """
+        Requeue jobs a previous run left queued or running (database store),
+        so clients polling them get a result. Jobs that are out of attempts,
+        or do not fit in the queue, are marked failed.
+        """
+        try:
+            jobs = await self.store.unfinished()
+        except Exception as e:
+            print(f"Job recovery error: {e}")
+            return
+        for job in jobs:
+            if job["type"] in self.handlers and job["attempts"] < self.max_attempts and not self.queue.full():
+                await self.store.update(job["id"], status="queued", updated_at=datetime.utcnow())
+                self.finished[job["id"]] = asyncio.Event()
+                self.queue.put_nowait(job["id"])
+                self.counters["recovered"] += 1
+            else:
+                await self._finish(job["id"], "failed", error="Job was interrupted by a server restart")
+
+    async def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        # Wake long-polls of jobs that will not finish in this process
+        for event in self.finished.values():
+            event.set()
+        self.finished.clear()
+
+    async def submit(self, job_type: str, payload: Dict, user_id: Optional[str] = None) -> Dict:
+        if job_type not in self.handlers:
+            raise ValueError(f"Unknown job type '{job_type}'")
+        if self.queue is None:
+            raise RuntimeError("Job queue is not running")
+        if self.queue.full():
+            self.counters["rejected"] += 1
+            raise QueueFullError("Job queue is full")
+
+        now = datetime.utcnow()
+        job = {
+            "id": str(uuid.uuid4()),
+            "type": job_type,
+            "status": "queued",
+            "user_id": user_id,
+            "payload": payload,
+            "result": None,
+            "error": None,
+            "attempts": 0,
+            "created_at": now,
+            "updated_at": now,
+        }
+        await self.store.save(job)
+        self.finished[job["id"]] = asyncio.Event()
+        self.queue.put_nowait(job["id"])
+        self.counters["submitted"] += 1
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        return await self.store.get(job_id)
+
+    async def wait_for(self, job_id: str, timeout: float) -> Optional[Dict]:
+        """Long-poll: wait up to timeout seconds for a job to finish, then return it."""
+        event = self.finished.get(job_id)
+        if event is not None and timeout > 0:
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return await self.store.get(job_id)
+
+    async def _worker(self):
+        while True:
+            job_id = await self.queue.get()
+            self.running += 1
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                print(f"Job worker error: {e}")
+            finally:
+                self.running -= 1
+                self.queue.task_done()
+
+    async def _run(self, job_id: str):
+        job = await self.store.get(job_id)
+        if job is None:
+            return
+        handler = self.handlers[job["type"]]
+
+        attempts = job["attempts"]
+        while True:
+            attempts += 1
+            await self.store.update(job_id, status="running", attempts=attempts, updated_at=datetime.utcnow())
+            started = time.perf_counter()
+            # Attribute the job's model usage to the user who submitted it
+            context = current_request.set({"user_id": job["user_id"], "client_host": None, "path": f"job:{job['type']}"})
+            fallbacks = []
+            fallbacks_token = recorded_fallbacks.set(fallbacks)
+            try:
+                result = await handler(job["payload"])
+            except RetryableJobError as e:
+                error = str(e) or "Job failed"
+                if attempts < self.max_attempts:
+                    self.counters["retries"] += 1
+                    await asyncio.sleep(JOB_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1))
+                    continue
+                await self._finish(job_id, "failed", error=error)
+                return
+            except JobFailedError as e:
+                await self._finish(job_id, "failed", error=str(e) or "Job failed")
+                return
+            except Exception as e:
+                print(f"Job error ({job['type']}): {e}")
+                await self._finish(job_id, "failed", error="Job failed")
+                return
+            finally:
+                recorded_fallbacks.reset(fallbacks_token)
+                current_request.reset(context)
+                self.total_run_seconds += time.perf_counter() - started
+
+            # The services answer a failed model call with a rule-based fallback
+            if RETRYABLE_FALLBACKS.intersection(fallbacks):
+                if attempts < self.max_attempts:
+                    self.counters["retries"] += 1
+                    await asyncio.sleep(JOB_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1))
+                    continue
+                self.counters["fallback_results"] += 1
+
+            await self._finish(job_id, "succeeded", result=result)
+            return
+
+    async def _finish(self, job_id: str, status: str, result: Optional[Dict] = None, error: Optional[str] = None):
+        await self.store.update(job_id, status=status, result=result, error=error, updated_at=datetime.utcnow())
+        self.counters[status] += 1
+        event = self.finished.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    def stats(self) -> Dict:
+        finished = self.counters["succeeded"] + self.counters["failed"]
+        return {
+            **self.counters,
+            "store": JOB_STORE,
+            "workers": len(self.workers),
+            "running": self.running,
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "queue_capacity": self.max_size,
+            "avg_run_seconds": round(self.total_run_seconds / finished, 3) if finished else 0.0,
+        }
+
+
+job_queue = JobQueue()
@@ -0,0 +1,92 @@
+import asyncio
+import os
+import time
+from typing import Dict, Optional
+
+from app.services.cancellation import cancellation_metrics
+from app.services.llm_fixtures import fixture_store
+from app.services.model_routing import route_metrics
+from app.services.tracing import span
+from app.services.usage import usage_meter
+
+# Shared upstream client. The anthropic SDK is one of the slowest imports in
+# the app, so it is only loaded when the first model call (or warm-up) needs it.
+_client = None
+_client_api_key = None
+
+
+def get_anthropic_client():
+    """Get Anthropic client, returns None if API key not configured."""
+    global _client, _client_api_key
+
+    if fixture_store.mode == "replay":
+        return fixture_store.client()
+
+    api_key = os.getenv("ANTHROPIC_API_KEY")
+    if not api_key or api_key == "your_api_key_here":
+        return None
+
+    if _client is None or _client_api_key != api_key:
+        from anthropic import AsyncAnthropic
+        _client = AsyncAnthropic(api_key=api_key)
+        _client_api_key = api_key
+    if fixture_store.mode == "record":
+        return fixture_store.client(_client)
+    return _client
+
+
+def unavailable_reason(client, route: Optional[Dict]) -> Optional[str]:
+    """Why a call cannot go to the model, for tracing; None when it can."""
+    if client is None:
+        return "no_api_key"
+    if route is None:
+        return "quota_exhausted" if usage_meter.over_quota() else "rule_based_route"
+    return None
+
+
+def warm_up():
+    """Import the SDK (or load the replay fixtures) ahead of the first request."""
+    if fixture_store.mode == "replay":
+        fixture_store.load()
+        return
+    import anthropic  # noqa: F401
+
+
+async def create_message(client, route: Dict, **kwargs):
+    """
+    Call the model chosen by model routing and record latency and token usage
+    for the route and the caller. Extra keyword arguments are passed to messages.create.
+    """
+    with span("llm.create_message", route=route["route"], tier=route["tier"],
+              model=route["model"], max_tokens=route["max_tokens"]) as current:
+        started = time.perf_counter()
+        try:
+            response = await client.messages.create(
+                model=route["model"],
+                max_tokens=route["max_tokens"],
+                **kwargs
+            )
+        except asyncio.CancelledError:
+            # The request was abandoned (client gone or deadline passed); closing
+            # the upstream connection stops generation
+            cancellation_metrics.record_upstream_call(route)
+            current.set("cancelled", True)
+            raise
+        except Exception:
+            route_metrics.record_call(route, time.perf_counter() - started, error=True)
+            raise
+
+        usage = getattr(response, "usage", None)
+        input_tokens = getattr(usage, "input_tokens", 0) or 0
+        output_tokens = getattr(usage, "output_tokens", 0) or 0
+        route_metrics.record_call(
+            route,
+            time.perf_counter() - started,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+        )
+        usage_meter.record(route["route"], route["model"], input_tokens, output_tokens)
+        current.set("input_tokens", input_tokens)
+        current.set("output_tokens", output_tokens)
+        current.set("stop_reason", getattr(response, "stop_reason", None))
+        return response
@@ -0,0 +1,171 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+# off | record | replay. record passes calls through to the API and saves each
+# request/response pair; replay serves saved pairs and never needs an API key.
+LLM_FIXTURE_MODE = os.getenv("LLM_FIXTURE_MODE", "off").lower()
+# Empty: llm_fixtures.jsonl.gz next to the SQLite database
+LLM_FIXTURE_FILE = os.getenv("LLM_FIXTURE_FILE", "")
+# Sleep for the recorded upstream latency when replaying (scaled by this factor; 0 = no delay)
+LLM_REPLAY_LATENCY_SCALE = float(os.getenv("LLM_REPLAY_LATENCY_SCALE", "0"))
+
+FIXTURE_MODES = ("off", "record", "replay")
+DEFAULT_FIXTURE_FILENAME = "llm_fixtures.jsonl.gz"
+
+
+class FixtureMissError(Exception):
+    """Replay mode got a request that was never recorded."""
+
+
+def request_key(kwargs: Dict) -> str:
+    """Stable digest of everything sent to messages.create (model, max_tokens, system, messages...)."""
+    canonical = json.dumps(kwargs, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+
+def to_fixture(key: str, response, latency_ms: float) -> Dict:
+    usage = getattr(response, "usage", None)
+    return {
+        "key": key,
+        "model": getattr(response, "model", None),
+        "stop_reason": getattr(response, "stop_reason", None),
+        "content": [getattr(block, "text", "") for block in response.content],
+        "input_tokens": getattr(usage, "input_tokens", 0) or 0,
+        "output_tokens": getattr(usage, "output_tokens", 0) or 0,
+        "latency_ms": round(latency_ms, 1),
+    }
+
+
+def from_fixture(fixture: Dict):
+    """Rebuild an object with the attributes the services read from an SDK Message."""
+    return SimpleNamespace(
+        id=f"replay_{fixture['key']}",
+        type="message",
+        role="assistant",
+        model=fixture["model"],
+        stop_reason=fixture["stop_reason"],
+        content=[SimpleNamespace(type="text", text=text) for text in fixture["content"]],
+        usage=SimpleNamespace(input_tokens=fixture["input_tokens"], output_tokens=fixture["output_tokens"]),
+    )
+
+
+class FixtureStore:
+    """
+    Recorded model calls in one gzipped JSON-lines file, keyed by a digest of
+    the request. Each record appends a new gzip member, so the file is never
+    rewritten. A request recorded several times is replayed in recorded
+    order (staying on the last one), so repeated runs see the same sequence.
+    """
+
+    def __init__(self, path: str = LLM_FIXTURE_FILE, mode: str = LLM_FIXTURE_MODE,
+                 latency_scale: float = LLM_REPLAY_LATENCY_SCALE):
+        if mode not in FIXTURE_MODES:
+            raise ValueError(f"LLM_FIXTURE_MODE must be one of: {', '.join(FIXTURE_MODES)}")
+        self._path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.fixtures: Optional[Dict[str, List[Dict]]] = None
+        self.positions: Dict[str, int] = {}
+        self.write_lock = threading.Lock()
+        self.load_lock = threading.Lock()
+        self._client: Optional["FixtureClient"] = None
+        self.counters = {"recorded": 0, "replayed": 0, "misses": 0, "record_errors": 0}
+
+    @property
+    def path(self) -> str:
+        if not self._path:
+            from app.database import data_directory
+            self._path = os.path.join(data_directory(), DEFAULT_FIXTURE_FILENAME)
+        return self._path
+
+    def load(self) -> Dict[str, List[Dict]]:
+        """Read the fixture file once (blocking; done during warm-up in replay mode)."""
+        with self.load_lock:
+            if self.fixtures is None:
+                fixtures: Dict[str, List[Dict]] = {}
+                if os.path.exists(self.path):
+                    with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                        for line in f:
+                            fixture = json.loads(line)
+                            fixtures.setdefault(fixture["key"], []).append(fixture)
+                self.fixtures = fixtures
+            return self.fixtures
+
+    def reset(self):
+        """Start replaying every request from its first recording again."""
+        self.positions = {}
+
+    def _append(self, fixture: Dict):
+        line = json.dumps(fixture, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self.write_lock:
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write(line)
+
+    async def record(self, upstream, kwargs: Dict):
+        key = request_key(kwargs)
+        started = time.perf_counter()
+        response = await upstream.messages.create(**kwargs)
+        fixture = to_fixture(key, response, (time.perf_counter() - started) * 1000)
+        try:
+            await asyncio.to_thread(self._append, fixture)
+            self.counters["recorded"] += 1
+        except Exception as e:
+            self.counters["record_errors"] += 1
+            print(f"Fixture record error: {e}")
+        return response
+
+    async def replay(self, kwargs: Dict):
+        key = request_key(kwargs)
+        recorded = (self.fixtures if self.fixtures is not None else self.load()).get(key)
+        if not recorded:
+            self.counters["misses"] += 1
+            raise FixtureMissError(f"No recorded response for request {key} (model {kwargs.get('model')})")
+        position = self.positions.get(key, 0)
+        self.positions[key] = position + 1
+        fixture = recorded[min(position, len(recorded) - 1)]
+        if self.latency_scale > 0:
+            await asyncio.sleep(fixture["latency_ms"] / 1000 * self.latency_scale)
+        self.counters["replayed"] += 1
+        return from_fixture(fixture)
+
+    def client(self, upstream=None):
+        """A stand-in for the SDK client that records through `upstream`, or replays when it is None."""
+        if self._client is None or self._client.upstream is not upstream:
+            self._client = FixtureClient(self, upstream)
+        return self._client
+
+    def stats(self) -> Dict:
+        return {
+            **self.counters,
+            "mode": self.mode,
+            "file": self.path,
+            "recorded_requests": sum(len(v) for v in self.fixtures.values()) if self.fixtures is not None else None,
+            "latency_scale": self.latency_scale,
+        }
+
+
+class _FixtureMessages:
+    def __init__(self, store: FixtureStore, upstream):
+        self.store = store
+        self.upstream = upstream
+
+    async def create(self, **kwargs):
+        if self.upstream is None:
+            return await self.store.replay(kwargs)
+        return await self.store.record(self.upstream, kwargs)
+
+
+class FixtureClient:
+    def __init__(self, store: FixtureStore, upstream=None):
+        self.upstream = upstream
+        self.messages = _FixtureMessages(store, upstream)
+
+
+fixture_store = FixtureStore()
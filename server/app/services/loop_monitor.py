@@ -0,0 +1,189 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Dict, List, Optional
+
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() in ("1", "true", "yes")
+# How often the heartbeat task wakes up to measure scheduling lag
+LOOP_MONITOR_INTERVAL_SECONDS = float(os.getenv("LOOP_MONITOR_INTERVAL_SECONDS", "0.25"))
+# A loop that goes this long without running the heartbeat is reported as blocked
+LOOP_BLOCKING_THRESHOLD_SECONDS = float(os.getenv("LOOP_BLOCKING_THRESHOLD_SECONDS", "0.1"))
+
+# Upper bounds (seconds) of the lag histogram buckets
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+MAX_OFFENDERS = 200
+MAX_STACK_FRAMES = 20
+APP_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def format_stack(frame) -> List[str]:
+    return [
+        f"{summary.filename}:{summary.lineno} in {summary.name}"
+        for summary in traceback.extract_stack(frame)[-MAX_STACK_FRAMES:]
+    ]
+
+
+def offender_key(frame) -> str:
+    """The innermost frame in application code, or the innermost frame overall."""
+    innermost = None
+    while frame is not None:
+        location = f"{frame.f_code.co_filename}:{frame.f_lineno} in {frame.f_code.co_name}"
+        innermost = innermost or location
+        if frame.f_code.co_filename.startswith(APP_PATH):
+            return location
+        frame = frame.f_back
+    return innermost or "unknown"
+
+
+class LoopMonitor:
+    """
+    Measures event-loop lag with a heartbeat task and detects blocking calls
+    with a watchdog thread. When the heartbeat stalls past the threshold the
+    watchdog snapshots the loop thread's stack (sys._current_frames), so the
+    blocking call is caught while it is still running. Costs one short task
+    wake-up per interval and one thread wake-up per half threshold.
+    """
+
+    def __init__(self, interval: float = LOOP_MONITOR_INTERVAL_SECONDS,
+                 threshold: float = LOOP_BLOCKING_THRESHOLD_SECONDS,
+                 enabled: bool = LOOP_MONITOR_ENABLED):
+        self.interval = interval
+        self.threshold = threshold
+        self.enabled = enabled
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.loop_thread_id: Optional[int] = None
+        self.heartbeat: Optional[asyncio.Task] = None
+        self.watchdog: Optional[threading.Thread] = None
+        self.stopping = threading.Event()
+        self.last_beat = time.monotonic()
+        self.stall: Optional[Dict] = None
+        self.offenders: Dict[str, Dict] = {}
+        self.histogram = [0] * (len(LAG_BUCKETS) + 1)
+        self.samples = 0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+        self.blocked_events = 0
+
+    def start(self):
+        if not self.enabled or self.heartbeat is not None:
+            return
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self.stopping.clear()
+        self.heartbeat = asyncio.create_task(self._heartbeat(), name="loop-monitor")
+        self.watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self.watchdog.start()
+
+    async def stop(self):
+        if self.heartbeat is None:
+            return
+        self.stopping.set()
+        self.heartbeat.cancel()
+        try:
+            await self.heartbeat
+        except asyncio.CancelledError:
+            pass
+        self.heartbeat = None
+        self.watchdog.join(timeout=1)
+        self.watchdog = None
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.record_lag(max(0.0, now - expected))
+            previous_beat, self.last_beat = self.last_beat, now
+            stall, self.stall = self.stall, None
+            # Ignore a capture that raced with this heartbeat
+            if stall is not None and stall["beat"] == previous_beat:
+                self.finish_stall(stall, now)
+
+    def record_lag(self, lag: float):
+        self.samples += 1
+        self.lag_total += lag
+        self.lag_max = max(self.lag_max, lag)
+        bucket = next((i for i, bound in enumerate(LAG_BUCKETS) if lag <= bound), len(LAG_BUCKETS))
+        self.histogram[bucket] += 1
+
+    def _watch(self):
+        check_every = max(self.threshold / 2, 0.01)
+        while not self.stopping.wait(check_every):
+            if self.stall is not None:
+                continue
+            last_beat = self.last_beat
+            overdue = time.monotonic() - last_beat - self.interval
+            if overdue >= self.threshold:
+                self.stall = self.capture(last_beat, overdue)
+
+    def capture(self, last_beat: float, overdue: float) -> Dict:
+        frame = sys._current_frames().get(self.loop_thread_id)
+        task = None
+        try:
+            task = asyncio.current_task(self.loop)
+        except RuntimeError:
+            pass
+        return {
+            "key": offender_key(frame) if frame is not None else "unknown",
+            "stack": format_stack(frame) if frame is not None else [],
+            "task": task.get_name() if task is not None else None,
+            "detected_after_seconds": overdue,
+            "beat": last_beat,
+            "started_at": last_beat + self.interval,
+        }
+
+    def finish_stall(self, stall: Dict, now: float):
+        blocked = now - stall["started_at"]
+        self.blocked_events += 1
+        entry = self.offenders.get(stall["key"])
+        if entry is None:
+            if len(self.offenders) >= MAX_OFFENDERS:
+                # Make room by dropping the offender with the least blocked time
+                del self.offenders[min(self.offenders, key=lambda k: self.offenders[k]["blocked_seconds_total"])]
+            entry = self.offenders[stall["key"]] = {
+                "location": stall["key"],
+                "count": 0,
+                "blocked_seconds_total": 0.0,
+                "blocked_seconds_max": 0.0,
+                "last_task": None,
+                "stack": [],
+            }
+        entry["count"] += 1
+        entry["blocked_seconds_total"] += blocked
+        if blocked >= entry["blocked_seconds_max"]:
+            entry["blocked_seconds_max"] = blocked
+            entry["stack"] = stall["stack"]
+        entry["last_task"] = stall["task"]
+
+    def top_offenders(self, limit: int = 10) -> List[Dict]:
+        ranked = sorted(self.offenders.values(), key=lambda e: e["blocked_seconds_total"], reverse=True)
+        return [
+            {
+                **entry,
+                "blocked_seconds_total": round(entry["blocked_seconds_total"], 3),
+                "blocked_seconds_max": round(entry["blocked_seconds_max"], 3),
+            }
+            for entry in ranked[:limit]
+        ]
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "running": self.heartbeat is not None,
+            "interval_seconds": self.interval,
+            "blocking_threshold_seconds": self.threshold,
+            "samples": self.samples,
+            "avg_lag_seconds": round(self.lag_total / self.samples, 4) if self.samples else 0.0,
+            "max_lag_seconds": round(self.lag_max, 4),
+            "lag_buckets_seconds": list(LAG_BUCKETS) + ["+Inf"],
+            "lag_histogram": self.histogram,
+            "blocked_events": self.blocked_events,
+        }
+
+
+loop_monitor = LoopMonitor()
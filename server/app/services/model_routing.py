@@ -0,0 +1,150 @@
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.services.usage import usage_meter
+
+# Route table mapping each model-backed function to a tier and token budget.
+# Override with MODEL_ROUTES_FILE to tune routing without a code change.
+MODEL_ROUTES_FILE = os.getenv(
+    "MODEL_ROUTES_FILE",
+    str(Path(__file__).parent.parent / "data" / "model_routes.json")
+)
+
+# Tier name that sends a request to the keyword/rule-based path instead of a model
+RULE_BASED_TIER = "rule_based"
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0)
+
+RULE_CONDITIONS = {
+    "min_chars": lambda features, value: features["chars"] >= value,
+    "max_chars": lambda features, value: features["chars"] <= value,
+    "min_words": lambda features, value: features["words"] >= value,
+    "max_words": lambda features, value: features["words"] <= value,
+    "min_turns": lambda features, value: features["turns"] >= value,
+    "max_turns": lambda features, value: features["turns"] <= value,
+}
+
+
+@lru_cache(maxsize=None)
+def get_route_config() -> Dict:
+    with open(MODEL_ROUTES_FILE, "r") as f:
+        config = json.load(f)
+
+    for name, route in config["routes"].items():
+        for rule in [route] + route.get("rules", []):
+            tier = rule.get("tier")
+            if tier != RULE_BASED_TIER and tier not in config["tiers"]:
+                raise ValueError(f"Model route '{name}' uses unknown tier '{tier}'")
+            unknown = set(rule) - set(RULE_CONDITIONS) - {"tier", "max_tokens", "rules"}
+            if unknown:
+                raise ValueError(f"Model route '{name}' has unknown rule keys: {sorted(unknown)}")
+    return config
+
+
+def input_features(text: str, turns: int = 1) -> Dict[str, int]:
+    """Cheap size/complexity measures used by routing rules."""
+    return {
+        "chars": len(text),
+        "words": len(text.split()),
+        "turns": turns,
+    }
+
+
+def select_route(name: str, text: str, turns: int = 1) -> Optional[Dict]:
+    """
+    Pick the model and token budget for a call. The first matching rule wins,
+    otherwise the route's default applies. Returns None when the request should
+    use the rule-based path, either by rule or because the caller's daily
+    token quota is used up.
+    """
+    route = get_route_config()["routes"][name]
+    features = input_features(text, turns)
+
+    choice = route
+    for rule in route.get("rules", []):
+        conditions = {k: v for k, v in rule.items() if k in RULE_CONDITIONS}
+        if all(RULE_CONDITIONS[k](features, v) for k, v in conditions.items()):
+            choice = rule
+            break
+
+    tier = choice["tier"]
+    if tier == RULE_BASED_TIER or usage_meter.quota_exhausted():
+        route_metrics.record_rule_based(name)
+        return None
+
+    return {
+        "route": name,
+        "tier": tier,
+        "model": get_route_config()["tiers"][tier]["model"],
+        "max_tokens": choice.get("max_tokens", route["max_tokens"]),
+    }
+
+
+class RouteMetrics:
+    """Per-route, per-tier call counts, latency histogram and token totals."""
+
+    def __init__(self):
+        self.routes: Dict[str, Dict] = {}
+
+    def _entry(self, route: str, tier: str) -> Dict:
+        key = f"{route}:{tier}"
+        if key not in self.routes:
+            self.routes[key] = {
+                "route": route,
+                "tier": tier,
+                "calls": 0,
+                "errors": 0,
+                "latency_seconds_total": 0.0,
+                "latency_seconds_max": 0.0,
+                "latency_histogram": [0] * (len(LATENCY_BUCKETS) + 1),
+                "input_tokens": 0,
+                "output_tokens": 0,
+            }
+        return self.routes[key]
+
+    def record_rule_based(self, route: str):
+        self._entry(route, RULE_BASED_TIER)["calls"] += 1
+
+    def record_call(self, route: Dict, seconds: float, input_tokens: int = 0,
+                    output_tokens: int = 0, error: bool = False):
+        entry = self._entry(route["route"], route["tier"])
+        entry["calls"] += 1
+        if error:
+            entry["errors"] += 1
+        entry["latency_seconds_total"] += seconds
+        entry["latency_seconds_max"] = max(entry["latency_seconds_max"], seconds)
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), len(LATENCY_BUCKETS))
+        entry["latency_histogram"][bucket] += 1
+        entry["input_tokens"] += input_tokens
+        entry["output_tokens"] += output_tokens
+
+    def average_output_tokens(self, route: Dict) -> float:
+        """Mean output tokens of the route's successful calls so far (0 before any)."""
+        entry = self.routes.get(f"{route['route']}:{route['tier']}")
+        if entry is None:
+            return 0.0
+        completed = entry["calls"] - entry["errors"]
+        return entry["output_tokens"] / completed if completed > 0 else 0.0
+
+    def stats(self) -> Dict:
+        routes = []
+        for entry in self.routes.values():
+            calls = entry["calls"]
+            routes.append({
+                **entry,
+                "latency_seconds_total": round(entry["latency_seconds_total"], 3),
+                "latency_seconds_max": round(entry["latency_seconds_max"], 3),
+                "avg_latency_seconds": round(entry["latency_seconds_total"] / calls, 3) if calls else 0.0,
+                "avg_output_tokens": round(entry["output_tokens"] / calls, 1) if calls else 0.0,
+            })
+        return {
+            "latency_buckets_seconds": list(LATENCY_BUCKETS) + ["+Inf"],
+            "routes": routes,
+        }
+
+
+route_metrics = RouteMetrics()
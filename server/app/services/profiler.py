@@ -0,0 +1,181 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+# Sampling backs off so that taking samples stays under this share of wall time
+PROFILER_MAX_OVERHEAD = float(os.getenv("PROFILER_MAX_OVERHEAD", "0.05"))
+
+MIN_INTERVAL_SECONDS = 0.001
+MAX_STACK_DEPTH = 64
+HOT_PATH_PREFIXES = ("app.routers", "app.services")
+
+# Innermost frames that mean a thread is waiting rather than running Python code
+IDLE_FRAMES = {
+    ("selectors", "select"),
+    ("threading", "wait"),
+    ("threading", "_wait_for_tstate_lock"),
+    ("queue", "get"),
+    ("concurrent.futures.thread", "_worker"),
+}
+# With an event loop written in C (uvloop, which uvicorn[standard] uses) the
+# loop's select and callback dispatch have no Python frames: an idle loop
+# thread's innermost Python frame is the call that started the loop. Python
+# code run by the loop always adds frames above it. Used where per-thread CPU
+# clocks are unavailable.
+LOOP_ENTRYPOINT_FRAMES = {
+    ("asyncio.runners", "run"),
+    ("asyncio.base_events", "run_until_complete"),
+    ("asyncio.base_events", "run_forever"),
+    ("uvloop", "run"),
+}
+IDLE_FRAMES |= LOOP_ENTRYPOINT_FRAMES
+# A thread that used less CPU than this share of the time since the previous
+# tick is idle, whatever its stack shows
+IDLE_CPU_SHARE = 0.1
+
+
+class ProfilerBusyError(Exception):
+    pass
+
+
+def frame_label(frame) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}"
+
+
+def thread_cpu_clock(ident: int) -> Optional[int]:
+    """The CPU-time clock of a thread, where the platform has one (Unix)."""
+    try:
+        return time.pthread_getcpuclockid(ident)
+    except (AttributeError, OSError):
+        return None
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for the live process. A thread snapshots every other
+    thread's stack (sys._current_frames) at a fixed interval and aggregates
+    the samples into collapsed stacks (one "frame;frame;frame count" line per
+    distinct stack, the input format of flamegraph.pl and speedscope). Idle
+    samples are counted separately so the remaining samples approximate CPU
+    time: a thread is idle when its CPU clock barely advanced since the
+    previous tick, which also covers event loops written in C, or when it is
+    parked in select or a lock wait. Only one profile runs at a time.
+    """
+
+    def __init__(self, enabled: bool = PROFILER_ENABLED, max_seconds: float = PROFILER_MAX_SECONDS,
+                 max_overhead: float = PROFILER_MAX_OVERHEAD):
+        self.enabled = enabled
+        self.max_seconds = max_seconds
+        self.max_overhead = max_overhead
+        self.lock = threading.Lock()
+        self.runs = 0
+
+    def run(self, seconds: float, interval: float, route_index: Optional[Dict] = None) -> Dict:
+        """Sample for `seconds` (blocking; call from a worker thread)."""
+        if not self.lock.acquire(blocking=False):
+            raise ProfilerBusyError("A profile is already running")
+        try:
+            return self._run(min(seconds, self.max_seconds), max(interval, MIN_INTERVAL_SECONDS), route_index or {})
+        finally:
+            self.lock.release()
+
+    def _run(self, seconds: float, interval: float, route_index: Dict) -> Dict:
+        self.runs += 1
+        own_ident = threading.get_ident()
+        stacks: Counter = Counter()
+        routes: Counter = Counter()
+        hot_paths: Counter = Counter()
+        samples = idle_samples = ticks = 0
+        sampling_seconds = 0.0
+        cpu_seen: Dict[int, float] = {}
+        previous_tick = None
+
+        started = time.perf_counter()
+        deadline = started + seconds
+        while time.perf_counter() < deadline:
+            tick_started = time.perf_counter()
+            wall = tick_started - previous_tick if previous_tick is not None else None
+            previous_tick = tick_started
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                samples += 1
+                idle = (frame.f_globals.get("__name__"), frame.f_code.co_name) in IDLE_FRAMES
+                clock = thread_cpu_clock(ident)
+                if clock is not None:
+                    try:
+                        cpu = time.clock_gettime(clock)
+                    except OSError:
+                        # The thread exited since the snapshot
+                        cpu_seen.pop(ident, None)
+                    else:
+                        previous_cpu, cpu_seen[ident] = cpu_seen.get(ident), cpu
+                        if previous_cpu is not None and wall:
+                            idle = idle or cpu - previous_cpu < IDLE_CPU_SHARE * wall
+                if idle:
+                    idle_samples += 1
+                    continue
+
+                labels = []
+                route = None
+                hot_path = None
+                depth = 0
+                while frame is not None and depth < MAX_STACK_DEPTH:
+                    label = frame_label(frame)
+                    labels.append(label)
+                    if hot_path is None and label.startswith(HOT_PATH_PREFIXES):
+                        hot_path = label
+                    route = route_index.get(frame.f_code, route)
+                    frame = frame.f_back
+                    depth += 1
+
+                labels.append(names.get(ident, f"thread-{ident}"))
+                stacks[";".join(reversed(labels))] += 1
+                routes[route or "(no route)"] += 1
+                if hot_path:
+                    hot_paths[hot_path] += 1
+            ticks += 1
+
+            cost = time.perf_counter() - tick_started
+            sampling_seconds += cost
+            # Sleep long enough that sampling cost stays within the overhead budget
+            time.sleep(max(interval - cost, cost / self.max_overhead - cost, 0))
+
+        elapsed = time.perf_counter() - started
+        busy_samples = samples - idle_samples
+        return {
+            "seconds": round(elapsed, 3),
+            "ticks": ticks,
+            "effective_interval_ms": round(elapsed / ticks * 1000, 3) if ticks else None,
+            "samples": samples,
+            "idle_samples": idle_samples,
+            "busy_samples": busy_samples,
+            "overhead_ratio": round(sampling_seconds / elapsed, 4) if elapsed else 0.0,
+            "routes": [
+                {"route": route, "samples": count, "share": round(count / busy_samples, 4)}
+                for route, count in routes.most_common()
+            ],
+            "hot_paths": [
+                {"function": function, "samples": count, "share": round(count / busy_samples, 4)}
+                for function, count in hot_paths.most_common(50)
+            ],
+            "collapsed": [f"{stack} {count}" for stack, count in stacks.most_common()],
+        }
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "running": self.lock.locked(),
+            "runs": self.runs,
+            "max_seconds": self.max_seconds,
+            "max_overhead": self.max_overhead,
+        }
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,404 @@
+import asyncio
+import heapq
+import os
+import re
+import time
+import weakref
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+REMINDERS_ENABLED = os.getenv("REMINDERS_ENABLED", "true").lower() in ("1", "true", "yes")
+# How far ahead the scheduler loads pending reminders into its in-memory heap
+REMINDER_WINDOW_SECONDS = float(os.getenv("REMINDER_WINDOW_SECONDS", "3600"))
+# Most reminders held in the heap at once; later ones stay in the database until the heap drains
+REMINDER_HEAP_LIMIT = int(os.getenv("REMINDER_HEAP_LIMIT", "100000"))
+# Longest the dispatcher sleeps between checks for new windows
+REMINDER_POLL_SECONDS = float(os.getenv("REMINDER_POLL_SECONDS", "30"))
+
+LOAD_BATCH_SIZE = 5000
+DISPATCH_BATCH_SIZE = 500
+
+# Used when a suggested time cannot be parsed
+DEFAULT_SUGGESTED_TIME = "tomorrow morning"
+
+_NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "few": 3, "a few": 3, "couple": 2,
+    "a couple": 2, "a couple of": 2, "couple of": 2,
+}
+_UNITS = {"minute": 60, "min": 60, "hour": 3600, "hr": 3600, "day": 86400, "week": 7 * 86400, "month": 30 * 86400}
+_WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+# Local hour used for a part of the day
+_PARTS_OF_DAY = {"morning": 9, "noon": 12, "lunch": 12, "afternoon": 14, "evening": 19, "tonight": 20, "night": 21}
+
+_RELATIVE = re.compile(
+    r"\bin\s+(a couple of|a couple|couple of|a few|an?|few|couple|one|two|three|four|five|six|seven|eight|nine|ten|\d+)"
+    r"\s+(minute|min|hour|hr|day|week|month)s?\b"
+)
+_CLOCK = re.compile(r"\b(?:at\s+)?(\d{1,2})(?::(\d{2}))?\s*(am|pm)\b|\b(?:at\s+)?(\d{1,2}):(\d{2})\b")
+_PART_OF_DAY = re.compile(r"\b(" + "|".join(_PARTS_OF_DAY) + r")\b")
+_WEEKDAY = re.compile(r"\b(" + "|".join(_WEEKDAYS) + r")\b")
+
+
+def parse_suggested_time(text: str, now: datetime, tz_offset_minutes: int = 0) -> Optional[datetime]:
+    """
+    Turn a suggested time like "tomorrow morning", "in 3 days", "next monday
+    at 5pm" or "this evening" into a UTC timestamp. tz_offset_minutes is the
+    user's offset from UTC, so parts of the day are in their local time.
+    Returns None when nothing in the text is recognized.
+    """
+    text = (text or "").lower().strip()
+    if not text:
+        return None
+    offset = timedelta(minutes=tz_offset_minutes)
+    local_now = now + offset
+
+    relative = _RELATIVE.search(text)
+    if relative:
+        amount, unit = relative.groups()
+        count = int(amount) if amount.isdigit() else _NUMBER_WORDS[amount]
+        due = now + timedelta(seconds=count * _UNITS[unit])
+        # "in 3 days" with a part of the day lands at that local hour
+        part = _PART_OF_DAY.search(text)
+        if part and unit in ("day", "week", "month"):
+            local = due + offset
+            due = local.replace(hour=_PARTS_OF_DAY[part.group(1)], minute=0, second=0, microsecond=0) - offset
+        return due
+
+    if "later today" in text or "in a bit" in text or text == "later":
+        return now + timedelta(hours=3)
+    if text in ("soon", "in a while"):
+        return now + timedelta(hours=1)
+
+    day: Optional[int] = None  # days from the local date
+    if "day after tomorrow" in text:
+        day = 2
+    elif "tomorrow" in text:
+        day = 1
+    elif "next week" in text:
+        day = 7
+    elif "weekend" in text:
+        day = (5 - local_now.weekday()) % 7 or 7
+    elif "end of the week" in text or "end of week" in text:
+        day = (4 - local_now.weekday()) % 7
+    elif "today" in text or "tonight" in text or "this " in text:
+        day = 0
+    else:
+        weekday = _WEEKDAY.search(text)
+        if weekday:
+            day = (_WEEKDAYS.index(weekday.group(1)) - local_now.weekday()) % 7 or 7
+
+    hour, minute = None, 0
+    clock = _CLOCK.search(text)
+    if clock:
+        if clock.group(3):
+            hour = int(clock.group(1)) % 12 + (12 if clock.group(3) == "pm" else 0)
+            minute = int(clock.group(2) or 0)
+        else:
+            hour, minute = int(clock.group(4)), int(clock.group(5))
+        if hour > 23 or minute > 59:
+            hour, minute = None, 0
+    if hour is None:
+        part = _PART_OF_DAY.search(text)
+        if part:
+            hour = _PARTS_OF_DAY[part.group(1)]
+        elif "end of the day" in text or "after work" in text:
+            hour = 17
+
+    if day is None and hour is None:
+        return None
+    if hour is None:
+        hour = _PARTS_OF_DAY["morning"] if day else local_now.hour + 3
+    local_due = (local_now + timedelta(days=day or 0)).replace(hour=min(hour, 23), minute=minute, second=0, microsecond=0)
+    # A time of day that has already passed means the next one
+    while local_due <= local_now:
+        local_due += timedelta(days=1)
+    return local_due - offset
+
+
+def serialize_reminder(row: Dict) -> Dict:
+    return {
+        "id": row["id"],
+        "text": row["text"],
+        "category": row["category"],
+        "suggested_time": row["suggested_time"],
+        "due_at": row["due_at"].isoformat(),
+        "status": row["status"],
+        "created_at": row["created_at"].isoformat(),
+    }
+
+
+HeapEntry = Tuple[datetime, int, str]  # (due_at, reminder id, user id)
+
+
+class ReminderScheduler:
+    """
+    Dispatches stored reminders when they fall due.
+
+    Reminders live in the reminders table; only those due within the next
+    window (REMINDER_WINDOW_SECONDS, at most REMINDER_HEAP_LIMIT of them) are
+    held in a min-heap keyed by due time. The window is loaded as a range
+    scan over the (status, due_at) index, continuing from a (due_at, id)
+    cursor, so pending reminders far in the future cost nothing until they
+    come close. New reminders that fall inside the loaded window are pushed
+    onto the heap directly (O(log n)).
+
+    When a reminder is due its row moves to "due" and the user's waiters
+    (long-poll and SSE connections) are woken. Delivery is at-least-once:
+    due reminders are returned until the client acknowledges them.
+    """
+
+    def __init__(self, window_seconds: float = REMINDER_WINDOW_SECONDS, heap_limit: int = REMINDER_HEAP_LIMIT,
+                 poll_seconds: float = REMINDER_POLL_SECONDS, enabled: bool = REMINDERS_ENABLED):
+        self.window = timedelta(seconds=window_seconds)
+        self.heap_limit = heap_limit
+        self.poll_seconds = poll_seconds
+        self.enabled = enabled
+        self.heap: List[HeapEntry] = []
+        self.queued = set()
+        # Everything up to this (due_at, id) key is on the heap or already dispatched
+        self.cursor: Tuple[datetime, int] = (datetime.min, 0)
+        self.loading = False
+        self.wake: Optional[asyncio.Event] = None
+        self.dispatcher: Optional[asyncio.Task] = None
+        self.signals: "weakref.WeakValueDictionary[str, asyncio.Event]" = weakref.WeakValueDictionary()
+        self.counters = {"created": 0, "loaded": 0, "dispatched": 0, "delivered": 0, "cancelled": 0,
+                         "window_loads": 0, "dispatch_errors": 0}
+        self.max_lag_seconds = 0.0
+
+    async def start(self):
+        if not self.enabled or self.dispatcher is not None:
+            return
+        self.wake = asyncio.Event()
+        self.dispatcher = asyncio.create_task(self._dispatch_loop(), name="reminder-dispatcher")
+
+    async def stop(self):
+        if self.dispatcher is None:
+            return
+        self.dispatcher.cancel()
+        await asyncio.gather(self.dispatcher, return_exceptions=True)
+        self.dispatcher = None
+        self.heap, self.queued, self.cursor = [], set(), (datetime.min, 0)
+
+    def _push(self, entry: HeapEntry):
+        if entry[1] in self.queued:
+            return
+        self.queued.add(entry[1])
+        heapq.heappush(self.heap, entry)
+        # A new earliest reminder shortens the dispatcher's sleep
+        if self.heap[0] is entry and self.wake is not None:
+            self.wake.set()
+
+    # Database access (blocking; run in a thread)
+
+    def _insert(self, values: Dict) -> Dict:
+        from app.database import get_engine
+        from app.models import reminders
+
+        with get_engine().begin() as conn:
+            inserted = conn.execute(reminders.insert().values(**values))
+        return {**values, "id": inserted.inserted_primary_key[0]}
+
+    def _load_window(self, after: Tuple[datetime, int], until: datetime, limit: int) -> List[HeapEntry]:
+        from sqlalchemy import and_, or_, select
+        from app.database import get_engine
+        from app.models import reminders as table
+
+        due_at, after_id = after
+        query = (
+            select(table.c.due_at, table.c.id, table.c.user_id)
+            .where(table.c.status == "pending")
+            .where(or_(table.c.due_at > due_at, and_(table.c.due_at == due_at, table.c.id > after_id)))
+            .where(table.c.due_at < until)
+            .order_by(table.c.due_at, table.c.id)
+            .limit(limit)
+        )
+        with get_engine().connect() as conn:
+            return [tuple(row) for row in conn.execute(query)]
+
+    def _mark_due(self, ids: List[int], now: datetime) -> int:
+        from app.database import get_engine
+        from app.models import reminders as table
+
+        with get_engine().begin() as conn:
+            return conn.execute(
+                table.update()
+                .where(table.c.id.in_(ids))
+                .where(table.c.status == "pending")
+                .values(status="due", dispatched_at=now)
+            ).rowcount
+
+    def _set_status(self, user_id: str, ids: List[int], from_statuses: Tuple[str, ...], status: str) -> int:
+        from app.database import get_engine
+        from app.models import reminders as table
+
+        with get_engine().begin() as conn:
+            return conn.execute(
+                table.update()
+                .where(table.c.user_id == user_id)
+                .where(table.c.id.in_(ids))
+                .where(table.c.status.in_(from_statuses))
+                .values(status=status)
+            ).rowcount
+
+    def _list(self, user_id: str, status: str, after_id: int, limit: int) -> List[Dict]:
+        from app.database import get_engine
+        from app.models import reminders as table
+
+        query = (
+            table.select()
+            .where(table.c.user_id == user_id)
+            .where(table.c.status == status)
+            .where(table.c.id > after_id)
+            .order_by(table.c.id)
+            .limit(limit)
+        )
+        with get_engine().connect() as conn:
+            return [serialize_reminder(row) for row in conn.execute(query).mappings()]
+
+    def _list_due(self, user_id: str, exclude: Optional[set], limit: int) -> List[Dict]:
+        """Up to `limit` due reminders not in `exclude`, paging past the excluded ones."""
+        items: List[Dict] = []
+        after_id = 0
+        while True:
+            page = self._list(user_id, "due", after_id, limit)
+            items.extend(item for item in page if not exclude or item["id"] not in exclude)
+            if len(items) >= limit or len(page) < limit:
+                return items[:limit]
+            after_id = page[-1]["id"]
+
+    # Scheduling
+
+    async def create(self, user_id: str, text: str, category: str, suggested_time: Optional[str],
+                     due_at: datetime) -> Dict:
+        now = datetime.utcnow()
+        row = await asyncio.to_thread(self._insert, {
+            "user_id": user_id, "text": text, "category": category, "suggested_time": suggested_time,
+            "due_at": due_at, "status": "pending", "created_at": now, "dispatched_at": None,
+        })
+        self.counters["created"] += 1
+        # Beyond the loaded window it is picked up by a later window load
+        if self.dispatcher is not None and (self.loading or (due_at, row["id"]) <= self.cursor):
+            self._push((due_at, row["id"], user_id))
+        return serialize_reminder(row)
+
+    async def _refill(self, now: datetime):
+        """Load the next part of the window if the heap has room and the cursor is behind it."""
+        until = now + self.window
+        while self.cursor[0] < until and len(self.heap) < self.heap_limit:
+            limit = min(LOAD_BATCH_SIZE, self.heap_limit - len(self.heap))
+            self.loading = True
+            try:
+                rows = await asyncio.to_thread(self._load_window, self.cursor, until, limit)
+            finally:
+                self.loading = False
+            self.counters["window_loads"] += 1
+            for entry in rows:
+                self._push(entry)
+            self.counters["loaded"] += len(rows)
+            if len(rows) < limit:
+                # Everything due before `until` is loaded
+                self.cursor = (until, -1)
+                return
+            self.cursor = (rows[-1][0], rows[-1][1])
+
+    async def _dispatch_due(self, now: datetime):
+        batch = []
+        while self.heap and self.heap[0][0] <= now and len(batch) < DISPATCH_BATCH_SIZE:
+            entry = heapq.heappop(self.heap)
+            self.queued.discard(entry[1])
+            batch.append(entry)
+        if not batch:
+            return
+        try:
+            self.counters["dispatched"] += await asyncio.to_thread(self._mark_due, [entry[1] for entry in batch], now)
+        except Exception as e:
+            self.counters["dispatch_errors"] += 1
+            print(f"Reminder dispatch error: {e}")
+            for entry in batch:
+                self._push(entry)
+            await asyncio.sleep(1)
+            return
+        self.max_lag_seconds = max(self.max_lag_seconds, (now - batch[0][0]).total_seconds())
+        for user_id in {entry[2] for entry in batch}:
+            self.notify(user_id)
+
+    async def _dispatch_loop(self):
+        while True:
+            try:
+                now = datetime.utcnow()
+                await self._refill(now)
+                await self._dispatch_due(now)
+            except Exception as e:
+                self.counters["dispatch_errors"] += 1
+                print(f"Reminder scheduler error: {e}")
+
+            now = datetime.utcnow()
+            timeout = self.poll_seconds
+            if self.heap:
+                timeout = min(timeout, max((self.heap[0][0] - now).total_seconds(), 0))
+            self.wake.clear()
+            if timeout > 0:
+                try:
+                    await asyncio.wait_for(self.wake.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+    # Delivery
+
+    def notify(self, user_id: str):
+        event = self.signals.pop(user_id, None)
+        if event is not None:
+            event.set()
+
+    async def due(self, user_id: str, wait: float = 0, exclude: Optional[set] = None, limit: int = 100) -> List[Dict]:
+        """
+        The user's dispatched, unacknowledged reminders, leaving out ids in
+        `exclude`. With `wait`, long-poll until one is dispatched or the wait elapses.
+        Reminders fall due out of id order, so excluded ids are skipped by paging
+        rather than by starting after the largest one.
+        """
+        deadline = time.monotonic() + wait
+        while True:
+            # Register before reading so a dispatch between the read and the wait is not missed
+            event = self.signals.get(user_id)
+            if event is None:
+                event = self.signals[user_id] = asyncio.Event()
+            items = await asyncio.to_thread(self._list_due, user_id, exclude, limit)
+            remaining = deadline - time.monotonic()
+            if items or remaining <= 0:
+                return items
+            try:
+                await asyncio.wait_for(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    async def acknowledge(self, user_id: str, ids: List[int]) -> int:
+        delivered = await asyncio.to_thread(self._set_status, user_id, ids, ("due",), "delivered")
+        self.counters["delivered"] += delivered
+        return delivered
+
+    async def cancel(self, user_id: str, reminder_id: int) -> bool:
+        # A cancelled reminder left on the heap is skipped by the conditional update in _mark_due
+        cancelled = await asyncio.to_thread(self._set_status, user_id, [reminder_id], ("pending", "due"), "cancelled")
+        self.counters["cancelled"] += cancelled
+        return bool(cancelled)
+
+    async def list_reminders(self, user_id: str, status: str = "pending", after_id: int = 0, limit: int = 100) -> List[Dict]:
+        return await asyncio.to_thread(self._list, user_id, status, after_id, limit)
+
+    def stats(self) -> Dict:
+        return {
+            **self.counters,
+            "enabled": self.enabled,
+            "running": self.dispatcher is not None,
+            "heap_size": len(self.heap),
+            "heap_limit": self.heap_limit,
+            "loaded_until": self.cursor[0].isoformat() if self.cursor[0] != datetime.min else None,
+            "next_due": self.heap[0][0].isoformat() if self.heap else None,
+            "waiting_users": len(self.signals),
+            "max_lag_seconds": round(self.max_lag_seconds, 3),
+        }
+
+
+reminder_scheduler = ReminderScheduler()
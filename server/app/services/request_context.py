@@ -0,0 +1,23 @@
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+# Per-request identity, set by RequestContextMiddleware and visible to services
+# (including tasks spawned while handling the request)
+current_request: ContextVar[Optional[Dict]] = ContextVar("current_request", default=None)
+
+
+def get_user_id() -> Optional[str]:
+    context = current_request.get()
+    return context["user_id"] if context else None
+
+
+def get_caller_key() -> str:
+    """Stable key for the caller: the signed-in user, else the client address."""
+    context = current_request.get()
+    if not context:
+        return "anonymous"
+    if context["user_id"]:
+        return f"user:{context['user_id']}"
+    if context["client_host"]:
+        return f"ip:{context['client_host']}"
+    return "anonymous"
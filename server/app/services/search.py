@@ -0,0 +1,169 @@
+import hashlib
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+MAX_QUERY_TERMS = 12
+SNIPPET_TOKENS = 12
+_TERM = re.compile(r"\w+", re.UNICODE)
+_TAG_UNSAFE = re.compile(r"[^a-z0-9_]+")
+
+_INDEX_SQL = "INSERT INTO history_fts (rowid, body, tags) VALUES (:id, :body, :tags)"
+
+# FTS5's built-in rank column, with bm25 weighting body only (tags just filter);
+# ordering by rank or rowid lets FTS5 sort internally instead of in a temp b-tree
+_SEARCH_SQL = """
+SELECT h.id, h.kind, h.input, h.result, h.created_at,
+       history_fts.rank AS score,
+       snippet(history_fts, 0, '[', ']', '...', {snippet_tokens}) AS snippet
+FROM history_fts
+JOIN history AS h ON h.id = history_fts.rowid
+WHERE history_fts MATCH :match AND history_fts.rank MATCH 'bm25(1.0, 0.0)' {date_filters}
+ORDER BY {order}
+LIMIT :limit OFFSET :offset
+"""
+
+
+def tag(prefix: str, value: str) -> str:
+    return f"{prefix}_{_TAG_UNSAFE.sub('_', str(value).lower()).strip('_')}"
+
+
+def owner_tag(user_id: str) -> str:
+    # User ids contain punctuation the tokenizer would split on
+    return "u_" + hashlib.sha1(user_id.encode()).hexdigest()[:16]
+
+
+def build_document(user_id: str, kind: str, input_text: str, result: Dict) -> Tuple[str, str]:
+    """The searchable body and the filter tags for one history entry."""
+    body = [input_text]
+    tags = [owner_tag(user_id), tag("k", kind)]
+
+    if kind == "analysis":
+        tags += [tag("d", d["id"]) for d in result.get("identified_distortions", []) if d.get("id")]
+    elif kind == "categorization":
+        body.append(result.get("key_phrase", ""))
+    elif kind == "summary":
+        # The summary and action items are searched rather than the raw transcript
+        body = [result.get("summary", ""), *result.get("action_items", [])]
+
+    tags += [tag("t", theme) for theme in result.get("themes", [])]
+    tags += [tag("e", emotion) for emotion in result.get("emotions", [])]
+    return "\n".join(part for part in body if part), " ".join(tags)
+
+
+def index_entry(conn, entry_id: int, user_id: str, kind: str, input_text: str, result: Dict):
+    """Add a history row to the full-text index, in the caller's transaction."""
+    from sqlalchemy import text
+    from app.database import is_sqlite
+
+    if not is_sqlite():
+        return
+    body, tags = build_document(user_id, kind, input_text, result)
+    conn.execute(text(_INDEX_SQL), {"id": entry_id, "body": body, "tags": tags})
+
+
+def match_expression(query: str, user_id: str, kind: Optional[str] = None,
+                     distortion: Optional[str] = None, theme: Optional[str] = None) -> str:
+    """
+    Build an FTS5 MATCH expression from free text and filters. Query words are
+    quoted so user input cannot inject FTS syntax; the last word is
+    prefix-matched to support search-as-you-type.
+    """
+    filters = [owner_tag(user_id)]
+    if kind:
+        filters.append(tag("k", kind))
+    if distortion:
+        filters.append(tag("d", distortion))
+    if theme:
+        filters.append(tag("t", theme))
+    expression = " AND ".join(f"tags:{value}" for value in filters)
+
+    terms = _TERM.findall(query.lower())[:MAX_QUERY_TERMS]
+    if terms:
+        quoted = [f'"{term}"' for term in terms]
+        quoted[-1] += "*"
+        expression += f" AND body:({' AND '.join(quoted)})"
+    return expression
+
+
+def _format_datetime(value: datetime) -> str:
+    # Same text form SQLAlchemy's SQLite DateTime type stores
+    return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def search_history(user_id: str, query: str = "", kind: Optional[str] = None,
+                   distortion: Optional[str] = None, theme: Optional[str] = None,
+                   since: Optional[datetime] = None, until: Optional[datetime] = None,
+                   limit: int = 20, offset: int = 0) -> Dict:
+    """Ranked, paginated search over one user's history (blocking; run in a thread)."""
+    from sqlalchemy import DateTime, JSON, text
+    from app.database import get_engine, is_sqlite
+
+    if not is_sqlite():
+        return _search_history_like(user_id, query, kind, since, until, limit, offset)
+
+    params = {
+        "match": match_expression(query, user_id, kind, distortion, theme),
+        "limit": limit + 1,
+        "offset": offset,
+    }
+    date_filters = ""
+    if since is not None:
+        date_filters += " AND h.created_at >= :since"
+        params["since"] = _format_datetime(since)
+    if until is not None:
+        date_filters += " AND h.created_at < :until"
+        params["until"] = _format_datetime(until)
+
+    # Without search words every match ties, so show the newest first
+    order = "history_fts.rank" if _TERM.search(query) else "history_fts.rowid DESC"
+    sql = text(_SEARCH_SQL.format(snippet_tokens=SNIPPET_TOKENS, date_filters=date_filters, order=order))
+    sql = sql.columns(result=JSON, created_at=DateTime)
+
+    with get_engine().connect() as conn:
+        rows = conn.execute(sql, params).mappings().all()
+
+    return _page(rows, limit, offset)
+
+
+def _search_history_like(user_id: str, query: str, kind: Optional[str], since: Optional[datetime],
+                         until: Optional[datetime], limit: int, offset: int) -> Dict:
+    """Substring search for databases without FTS5; distortion and theme filters are not applied."""
+    from app.database import get_engine
+    from app.models import history
+
+    statement = history.select().where(history.c.user_id == user_id)
+    for term in _TERM.findall(query)[:MAX_QUERY_TERMS]:
+        statement = statement.where(history.c.input.ilike(f"%{term}%"))
+    if kind:
+        statement = statement.where(history.c.kind == kind)
+    if since is not None:
+        statement = statement.where(history.c.created_at >= since)
+    if until is not None:
+        statement = statement.where(history.c.created_at < until)
+    statement = statement.order_by(history.c.id.desc()).limit(limit + 1).offset(offset)
+
+    with get_engine().connect() as conn:
+        rows = [{**row, "score": None, "snippet": row["input"][:200]} for row in conn.execute(statement).mappings()]
+    return _page(rows, limit, offset)
+
+
+def _page(rows: List, limit: int, offset: int) -> Dict:
+    results = []
+    for row in rows[:limit]:
+        created_at = row["created_at"]
+        results.append({
+            "id": row["id"],
+            "kind": row["kind"],
+            "created_at": created_at.isoformat() if isinstance(created_at, datetime) else created_at,
+            "input": row["input"],
+            "snippet": row["snippet"],
+            "score": round(-row["score"], 4) if row["score"] is not None else None,
+            "result": row["result"],
+        })
+    return {
+        "results": results,
+        "offset": offset,
+        "limit": limit,
+        "has_more": len(rows) > limit,
+    }
@@ -0,0 +1,248 @@
+import os
+import random
+import re
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+SIMILARITY_CACHE_ENABLED = os.getenv("SIMILARITY_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+SIMILARITY_CACHE_THRESHOLD = float(os.getenv("SIMILARITY_CACHE_THRESHOLD", "0.7"))
+# Share of content words (Jaccard) a near match must have in common with the stored thought
+SIMILARITY_CACHE_CONTENT_SIMILARITY = float(os.getenv("SIMILARITY_CACHE_CONTENT_SIMILARITY", "0.75"))
+SIMILARITY_CACHE_MAX_ENTRIES = int(os.getenv("SIMILARITY_CACHE_MAX_ENTRIES", "2000"))
+SIMILARITY_CACHE_TTL_SECONDS = int(os.getenv("SIMILARITY_CACHE_TTL_SECONDS", "86400"))
+
+# 64 MinHash permutations split into 16 LSH bands of 4 rows. Two texts with
+# Jaccard similarity s share at least one band with probability 1 - (1 - s^4)^16:
+# ~99% at s=0.7, ~64% at s=0.5 and ~12% at s=0.3.
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Fixed seed so signatures are stable across restarts
+_rng = random.Random(1337)
+_PERMUTATIONS = [
+    (_rng.randint(1, _MERSENNE_PRIME - 1), _rng.randint(0, _MERSENNE_PRIME - 1))
+    for _ in range(NUM_PERM)
+]
+
+_NON_WORD = re.compile(r"[^a-z0-9' ]+")
+_SPACES = re.compile(r"\s+")
+
+CONTRACTIONS = {
+    "i'm": "i am", "can't": "can not", "cannot": "can not", "won't": "will not",
+    "don't": "do not", "doesn't": "does not", "didn't": "did not", "isn't": "is not",
+    "aren't": "are not", "wasn't": "was not", "i've": "i have", "i'll": "i will",
+    "i'd": "i would", "it's": "it is", "that's": "that is", "they're": "they are",
+    "shouldn't": "should not", "couldn't": "could not", "wouldn't": "would not",
+}
+
+# Words that flip a thought's meaning
+NEGATIONS = frozenset({"not", "no", "never", "nothing", "nobody", "none", "neither", "nor"})
+
+# Function words a near-duplicate may add, drop or reorder freely. The other
+# (content) words of two texts must mostly agree, so text written for one
+# thought ("One fight does not mean Mark will leave") is not served for a
+# thought about someone or something else.
+FILLER_WORDS = frozenset({
+    "a", "an", "the", "and", "or", "but", "so", "just", "really", "very", "too", "also", "even",
+    "i", "me", "my", "myself", "am", "is", "are", "was", "were", "be", "been", "being",
+    "it", "this", "that", "to", "of", "in", "on", "at", "for", "with", "about", "like",
+    "do", "does", "did", "have", "has", "had", "will", "would", "all", "some", "much",
+})
+
+
+def normalize(text: str) -> str:
+    """Lowercase, expand common contractions, drop punctuation and collapse whitespace."""
+    text = _NON_WORD.sub(" ", text.lower().replace("\u2019", "'"))
+    words = [CONTRACTIONS.get(word, word) for word in text.split()]
+    return _SPACES.sub(" ", " ".join(words)).strip()
+
+
+def shingles(normalized: str) -> Set[int]:
+    """
+    Hashed word unigrams and bigrams. Unigrams tolerate inserted or dropped
+    words ("mess up" vs "mess everything up"); bigrams keep some word order.
+    """
+    words = normalized.split() or [""]
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    return {zlib.crc32(gram.encode()) for gram in grams}
+
+
+def minhash(shingle_hashes: Set[int]) -> Tuple[int, ...]:
+    return tuple(
+        min(((a * x + b) % _MERSENNE_PRIME) & _MAX_HASH for x in shingle_hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def estimate_similarity(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity: the fraction of matching MinHash values."""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+def band_keys(signature: Tuple[int, ...]) -> List[int]:
+    return [hash(signature[band * ROWS:(band + 1) * ROWS]) for band in range(BANDS)]
+
+
+def negations(normalized: str) -> frozenset:
+    return NEGATIONS.intersection(normalized.split())
+
+
+def content_words(normalized: str) -> frozenset:
+    return frozenset(normalized.split()) - FILLER_WORDS
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class CacheEntry:
+    __slots__ = ("scope", "normalized", "content", "negations", "signature", "bands", "value", "expires_at")
+
+    def __init__(self, scope: Optional[str], normalized: str, signature: Tuple[int, ...], value: Any,
+                 expires_at: float):
+        self.scope = scope
+        self.normalized = normalized
+        self.content = content_words(normalized)
+        self.negations = negations(normalized)
+        self.signature = signature
+        self.bands = band_keys(signature)
+        self.value = value
+        self.expires_at = expires_at
+
+
+class SimilarityCache:
+    """
+    Near-duplicate cache keyed by thought text. Looks up MinHash signatures of
+    shingled, normalized text through an LSH index and returns the stored value
+    of the most similar entry when its estimated similarity passes the threshold.
+
+    Entries are scoped to the user who stored them and are only served back
+    to that user (anonymous callers share the None scope). Since the stored
+    values quote and paraphrase the original thought, a different text also
+    has to share most of its content words (content_threshold, e.g. "I always
+    mess up at work" and "I always mess everything up at work") and the same
+    negations.
+    """
+
+    def __init__(self, name: str, threshold: float = SIMILARITY_CACHE_THRESHOLD,
+                 content_threshold: float = SIMILARITY_CACHE_CONTENT_SIMILARITY,
+                 max_entries: int = SIMILARITY_CACHE_MAX_ENTRIES,
+                 ttl_seconds: int = SIMILARITY_CACHE_TTL_SECONDS,
+                 enabled: bool = SIMILARITY_CACHE_ENABLED):
+        self.name = name
+        self.threshold = threshold
+        self.content_threshold = content_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.entries: "OrderedDict[int, CacheEntry]" = OrderedDict()
+        self.buckets: List[Dict[int, Set[int]]] = [{} for _ in range(BANDS)]
+        self.next_id = 0
+        self.counters = {
+            "lookups": 0,
+            "hits": 0,
+            "exact_hits": 0,
+            "candidates": 0,
+            "candidates_accepted": 0,
+            "stored": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+        self.hit_similarity_total = 0.0
+
+    def _remove(self, entry_id: int):
+        entry = self.entries.pop(entry_id)
+        for band, key in enumerate(entry.bands):
+            bucket = self.buckets[band].get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self.buckets[band][key]
+
+    def get(self, text: str, scope: Optional[str] = None) -> Optional[Tuple[Any, float]]:
+        """Return (value, similarity) of the closest entry of `scope` above the threshold."""
+        if not self.enabled:
+            return None
+        self.counters["lookups"] += 1
+
+        normalized = normalize(text)
+        signature = minhash(shingles(normalized))
+        content = content_words(normalized)
+        negated = negations(normalized)
+
+        candidate_ids: Set[int] = set()
+        for band, key in enumerate(band_keys(signature)):
+            candidate_ids.update(self.buckets[band].get(key, ()))
+
+        now = time.monotonic()
+        best_id, best_similarity = None, 0.0
+        for entry_id in candidate_ids:
+            entry = self.entries[entry_id]
+            if entry.expires_at <= now:
+                self._remove(entry_id)
+                self.counters["expirations"] += 1
+                continue
+            if entry.scope != scope:
+                continue
+            self.counters["candidates"] += 1
+            if entry.normalized == normalized:
+                similarity = 1.0
+            elif entry.negations != negated or jaccard(entry.content, content) < self.content_threshold:
+                similarity = 0.0
+            else:
+                similarity = estimate_similarity(signature, entry.signature)
+            if similarity >= self.threshold:
+                self.counters["candidates_accepted"] += 1
+                if similarity > best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+
+        if best_id is None:
+            return None
+
+        self.entries.move_to_end(best_id)
+        self.counters["hits"] += 1
+        if best_similarity == 1.0:
+            self.counters["exact_hits"] += 1
+        self.hit_similarity_total += best_similarity
+        return self.entries[best_id].value, best_similarity
+
+    def put(self, text: str, value: Any, scope: Optional[str] = None):
+        if not self.enabled:
+            return
+        normalized = normalize(text)
+        entry = CacheEntry(scope, normalized, minhash(shingles(normalized)), value,
+                           time.monotonic() + self.ttl_seconds)
+
+        entry_id = self.next_id
+        self.next_id += 1
+        self.entries[entry_id] = entry
+        for band, key in enumerate(entry.bands):
+            self.buckets[band].setdefault(key, set()).add(entry_id)
+        self.counters["stored"] += 1
+
+        while len(self.entries) > self.max_entries:
+            self._remove(next(iter(self.entries)))
+            self.counters["evictions"] += 1
+
+    def stats(self) -> Dict:
+        lookups = self.counters["lookups"]
+        hits = self.counters["hits"]
+        candidates = self.counters["candidates"]
+        return {
+            **self.counters,
+            "enabled": self.enabled,
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "content_threshold": self.content_threshold,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            # Share of LSH candidates whose estimated similarity passed the threshold
+            "candidate_precision": round(self.counters["candidates_accepted"] / candidates, 4) if candidates else 0.0,
+            "avg_hit_similarity": round(self.hit_similarity_total / hits, 4) if hits else 0.0,
+        }
@@ -0,0 +1,201 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, Set
+
+from app.services.similarity_cache import content_words, jaccard, negations, normalize, shingles
+
+SNIPPET_DEDUP_ENABLED = os.getenv("SNIPPET_DEDUP_ENABLED", "true").lower() in ("1", "true", "yes")
+# Recent snippets kept per user, by count and by age
+SNIPPET_DEDUP_WINDOW_SIZE = int(os.getenv("SNIPPET_DEDUP_WINDOW_SIZE", "20"))
+SNIPPET_DEDUP_WINDOW_SECONDS = float(os.getenv("SNIPPET_DEDUP_WINDOW_SECONDS", "60"))
+# How long a snippet waits for a longer partial to replace it before it is categorized;
+# only applied while another snippet of the same session is still pending
+SNIPPET_DEDUP_SETTLE_SECONDS = float(os.getenv("SNIPPET_DEDUP_SETTLE_SECONDS", "1.0"))
+# Shingle (word unigram and bigram) Jaccard similarity at which two snippets
+# whose content words only differ by additions count as near-duplicates
+SNIPPET_DEDUP_SIMILARITY = float(os.getenv("SNIPPET_DEDUP_SIMILARITY", "0.8"))
+
+MAX_TRACKED_USERS = 10000
+
+CategorizeFn = Callable[[str], Awaitable[Dict]]
+
+
+class Snippet:
+    __slots__ = ("text", "normalized", "shingles", "content", "negations", "created_at", "future",
+                 "superseded_by")
+
+    def __init__(self, text: str, normalized: str, created_at: float):
+        self.text = text
+        self.normalized = normalized
+        self.shingles = frozenset(shingles(normalized))
+        self.content = content_words(normalized)
+        self.negations = negations(normalized)
+        self.created_at = created_at
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.superseded_by: Optional["Snippet"] = None
+
+    def failed(self) -> bool:
+        return self.future.done() and self.future.exception() is not None
+
+
+class SnippetDeduplicator:
+    """
+    Per-user sliding window in front of thought categorization for ambient mode.
+
+    Speech-to-text re-sends growing partials ("I'm worried" -> "I'm worried about
+    my job") and repeats itself with small variations. Two snippets are the
+    same thought when one is a prefix of the other, or when they are
+    near-duplicates: the same negations, shingle similarity of at least
+    SNIPPET_DEDUP_SIMILARITY, and content words that only differ by additions
+    (a changed word, "my mom" vs "my job", never matches).
+
+    A repeat or shorter partial of a snippet in the window shares its result.
+    A longer version of a pending snippet replaces it; a near-duplicate
+    extension of a completed one shares the completed result, so partials
+    sent one after another do not each cost a model call. While another
+    snippet of the session is pending, a new one waits a short settle period,
+    and only the final, stable snippet of a chain is categorized. Callers
+    holding a superseded partial receive the merged result.
+    """
+
+    def __init__(self, window_size: int = SNIPPET_DEDUP_WINDOW_SIZE,
+                 window_seconds: float = SNIPPET_DEDUP_WINDOW_SECONDS,
+                 settle_seconds: float = SNIPPET_DEDUP_SETTLE_SECONDS,
+                 similarity_threshold: float = SNIPPET_DEDUP_SIMILARITY,
+                 enabled: bool = SNIPPET_DEDUP_ENABLED):
+        self.window_size = window_size
+        self.window_seconds = window_seconds
+        self.settle_seconds = settle_seconds
+        self.similarity_threshold = similarity_threshold
+        self.enabled = enabled
+        self.windows: "OrderedDict[str, Deque[Snippet]]" = OrderedDict()
+        # Running settle tasks, referenced so they are not garbage-collected mid-flight
+        self.settling: Set[asyncio.Task] = set()
+        self.counters = {
+            "snippets": 0,
+            "duplicates_suppressed": 0,
+            "extensions_merged": 0,
+            "completed_extensions_merged": 0,
+            "categorize_calls": 0,
+            "categorize_errors": 0,
+            "settle_delays": 0,
+        }
+
+    def _window(self, user_key: str, now: float) -> Deque[Snippet]:
+        window = self.windows.get(user_key)
+        if window is None:
+            window = self.windows[user_key] = deque(maxlen=self.window_size)
+            while len(self.windows) > MAX_TRACKED_USERS:
+                self.windows.popitem(last=False)
+        self.windows.move_to_end(user_key)
+        while window and now - window[0].created_at > self.window_seconds and window[0].future.done():
+            window.popleft()
+        return window
+
+    def _near_duplicate(self, a: Snippet, b: Snippet) -> bool:
+        return a.negations == b.negations and jaccard(a.shingles, b.shingles) >= self.similarity_threshold
+
+    def _covers(self, existing: Snippet, snippet: Snippet) -> bool:
+        """True when `snippet` adds nothing to `existing` (a repeat or a shorter partial)."""
+        if existing.normalized.startswith(snippet.normalized):
+            return True
+        return snippet.content <= existing.content and self._near_duplicate(existing, snippet)
+
+    def _extends(self, existing: Snippet, snippet: Snippet) -> bool:
+        """True when `snippet` is a longer version of `existing`, still being spoken or typed."""
+        if snippet.normalized.startswith(existing.normalized):
+            return True
+        return existing.content <= snippet.content and self._near_duplicate(existing, snippet)
+
+    @staticmethod
+    def _final(snippet: Snippet) -> Snippet:
+        while snippet.superseded_by is not None:
+            snippet = snippet.superseded_by
+        return snippet
+
+    async def categorize(self, user_key: str, text: str, categorize_fn: CategorizeFn) -> Dict:
+        normalized = normalize(text)
+        if not self.enabled or not normalized:
+            self.counters["categorize_calls"] += 1
+            return await categorize_fn(text)
+
+        self.counters["snippets"] += 1
+        now = time.monotonic()
+        window = self._window(user_key, now)
+        snippet = Snippet(text, normalized, now)
+
+        for existing in reversed(window):
+            if existing.superseded_by is not None or existing.failed():
+                continue
+            if self._covers(existing, snippet):
+                self.counters["duplicates_suppressed"] += 1
+                return await asyncio.shield(self._final(existing).future)
+            # A small extension of a thought already categorized keeps its result;
+            # a large one (a bare prefix like "I'm worried") is categorized afresh
+            if (existing.future.done() and existing.content <= snippet.content
+                    and self._near_duplicate(existing, snippet)):
+                self.counters["completed_extensions_merged"] += 1
+                return existing.future.result()
+
+        pending = False
+        for existing in window:
+            if existing.superseded_by is None and not existing.future.done():
+                pending = True
+                if self._extends(existing, snippet):
+                    existing.superseded_by = snippet
+                    self.counters["extensions_merged"] += 1
+
+        window.append(snippet)
+        # A lone snippet is categorized right away; only a burst of partials waits to settle
+        delay = self.settle_seconds if pending else 0.0
+        task = asyncio.create_task(self._settle(snippet, categorize_fn, delay))
+        self.settling.add(task)
+        task.add_done_callback(self.settling.discard)
+        return await asyncio.shield(snippet.future)
+
+    async def _settle(self, snippet: Snippet, categorize_fn: CategorizeFn, delay: float):
+        if delay > 0:
+            self.counters["settle_delays"] += 1
+            await asyncio.sleep(delay)
+
+        if snippet.superseded_by is not None:
+            # Resolve with whatever the replacement chain ends up producing
+            final = self._final(snippet)
+            try:
+                result = await asyncio.shield(final.future)
+            except Exception as e:
+                snippet.future.set_exception(e)
+            else:
+                snippet.future.set_result(result)
+            return
+
+        self.counters["categorize_calls"] += 1
+        try:
+            result = await categorize_fn(snippet.text)
+        except Exception as e:
+            self.counters["categorize_errors"] += 1
+            snippet.future.set_exception(e)
+        else:
+            snippet.future.set_result(result)
+
+    def stats(self) -> Dict:
+        snippets = self.counters["snippets"]
+        suppressed = (self.counters["duplicates_suppressed"] + self.counters["extensions_merged"]
+                      + self.counters["completed_extensions_merged"])
+        return {
+            **self.counters,
+            "enabled": self.enabled,
+            "suppressed": suppressed,
+            "suppression_rate": round(suppressed / snippets, 4) if snippets else 0.0,
+            "tracked_users": len(self.windows),
+            "settling": len(self.settling),
+            "window_size": self.window_size,
+            "window_seconds": self.window_seconds,
+            "settle_seconds": self.settle_seconds,
+            "similarity_threshold": self.similarity_threshold,
+        }
+
+
+snippet_deduplicator = SnippetDeduplicator()
@@ -0,0 +1,68 @@
+import asyncio
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+# With LAZY_INIT on, heavy dependencies load in a warm-up task after the server
+# starts accepting connections; with it off they load before serving.
+LAZY_INIT = os.getenv("LAZY_INIT", "true").lower() in ("1", "true", "yes")
+
+_clock_start = time.monotonic()
+
+startup_metrics: Dict[str, Optional[float]] = {
+    "app_imported_seconds": None,
+    "ready_seconds": None,
+    "first_healthy_seconds": None,
+    "warmup_seconds": None,
+}
+
+
+def process_uptime() -> float:
+    """Seconds since the Python process started (falls back to app import time)."""
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22 is the process start time in clock ticks after boot;
+            # the command name in field 2 may contain spaces, so split after it
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            system_uptime = float(f.read().split()[0])
+        return system_uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.monotonic() - _clock_start
+
+
+def mark(metric: str):
+    """Record a startup milestone the first time it is reached."""
+    if startup_metrics[metric] is None:
+        startup_metrics[metric] = round(process_uptime(), 3)
+
+
+def run_warmups(warmups: List[Callable[[], None]]):
+    started = time.perf_counter()
+    for warmup in warmups:
+        try:
+            warmup()
+        except Exception as e:
+            print(f"Warm-up error ({getattr(warmup, '__module__', warmup)}): {e}")
+    startup_metrics["warmup_seconds"] = round(time.perf_counter() - started, 3)
+
+
+async def initialize(warmups: List[Callable[[], None]]) -> Optional[asyncio.Task]:
+    """
+    Load deferred dependencies. In lazy mode this returns a background task so
+    startup can finish (and the socket can bind) first.
+    """
+    if not LAZY_INIT:
+        run_warmups(warmups)
+        return None
+
+    async def deferred():
+        # Let the server finish starting before competing for the CPU
+        await asyncio.sleep(0)
+        await asyncio.to_thread(run_warmups, warmups)
+
+    return asyncio.create_task(deferred(), name="warmup")
+
+
+def stats() -> Dict:
+    return {"lazy_init": LAZY_INIT, **startup_metrics}
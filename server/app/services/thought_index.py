@@ -0,0 +1,222 @@
+import hashlib
+import importlib.util
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from app.services.similarity_cache import normalize
+
+THOUGHT_INDEX_ENABLED = os.getenv("THOUGHT_INDEX_ENABLED", "true").lower() in ("1", "true", "yes")
+# Empty: a thought_index directory next to the SQLite database
+THOUGHT_INDEX_DIR = os.getenv("THOUGHT_INDEX_DIR", "")
+# Width of the hashed feature vectors; 128 float32 values is 512 bytes per thought
+THOUGHT_INDEX_DIM = int(os.getenv("THOUGHT_INDEX_DIM", "128"))
+# Past thoughts at least this similar are added to the analysis prompt as context
+THOUGHT_CONTEXT_SIMILARITY = float(os.getenv("THOUGHT_CONTEXT_SIMILARITY", "0.5"))
+# A past analysis this similar is served as-is instead of calling the model
+THOUGHT_REUSE_SIMILARITY = float(os.getenv("THOUGHT_REUSE_SIMILARITY", "0.9"))
+
+INITIAL_CAPACITY = 1024
+MAX_OPEN_INDEXES = 256
+
+# numpy is optional; without it the index is disabled. It is imported on first
+# use rather than here to keep it out of startup time.
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+
+
+def features(text: str) -> List[str]:
+    words = normalize(text).split()
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def vectorize(texts: List[str], dim: int = THOUGHT_INDEX_DIM):
+    """
+    Hashing vectorizer: each word unigram/bigram is hashed to a column and a
+    sign, so no vocabulary has to be stored or fitted. Rows are L2-normalized
+    so a dot product is the cosine similarity.
+    """
+    import numpy as np
+
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for feature in features(text):
+            h = zlib.crc32(feature.encode())
+            matrix[row, h % dim] += 1.0 if (h >> 31) & 1 else -1.0
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class UserThoughtIndex:
+    """
+    One user's thought vectors in a memory-mapped float32 matrix (<owner>.vec)
+    with the matching history ids (<owner>.ids). Rows are appended in place;
+    the files grow by doubling, so appends never rewrite existing rows. The
+    row count in <owner>.json is replaced atomically after the rows are
+    flushed, so a crash never exposes rows that were not written.
+    """
+
+    def __init__(self, directory: str, owner: str, dim: int):
+        self.dim = dim
+        self.vec_path = os.path.join(directory, f"{owner}.vec")
+        self.ids_path = os.path.join(directory, f"{owner}.ids")
+        self.meta_path = os.path.join(directory, f"{owner}.json")
+        self.lock = threading.Lock()
+        self.count = 0
+        self.capacity = 0
+        self.vectors = None
+        self.ids = None
+
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+            if meta["dim"] == dim:
+                self.count, self.capacity = meta["count"], meta["capacity"]
+                self._map()
+
+    def _map(self):
+        import numpy as np
+
+        self.vectors = np.memmap(self.vec_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dim))
+        self.ids = np.memmap(self.ids_path, dtype=np.int64, mode="r+", shape=(self.capacity,))
+
+    def _grow(self, needed: int):
+        capacity = max(self.capacity, INITIAL_CAPACITY)
+        while capacity < needed:
+            capacity *= 2
+        if self.vectors is not None:
+            self.vectors.flush()
+            self.ids.flush()
+        self.vectors = self.ids = None
+        for path, row_bytes in ((self.vec_path, self.dim * 4), (self.ids_path, 8)):
+            with open(path, "ab") as f:
+                f.truncate(capacity * row_bytes)
+        self.capacity = capacity
+        self._map()
+
+    def append(self, entry_ids: List[int], vectors):
+        with self.lock:
+            if self.count + len(entry_ids) > self.capacity:
+                self._grow(self.count + len(entry_ids))
+            end = self.count + len(entry_ids)
+            self.vectors[self.count:end] = vectors
+            self.ids[self.count:end] = entry_ids
+            self.vectors.flush()
+            self.ids.flush()
+            self.count = end
+            temporary = f"{self.meta_path}.tmp"
+            with open(temporary, "w") as f:
+                json.dump({"dim": self.dim, "count": self.count, "capacity": self.capacity}, f)
+            os.replace(temporary, self.meta_path)
+
+    def search(self, queries, k: int) -> List[List[Tuple[int, float]]]:
+        """Batched cosine top-k: one matrix product for all query rows."""
+        import numpy as np
+
+        with self.lock:
+            count = self.count
+            if count == 0:
+                return [[] for _ in range(len(queries))]
+            scores = queries @ self.vectors[:count].T
+            ids = self.ids
+        k = min(k, count)
+        results = []
+        for row in scores:
+            top = np.argpartition(-row, k - 1)[:k] if k < count else np.arange(count)
+            top = top[np.argsort(-row[top])]
+            results.append([(int(ids[i]), float(row[i])) for i in top])
+        return results
+
+
+class ThoughtIndex:
+    """Per-user nearest-neighbor index over stored thoughts, keyed by history id."""
+
+    def __init__(self, directory: str = THOUGHT_INDEX_DIR, dim: int = THOUGHT_INDEX_DIM,
+                 enabled: bool = THOUGHT_INDEX_ENABLED and NUMPY_AVAILABLE):
+        self.directory = directory
+        self.dim = dim
+        self.enabled = enabled
+        self.open: "OrderedDict[str, UserThoughtIndex]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {"appended": 0, "searches": 0, "context_matches": 0, "reused": 0}
+
+    def _directory(self) -> str:
+        if not self.directory:
+            from app.database import data_directory
+            self.directory = os.path.join(data_directory(), "thought_index")
+        return self.directory
+
+    def _user_index(self, user_id: str) -> UserThoughtIndex:
+        owner = hashlib.sha1(user_id.encode()).hexdigest()[:20]
+        with self.lock:
+            index = self.open.get(owner)
+            if index is None:
+                directory = self._directory()
+                os.makedirs(directory, exist_ok=True)
+                index = self.open[owner] = UserThoughtIndex(directory, owner, self.dim)
+                while len(self.open) > MAX_OPEN_INDEXES:
+                    self.open.popitem(last=False)
+            self.open.move_to_end(owner)
+            return index
+
+    def count(self, counter: str):
+        # Incremented from writer threads, search threads and the event loop
+        with self.lock:
+            self.counters[counter] += 1
+
+    def add(self, user_id: str, entry_id: int, text: str):
+        """Index a stored thought (blocking; called from the history writer thread)."""
+        if not self.enabled:
+            return
+        self._user_index(user_id).append([entry_id], vectorize([text], self.dim))
+        self.count("appended")
+
+    def search(self, user_id: str, texts: List[str], k: int = 3) -> List[List[Tuple[int, float]]]:
+        """Top-k (history id, cosine similarity) pairs for each text."""
+        if not self.enabled:
+            return [[] for _ in texts]
+        self.count("searches")
+        return self._user_index(user_id).search(vectorize(texts, self.dim), k)
+
+    def stats(self) -> Dict:
+        return {
+            **self.counters,
+            "enabled": self.enabled,
+            "numpy_available": NUMPY_AVAILABLE,
+            "dim": self.dim,
+            "directory": self._directory(),
+            "open_indexes": len(self.open),
+            "context_similarity": THOUGHT_CONTEXT_SIMILARITY,
+            "reuse_similarity": THOUGHT_REUSE_SIMILARITY,
+        }
+
+
+thought_index = ThoughtIndex()
+
+
+def related_analyses(user_id: str, thought: str, k: int = 3) -> List[Dict]:
+    """
+    The user's most similar past analyses above the context threshold, most
+    similar first, each with its stored result and similarity (blocking).
+    """
+    from app.database import get_engine
+    from app.models import history
+
+    matches = [(entry_id, score) for entry_id, score in thought_index.search(user_id, [thought], k)[0]
+               if score >= THOUGHT_CONTEXT_SIMILARITY]
+    if not matches:
+        return []
+
+    with get_engine().connect() as conn:
+        rows = conn.execute(
+            history.select().where(history.c.id.in_([entry_id for entry_id, _ in matches]))
+        ).mappings().all()
+    by_id = {row["id"]: row for row in rows}
+    return [
+        {"id": entry_id, "similarity": round(score, 4), "thought": by_id[entry_id]["input"],
+         "result": by_id[entry_id]["result"]}
+        for entry_id, score in matches if entry_id in by_id
+    ]
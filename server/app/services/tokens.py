@@ -0,0 +1,242 @@
+import asyncio
+import hashlib
+import math
+import os
+import secrets
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+# Access tokens are short-lived; clients renew them with POST /api/auth/refresh
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+# Revocations made by other workers are picked up this often
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", "15"))
+# Bloom filter sizing: expected live revocations and false-positive rate
+REVOCATION_BLOOM_CAPACITY = int(os.getenv("REVOCATION_BLOOM_CAPACITY", "100000"))
+REVOCATION_BLOOM_ERROR_RATE = float(os.getenv("REVOCATION_BLOOM_ERROR_RATE", "0.001"))
+
+
+def new_token_id() -> str:
+    return secrets.token_hex(16)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings, with double hashing from one blake2b digest."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(capacity, 1)
+        self.size = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(round(self.size / capacity * math.log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (first + i * second) % self.size
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevocationList:
+    """
+    Revoked access-token ids and session families, held in memory so the
+    per-request check never touches the database. A Bloom filter answers
+    the common "not revoked" case; its rare positives are confirmed against
+    the exact set. Entries are dropped once the tokens they cover expire.
+    The revoked_tokens table is the source of truth: it is loaded at startup,
+    before requests are served, and polled for revocations made by other
+    workers.
+    """
+
+    def __init__(self, capacity: int = REVOCATION_BLOOM_CAPACITY, error_rate: float = REVOCATION_BLOOM_ERROR_RATE,
+                 sync_seconds: float = REVOCATION_SYNC_SECONDS):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_seconds = sync_seconds
+        # key -> expiry of the tokens it covers
+        self.revoked: Dict[str, datetime] = {}
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.synced_until: Optional[datetime] = None
+        self.syncer: Optional[asyncio.Task] = None
+        # revoke, sync and rebuilds run in separate worker threads
+        self.lock = threading.Lock()
+        self.counters = {"checks": 0, "bloom_positives": 0, "revoked_hits": 0, "revocations": 0,
+                         "syncs": 0, "sync_errors": 0, "rebuilds": 0}
+
+    def _remember(self, key: str, expires_at: datetime):
+        if key not in self.revoked:
+            self.bloom.add(key)
+        self.revoked[key] = expires_at
+        if self.bloom.count > self.capacity:
+            self._rebuild()
+
+    def _prune(self, now: datetime):
+        self.revoked = {key: expires_at for key, expires_at in self.revoked.items() if expires_at > now}
+
+    def _rebuild(self):
+        """Drop expired entries and rebuild the filter, growing it if live entries outgrew it."""
+        self._prune(datetime.utcnow())
+        self.capacity = max(self.capacity, 2 * len(self.revoked))
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        for key in self.revoked:
+            bloom.add(key)
+        self.bloom = bloom
+        self.counters["rebuilds"] += 1
+
+    def is_revoked(self, payload: Dict) -> bool:
+        """True when the token's id or its session family has been revoked."""
+        self.counters["checks"] += 1
+        for key in (payload.get("jti"), payload.get("fam")):
+            if key and key in self.bloom:
+                self.counters["bloom_positives"] += 1
+                if key in self.revoked:
+                    self.counters["revoked_hits"] += 1
+                    return True
+        return False
+
+    def revoke(self, key: str, expires_at: datetime):
+        """Record a revocation in the database and in memory (blocking)."""
+        from sqlalchemy import delete
+        from app.database import get_engine
+        from app.models import revoked_tokens
+
+        now = datetime.utcnow()
+        with get_engine().begin() as conn:
+            conn.execute(delete(revoked_tokens).where(revoked_tokens.c.key == key))
+            conn.execute(revoked_tokens.insert().values(key=key, expires_at=expires_at, revoked_at=now))
+        with self.lock:
+            self._remember(key, expires_at)
+            self.counters["revocations"] += 1
+
+    def load(self):
+        """Load unexpired revocations from the database (blocking); run at startup, before serving."""
+        self.sync()
+
+    def sync(self):
+        """Merge revocations recorded since the last sync and purge expired rows (blocking)."""
+        from sqlalchemy import delete, select
+        from app.database import get_engine
+        from app.models import revoked_tokens as table
+
+        now = datetime.utcnow()
+        query = select(table.c.key, table.c.expires_at, table.c.revoked_at).where(table.c.expires_at > now)
+        if self.synced_until is not None:
+            # Overlap by a second so rows committed out of order by other workers are not missed
+            query = query.where(table.c.revoked_at >= self.synced_until - timedelta(seconds=1))
+        with get_engine().begin() as conn:
+            rows = conn.execute(query).all()
+            conn.execute(delete(table).where(table.c.expires_at <= now))
+        with self.lock:
+            for key, expires_at, revoked_at in rows:
+                self._remember(key, expires_at)
+                if self.synced_until is None or revoked_at > self.synced_until:
+                    self.synced_until = revoked_at
+            if self.synced_until is None:
+                self.synced_until = now
+            # Expired entries still hold bits in the filter; rebuild once they are most of it
+            self._prune(now)
+            if len(self.revoked) < self.bloom.count // 2:
+                self._rebuild()
+            self.counters["syncs"] += 1
+
+    async def start(self):
+        if self.syncer is not None:
+            return
+        # Loaded before serving rather than in the lazy warm-up, so a revoked
+        # token is refused from the first request
+        try:
+            await asyncio.to_thread(self.load)
+        except Exception as e:
+            self.counters["sync_errors"] += 1
+            print(f"Revocation load error: {e}")
+        if self.sync_seconds > 0:
+            self.syncer = asyncio.create_task(self._sync_loop(), name="revocation-sync")
+
+    async def stop(self):
+        if self.syncer is None:
+            return
+        self.syncer.cancel()
+        await asyncio.gather(self.syncer, return_exceptions=True)
+        self.syncer = None
+
+    async def _sync_loop(self):
+        while True:
+            await asyncio.sleep(self.sync_seconds)
+            try:
+                await asyncio.to_thread(self.sync)
+            except Exception as e:
+                self.counters["sync_errors"] += 1
+                print(f"Revocation sync error: {e}")
+
+    def stats(self) -> Dict:
+        return {
+            **self.counters,
+            "revoked_entries": len(self.revoked),
+            "bloom_bits": self.bloom.size,
+            "bloom_hashes": self.bloom.hashes,
+            "synced_until": self.synced_until.isoformat() if self.synced_until else None,
+        }
+
+
+revocation_list = RevocationList()
+
+
+# Refresh token bookkeeping (blocking; call through asyncio.to_thread)
+
+def store_refresh_token(jti: str, family: str, user_id: str, expires_at: datetime):
+    from app.database import get_engine
+    from app.models import refresh_tokens
+
+    with get_engine().begin() as conn:
+        conn.execute(refresh_tokens.insert().values(jti=jti, family=family, user_id=user_id, expires_at=expires_at))
+
+
+def rotate_refresh_token(jti: str, new_jti: str, expires_at: datetime) -> Tuple[str, Optional[Dict]]:
+    """
+    Mark a refresh token used and store its successor in the same family.
+    Returns ("rotated", row), or ("reused", row) when the token was already
+    used or revoked (the caller revokes the family), or ("unknown", None).
+    """
+    from sqlalchemy import select, update
+    from app.database import get_engine
+    from app.models import refresh_tokens as table
+
+    now = datetime.utcnow()
+    with get_engine().begin() as conn:
+        row = conn.execute(select(table).where(table.c.jti == jti)).mappings().first()
+        if row is None:
+            return "unknown", None
+        # Only one of two concurrent refreshes with the same token wins
+        claimed = conn.execute(
+            update(table)
+            .where(table.c.jti == jti, table.c.used_at.is_(None), table.c.revoked_at.is_(None))
+            .values(used_at=now)
+        ).rowcount
+        if not claimed:
+            return "reused", dict(row)
+        conn.execute(table.insert().values(jti=new_jti, family=row["family"], user_id=row["user_id"],
+                                           expires_at=expires_at))
+    return "rotated", dict(row)
+
+
+def revoke_family(family: str):
+    """End a session: revoke its refresh tokens and every access token issued in it."""
+    from sqlalchemy import update
+    from app.database import get_engine
+    from app.models import refresh_tokens as table
+
+    now = datetime.utcnow()
+    with get_engine().begin() as conn:
+        conn.execute(update(table).where(table.c.family == family, table.c.revoked_at.is_(None)).values(revoked_at=now))
+    # Access tokens of the family outlive the revocation by at most their own lifetime
+    revocation_list.revoke(family, now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
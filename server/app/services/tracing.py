@@ -0,0 +1,233 @@
+import functools
+import inspect
+import json
+import os
+import queue
+import random
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() in ("1", "true", "yes")
+# Share of requests that are traced
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+# Completed traces kept in memory for /api/admin/traces
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "200"))
+# Optional JSON-lines file that every completed trace is appended to
+TRACE_EXPORT_FILE = os.getenv("TRACE_EXPORT_FILE")
+
+MAX_ATTRIBUTE_CHARS = 200
+
+# Fallback reasons recorded in the current context, for callers that set a
+# list here to see whether the work they ran fell back (e.g. job retries)
+recorded_fallbacks: ContextVar[Optional[List[str]]] = ContextVar("recorded_fallbacks", default=None)
+
+
+class Span:
+    __slots__ = ("name", "trace", "span_id", "parent_id", "start_time", "started", "duration",
+                 "attributes", "status", "error")
+
+    def __init__(self, name: str, trace: Dict, parent: Optional["Span"], attributes: Dict):
+        self.name = name
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.start_time = time.time()
+        self.started = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.attributes = attributes
+        self.status = "ok"
+        self.error: Optional[str] = None
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace["trace_id"]
+
+    @property
+    def recording(self) -> bool:
+        return True
+
+    def set(self, key: str, value: Any):
+        if isinstance(value, str) and len(value) > MAX_ATTRIBUTE_CHARS:
+            value = value[:MAX_ATTRIBUTE_CHARS] + "..."
+        self.attributes[key] = value
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def to_dict(self, trace_started: float) -> Dict:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "offset_ms": round((self.started - trace_started) * 1000, 3),
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class NonRecordingSpan:
+    """Stands in for spans of unsampled requests so instrumented code needs no checks."""
+
+    trace_id = None
+    recording = False
+
+    def set(self, key: str, value: Any):
+        pass
+
+    def elapsed_ms(self) -> float:
+        return 0.0
+
+
+NON_RECORDING_SPAN = NonRecordingSpan()
+
+current_span: ContextVar[Optional[Any]] = ContextVar("current_span", default=None)
+
+
+class TraceExporter:
+    """Keeps completed traces in a ring buffer and optionally appends them to a JSONL file."""
+
+    def __init__(self, buffer_size: int = TRACE_BUFFER_SIZE, export_file: Optional[str] = TRACE_EXPORT_FILE):
+        self.traces: deque = deque(maxlen=buffer_size)
+        self.export_file = export_file
+        self.pending: "queue.SimpleQueue[Dict]" = queue.SimpleQueue()
+        self.writer: Optional[threading.Thread] = None
+        self.counters = {"traces": 0, "spans": 0, "unsampled": 0, "export_errors": 0}
+        self.fallbacks: Dict[str, int] = {}
+
+    def export(self, root: Span):
+        trace = root.trace
+        spans = [span.to_dict(root.started) for span in trace["spans"]]
+        record = {
+            "trace_id": trace["trace_id"],
+            "name": root.name,
+            "start": datetime.fromtimestamp(root.start_time, timezone.utc).isoformat(),
+            "duration_ms": spans[0]["duration_ms"],
+            "status": root.status,
+            "attributes": root.attributes,
+            "spans": spans,
+        }
+        self.traces.append(record)
+        self.counters["traces"] += 1
+        self.counters["spans"] += len(spans)
+
+        if self.export_file:
+            # File writes happen on a writer thread, off the event loop
+            if self.writer is None:
+                self.writer = threading.Thread(target=self._write_loop, name="trace-writer", daemon=True)
+                self.writer.start()
+            self.pending.put(record)
+
+    def _write_loop(self):
+        while True:
+            record = self.pending.get()
+            try:
+                with open(self.export_file, "a") as f:
+                    f.write(json.dumps(record, default=str) + "\n")
+                    while not self.pending.empty():
+                        f.write(json.dumps(self.pending.get(), default=str) + "\n")
+            except OSError as e:
+                self.counters["export_errors"] += 1
+                print(f"Trace export error: {e}")
+
+    def find(self, trace_id: str) -> Optional[Dict]:
+        return next((t for t in self.traces if t["trace_id"] == trace_id), None)
+
+    def recent(self, limit: int = 50, name: Optional[str] = None, min_duration_ms: float = 0) -> List[Dict]:
+        matches = [
+            t for t in reversed(self.traces)
+            if (name is None or name in t["name"]) and (t["duration_ms"] or 0) >= min_duration_ms
+        ]
+        return matches[:limit]
+
+    def stats(self) -> Dict:
+        return {
+            **self.counters,
+            "enabled": TRACING_ENABLED,
+            "sample_rate": TRACE_SAMPLE_RATE,
+            "buffered": len(self.traces),
+            "export_file": self.export_file,
+            "fallbacks": self.fallbacks,
+        }
+
+
+exporter = TraceExporter()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time a block as a span of the current trace. Without a current trace this
+    starts a new one (subject to sampling), which is exported when it ends.
+    """
+    parent = current_span.get()
+    if not TRACING_ENABLED or parent is NON_RECORDING_SPAN:
+        yield NON_RECORDING_SPAN
+        return
+    if parent is None and random.random() >= TRACE_SAMPLE_RATE:
+        exporter.counters["unsampled"] += 1
+        token = current_span.set(NON_RECORDING_SPAN)
+        try:
+            yield NON_RECORDING_SPAN
+        finally:
+            current_span.reset(token)
+        return
+
+    trace = parent.trace if parent is not None else {"trace_id": secrets.token_hex(16), "spans": []}
+    new_span = Span(name, trace, parent, attributes)
+    trace["spans"].append(new_span)
+    token = current_span.set(new_span)
+    try:
+        yield new_span
+    except BaseException as e:
+        new_span.status = "error"
+        new_span.error = f"{type(e).__name__}: {e}"[:MAX_ATTRIBUTE_CHARS]
+        raise
+    finally:
+        new_span.duration = time.perf_counter() - new_span.started
+        current_span.reset(token)
+        if parent is None:
+            exporter.export(new_span)
+
+
+def traced(name: str):
+    """Decorator that runs a function (sync or async) inside a span."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def set_attribute(key: str, value: Any):
+    """Set an attribute on the current span, if any."""
+    current = current_span.get()
+    if current is not None:
+        current.set(key, value)
+
+
+def record_fallback(reason: str, error: Optional[Exception] = None):
+    """Note on the current span why a model-backed call used its rule-based fallback."""
+    exporter.fallbacks[reason] = exporter.fallbacks.get(reason, 0) + 1
+    reasons = recorded_fallbacks.get()
+    if reasons is not None:
+        reasons.append(reason)
+    set_attribute("fallback_reason", reason)
+    if error is not None:
+        set_attribute("fallback_error", f"{type(error).__name__}: {error}")
@@ -0,0 +1,245 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from app.services.request_context import current_request, get_caller_key
+
+USAGE_ENABLED = os.getenv("USAGE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Counters are buffered in memory and written to the database this often
+USAGE_FLUSH_SECONDS = float(os.getenv("USAGE_FLUSH_SECONDS", "30"))
+# Daily token quotas (input + output); 0 disables the quota
+USAGE_DAILY_TOKEN_QUOTA = int(os.getenv("USAGE_DAILY_TOKEN_QUOTA", "0"))
+USAGE_ANONYMOUS_DAILY_TOKEN_QUOTA = int(os.getenv("USAGE_ANONYMOUS_DAILY_TOKEN_QUOTA", "0"))
+
+REPORT_GROUPS = ("user_key", "endpoint", "model", "day")
+
+UsageKey = Tuple[str, str, str, str]  # (day, user_key, endpoint, model)
+
+
+def today() -> str:
+    return datetime.utcnow().date().isoformat()
+
+
+def current_endpoint() -> Optional[str]:
+    context = current_request.get()
+    return context["path"] if context else None
+
+
+class UsageMeter:
+    """
+    Per-caller model token accounting. Each model call adds to in-memory
+    counters; a background task periodically merges them into the
+    usage_daily table, so the request path never waits on the database.
+    Today's per-caller totals are also kept in memory (seeded from the table
+    at startup) for the quota check.
+    """
+
+    def __init__(self, flush_seconds: float = USAGE_FLUSH_SECONDS,
+                 user_quota: int = USAGE_DAILY_TOKEN_QUOTA,
+                 anonymous_quota: int = USAGE_ANONYMOUS_DAILY_TOKEN_QUOTA,
+                 enabled: bool = USAGE_ENABLED):
+        self.flush_seconds = flush_seconds
+        self.user_quota = user_quota
+        self.anonymous_quota = anonymous_quota
+        self.enabled = enabled
+        self.pending: Dict[UsageKey, List[int]] = {}
+        self.day = today()
+        self.totals: Dict[str, int] = {}
+        self.flusher: Optional[asyncio.Task] = None
+        self.flush_lock = asyncio.Lock()
+        self.counters = {
+            "recorded_calls": 0,
+            "quota_fallbacks": 0,
+            "flushes": 0,
+            "rows_written": 0,
+            "flush_errors": 0,
+        }
+
+    async def start(self):
+        if not self.enabled or self.flusher is not None:
+            return
+        try:
+            self.totals = await asyncio.to_thread(self._load_totals, self.day)
+        except Exception as e:
+            print(f"Usage load error: {e}")
+        self.flusher = asyncio.create_task(self._flush_loop(), name="usage-flush")
+
+    async def stop(self):
+        if self.flusher is None:
+            return
+        self.flusher.cancel()
+        await asyncio.gather(self.flusher, return_exceptions=True)
+        self.flusher = None
+        await self.flush()
+
+    def quota_for(self, user_key: str) -> int:
+        return self.user_quota if user_key.startswith("user:") else self.anonymous_quota
+
+    def _roll_day(self):
+        day = today()
+        if day != self.day:
+            self.day = day
+            self.totals = {}
+
+    def record(self, route: str, model: str, input_tokens: int, output_tokens: int):
+        if not self.enabled:
+            return
+        self._roll_day()
+        user_key = get_caller_key()
+        # Calls made outside a request (e.g. background batches) are keyed by route
+        key = (self.day, user_key, current_endpoint() or f"route:{route}", model)
+        entry = self.pending.get(key)
+        if entry is None:
+            entry = self.pending[key] = [0, 0, 0]
+        entry[0] += 1
+        entry[1] += input_tokens
+        entry[2] += output_tokens
+        self.totals[user_key] = self.totals.get(user_key, 0) + input_tokens + output_tokens
+        self.counters["recorded_calls"] += 1
+
+    def over_quota(self) -> bool:
+        """True when the current caller has used up today's token quota."""
+        if not self.enabled:
+            return False
+        user_key = get_caller_key()
+        quota = self.quota_for(user_key)
+        if quota <= 0:
+            return False
+        self._roll_day()
+        return self.totals.get(user_key, 0) >= quota
+
+    def quota_exhausted(self) -> bool:
+        """Like over_quota, counting the fallbacks; called once per model-backed request."""
+        if self.over_quota():
+            self.counters["quota_fallbacks"] += 1
+            return True
+        return False
+
+    def caller_usage(self, user_key: str) -> Dict:
+        self._roll_day()
+        quota = self.quota_for(user_key)
+        used = self.totals.get(user_key, 0)
+        return {
+            "day": self.day,
+            "tokens_used": used,
+            "daily_token_quota": quota or None,
+            "tokens_remaining": max(quota - used, 0) if quota else None,
+        }
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            await self.flush()
+
+    async def flush(self):
+        async with self.flush_lock:
+            if not self.pending:
+                return
+            batch, self.pending = self.pending, {}
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except Exception as e:
+                self.counters["flush_errors"] += 1
+                print(f"Usage flush error: {e}")
+                # Keep the counts for the next flush
+                for key, (requests, input_tokens, output_tokens) in batch.items():
+                    entry = self.pending.setdefault(key, [0, 0, 0])
+                    entry[0] += requests
+                    entry[1] += input_tokens
+                    entry[2] += output_tokens
+                return
+            self.counters["flushes"] += 1
+            self.counters["rows_written"] += len(batch)
+
+    def _write(self, batch: Dict[UsageKey, List[int]]):
+        from app.database import get_engine
+        from app.models import usage_daily as table
+
+        now = datetime.utcnow()
+        with get_engine().begin() as conn:
+            for (day, user_key, endpoint, model), (requests, input_tokens, output_tokens) in batch.items():
+                match = ((table.c.day == day) & (table.c.user_key == user_key)
+                         & (table.c.endpoint == endpoint) & (table.c.model == model))
+                updated = conn.execute(table.update().where(match).values(
+                    requests=table.c.requests + requests,
+                    input_tokens=table.c.input_tokens + input_tokens,
+                    output_tokens=table.c.output_tokens + output_tokens,
+                    updated_at=now,
+                ))
+                if updated.rowcount == 0:
+                    conn.execute(table.insert().values(
+                        day=day, user_key=user_key, endpoint=endpoint, model=model,
+                        requests=requests, input_tokens=input_tokens,
+                        output_tokens=output_tokens, updated_at=now,
+                    ))
+
+    def _load_totals(self, day: str) -> Dict[str, int]:
+        from sqlalchemy import func, select
+        from app.database import get_engine
+        from app.models import usage_daily as table
+
+        query = (
+            select(table.c.user_key, func.sum(table.c.input_tokens + table.c.output_tokens))
+            .where(table.c.day == day)
+            .group_by(table.c.user_key)
+        )
+        with get_engine().connect() as conn:
+            return {user_key: int(total or 0) for user_key, total in conn.execute(query)}
+
+    def _report(self, since: str, group_by: str, user_key: Optional[str], limit: int) -> List[Dict]:
+        from sqlalchemy import func, select
+        from app.database import get_engine
+        from app.models import usage_daily as table
+
+        group_column = table.c[group_by]
+        total_tokens = func.sum(table.c.input_tokens + table.c.output_tokens)
+        query = (
+            select(
+                group_column,
+                func.sum(table.c.requests),
+                func.sum(table.c.input_tokens),
+                func.sum(table.c.output_tokens),
+                total_tokens,
+            )
+            .where(table.c.day >= since)
+            .group_by(group_column)
+            .order_by(total_tokens.desc())
+            .limit(limit)
+        )
+        if user_key is not None:
+            query = query.where(table.c.user_key == user_key)
+        with get_engine().connect() as conn:
+            return [
+                {
+                    group_by: key,
+                    "requests": int(requests or 0),
+                    "input_tokens": int(input_tokens or 0),
+                    "output_tokens": int(output_tokens or 0),
+                    "total_tokens": int(total or 0),
+                }
+                for key, requests, input_tokens, output_tokens, total in conn.execute(query)
+            ]
+
+    async def report(self, days: int = 7, group_by: str = "user_key",
+                     user_key: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """Usage totals over the last `days` days, grouped by one dimension."""
+        if group_by not in REPORT_GROUPS:
+            raise ValueError(f"group_by must be one of: {', '.join(REPORT_GROUPS)}")
+        await self.flush()
+        since = (datetime.utcnow().date() - timedelta(days=days - 1)).isoformat()
+        return await asyncio.to_thread(self._report, since, group_by, user_key, limit)
+
+    def stats(self) -> Dict:
+        return {
+            **self.counters,
+            "enabled": self.enabled,
+            "pending_rows": len(self.pending),
+            "callers_today": len(self.totals),
+            "daily_token_quota": self.user_quota,
+            "anonymous_daily_token_quota": self.anonymous_quota,
+            "flush_seconds": self.flush_seconds,
+        }
+
+
+usage_meter = UsageMeter()
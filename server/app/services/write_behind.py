@@ -0,0 +1,187 @@
+import asyncio
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Records waiting to be written; enqueueing waits (backpressure) when full
+WRITE_BEHIND_QUEUE_SIZE = int(os.getenv("WRITE_BEHIND_QUEUE_SIZE", "10000"))
+# A batch is committed when it reaches this many records or has waited this long
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "200"))
+WRITE_BEHIND_MAX_DELAY_MS = float(os.getenv("WRITE_BEHIND_MAX_DELAY_MS", "50"))
+# Longest graceful shutdown waits for queued records to be written
+WRITE_BEHIND_SHUTDOWN_SECONDS = float(os.getenv("WRITE_BEHIND_SHUTDOWN_SECONDS", "10"))
+
+# A writer stores a list of records using the given connection, inside the
+# batch's transaction, and may return a callback to run once it has committed.
+# A failing callback is counted and logged; it never retries the write.
+Writer = Callable[..., Optional[Callable[[], None]]]
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """
+    Bounded in-process queue of records to persist. Request handlers only
+    enqueue; a background task group-commits them, all writers' records of a
+    batch in one transaction, when the batch is full or its oldest record
+    has waited WRITE_BEHIND_MAX_DELAY_MS. Queued records are written before
+    shutdown completes.
+    """
+
+    def __init__(self, max_size: int = WRITE_BEHIND_QUEUE_SIZE, batch_size: int = WRITE_BEHIND_BATCH_SIZE,
+                 max_delay_ms: float = WRITE_BEHIND_MAX_DELAY_MS,
+                 shutdown_seconds: float = WRITE_BEHIND_SHUTDOWN_SECONDS):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.max_delay = max_delay_ms / 1000
+        self.shutdown_seconds = shutdown_seconds
+        self.queue: Optional[asyncio.Queue] = None
+        self.flusher: Optional[asyncio.Task] = None
+        self.counters = {
+            "enqueued": 0,
+            "written": 0,
+            "failed": 0,
+            "batches": 0,
+            "batch_errors": 0,
+            "callback_errors": 0,
+            "backpressure_waits": 0,
+            "direct_writes": 0,
+        }
+        self.max_batch = 0
+        self.commit_seconds_total = 0.0
+        self.commit_seconds_max = 0.0
+        self.backpressure_seconds_total = 0.0
+
+    async def start(self):
+        if self.flusher is not None:
+            return
+        self.queue = asyncio.Queue(self.max_size)
+        self.flusher = asyncio.create_task(self._flush_loop(), name="write-behind")
+
+    async def stop(self):
+        """Write everything queued so far, then stop the background task."""
+        if self.flusher is None:
+            return
+        flusher, self.flusher = self.flusher, None
+        await self.queue.put(_STOP)
+        try:
+            await asyncio.wait_for(flusher, self.shutdown_seconds)
+        except asyncio.TimeoutError:
+            print(f"Write-behind shutdown timed out with {self.queue.qsize()} records queued")
+        self.queue = None
+
+    async def enqueue(self, writer: Writer, record: Dict):
+        """
+        Queue a record for `writer`. Waits while the queue is full, so a
+        database that cannot keep up slows requests down instead of growing
+        memory without bound.
+        """
+        self.counters["enqueued"] += 1
+        if self.flusher is None:
+            # Not running under the app lifespan (scripts, bare test clients): write now
+            self.counters["direct_writes"] += 1
+            await asyncio.to_thread(self._commit, [(writer, record)])
+            return
+        try:
+            self.queue.put_nowait((writer, record))
+        except asyncio.QueueFull:
+            self.counters["backpressure_waits"] += 1
+            started = time.perf_counter()
+            await self.queue.put((writer, record))
+            self.backpressure_seconds_total += time.perf_counter() - started
+
+    async def _next_batch(self) -> Tuple[List, bool]:
+        """Wait for a record, then gather more until the batch is full or max_delay has passed."""
+        item = await self.queue.get()
+        if item is _STOP:
+            return [], True
+        batch = [item]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.batch_size:
+            try:
+                item = self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _flush_loop(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._next_batch()
+            if batch:
+                # Shielded so a cancelled shutdown still finishes the batch in progress
+                await asyncio.shield(asyncio.to_thread(self._commit, batch))
+
+    def _commit(self, batch: List):
+        """
+        Write a batch in one transaction; if the transaction fails, retry its
+        records one by one. Post-commit callbacks run afterwards (blocking).
+        """
+        started = time.perf_counter()
+        try:
+            callbacks = self._write(batch)
+            self.counters["written"] += len(batch)
+        except Exception as e:
+            self.counters["batch_errors"] += 1
+            print(f"Write-behind batch error: {e}")
+            callbacks = []
+            for item in batch:
+                try:
+                    callbacks += self._write([item])
+                    self.counters["written"] += 1
+                except Exception as e:
+                    self.counters["failed"] += 1
+                    print(f"Write-behind record error: {e}")
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                self.counters["callback_errors"] += 1
+                print(f"Write-behind callback error: {e}")
+        elapsed = time.perf_counter() - started
+        self.counters["batches"] += 1
+        self.max_batch = max(self.max_batch, len(batch))
+        self.commit_seconds_total += elapsed
+        self.commit_seconds_max = max(self.commit_seconds_max, elapsed)
+
+    @staticmethod
+    def _write(batch: List) -> List[Callable[[], None]]:
+        """Run the batch's writers in one transaction; returns their post-commit callbacks."""
+        from app.database import get_engine
+
+        grouped: Dict[Writer, List[Dict]] = {}
+        for writer, record in batch:
+            grouped.setdefault(writer, []).append(record)
+        callbacks = []
+        with get_engine().begin() as conn:
+            for writer, records in grouped.items():
+                callback = writer(conn, records)
+                if callback is not None:
+                    callbacks.append(callback)
+        return callbacks
+
+    def stats(self) -> Dict:
+        batches = self.counters["batches"]
+        return {
+            **self.counters,
+            "running": self.flusher is not None,
+            "queued": self.queue.qsize() if self.queue else 0,
+            "max_size": self.max_size,
+            "avg_batch_size": round((self.counters["written"] + self.counters["failed"]) / batches, 2) if batches else 0.0,
+            "max_batch_size": self.max_batch,
+            "avg_commit_ms": round(self.commit_seconds_total / batches * 1000, 2) if batches else 0.0,
+            "max_commit_ms": round(self.commit_seconds_max * 1000, 2),
+            "backpressure_seconds": round(self.backpressure_seconds_total, 3),
+        }
+
+
+write_behind = WriteBehindQueue()
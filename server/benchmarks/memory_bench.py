@@ -0,0 +1,132 @@
+"""
+Peak memory per request for chat requests with long conversation histories.
+
+Each history size runs in a fresh interpreter so high-water marks do not carry
+over. Reports the growth of peak RSS (VmHWM) and the tracemalloc peak while
+handling one POST /api/chat and one POST /api/chat/summarize, plus the memory
+held by the validated history itself (Turn objects vs. one dict per message).
+Model calls go through replay mode with an empty fixture file, so they fail
+right at the upstream call and no API key or network access is needed.
+
+Usage (from the server directory):
+    python benchmarks/memory_bench.py [--turns 10 100 1000] [--chars 400]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+
+
+def read_hwm_kb() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    return 0
+
+
+def reset_hwm():
+    # Writing 5 to clear_refs resets the peak RSS counter (Linux only)
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+
+
+def body_for(turns: int, chars: int) -> dict:
+    text = ("I keep worrying about the deadline at work and whether my manager thinks I am doing enough. " * 20)[:chars]
+    return {
+        "message": "What should I do next?",
+        "conversation_history": [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": f"{i}: {text}"}
+            for i in range(turns)
+        ],
+    }
+
+
+def measure(turns: int, chars: int) -> dict:
+    """Runs inside the child interpreter."""
+    import gc
+    import tracemalloc
+
+    from fastapi.testclient import TestClient
+    from pydantic import TypeAdapter
+    from typing import Dict, List
+
+    from app.main import app
+    from app.services.conversation import Turn
+
+    body = json.dumps(body_for(turns, chars)).encode()
+    results = {"turns": turns, "body_bytes": len(body)}
+
+    with TestClient(app) as client:
+        for path in ("/api/chat", "/api/chat/summarize"):
+            # Warm up imports and caches on a small request first
+            client.post(path, content=json.dumps(body_for(2, chars)), headers={"content-type": "application/json"})
+            gc.collect()
+            reset_hwm()
+            baseline = read_hwm_kb()
+            tracemalloc.start()
+            response = client.post(path, content=body, headers={"content-type": "application/json"})
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results[path] = {
+                "status": response.status_code,
+                "peak_rss_growth_kb": read_hwm_kb() - baseline,
+                "tracemalloc_peak_kb": peak // 1024,
+            }
+
+    history = json.loads(body)["conversation_history"]
+    for label, adapter in (("turn_objects", TypeAdapter(List[Turn])), ("dicts", TypeAdapter(List[Dict[str, str]]))):
+        adapter.validate_python(history[:2])
+        gc.collect()
+        tracemalloc.start()
+        validated = adapter.validate_python(history)
+        held, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[f"history_{label}_kb"] = round(held / 1024, 1)
+        del validated
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--chars", type=int, default=400, help="characters per message")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        sys.path.insert(0, str(SERVER_DIR))
+        print(json.dumps(measure(args.child, args.chars)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            "LLM_FIXTURE_MODE": "replay",
+            "LLM_FIXTURE_FILE": os.path.join(tmp, "empty.jsonl.gz"),
+            "DATABASE_URL": f"sqlite:///{tmp}/bench.db",
+            "TRACING_ENABLED": "false",
+            "LAZY_INIT": "false",
+        }
+        print(f"{'turns':>6} {'body KB':>8} {'endpoint':<20} {'status':>6} {'peak RSS +KB':>13} {'tracemalloc KB':>15}")
+        for turns in args.turns:
+            result = subprocess.run(
+                [sys.executable, __file__, "--child", str(turns), "--chars", str(args.chars)],
+                cwd=SERVER_DIR, env=env, capture_output=True, text=True, check=True
+            )
+            data = json.loads(result.stdout.strip().splitlines()[-1])
+            for path in ("/api/chat", "/api/chat/summarize"):
+                row = data[path]
+                print(f"{turns:>6} {data['body_bytes'] / 1024:>8.1f} {path:<20} {row['status']:>6} "
+                      f"{row['peak_rss_growth_kb']:>13} {row['tracemalloc_peak_kb']:>15}")
+            print(f"{'':>6} {'':>8} validated history: Turn objects {data['history_turn_objects_kb']} KB, "
+                  f"dicts {data['history_dicts_kb']} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Per-request serialization cost for the hot API routes.
+
+Compares the previous path (re-validate through the response model or run
+jsonable_encoder, then encode with the stdlib JSONResponse) with FastResponse
+(orjson, or MessagePack when negotiated). Also compares converting chat history
+from Pydantic Message models by hand with validating it straight into Turn objects.
+
+Usage (from the server directory):
+    python benchmarks/serialization_bench.py [--number 2000]
+"""
+import argparse
+import sys
+import timeit
+from pathlib import Path
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.responses import FastResponse, dumps_msgpack  # noqa: E402
+from app.routers.chat import ChatRequest  # noqa: E402
+from app.routers.thoughts import AnalysisResponse  # noqa: E402
+from app.services.ai_analyzer import analyze_thought_rule_based  # noqa: E402
+
+
+class LegacyMessage(BaseModel):
+    role: str
+    content: str
+
+
+class LegacyChatRequest(BaseModel):
+    message: str
+    conversation_history: List[LegacyMessage] = []
+
+
+def report(label: str, seconds: float, number: int):
+    print(f"  {label:<46} {seconds / number * 1e6:8.1f} us/request")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+    n = args.number
+
+    analysis = analyze_thought_rule_based(
+        "I always mess everything up at work and everyone thinks I'm a failure, I should be better"
+    )
+    response_adapter = TypeAdapter(AnalysisResponse)
+
+    print("POST /api/analyze response")
+    report("before: validate model + JSONResponse", timeit.timeit(
+        lambda: JSONResponse(jsonable_encoder(response_adapter.dump_python(response_adapter.validate_python(analysis)))),
+        number=n), n)
+    report("before: jsonable_encoder + JSONResponse", timeit.timeit(
+        lambda: JSONResponse(jsonable_encoder(analysis)), number=n), n)
+    report("after: FastResponse (JSON)", timeit.timeit(
+        lambda: FastResponse(analysis).render_for("application/json"), number=n), n)
+    report("after: FastResponse (MessagePack)", timeit.timeit(
+        lambda: FastResponse(analysis).render_for("application/msgpack"), number=n), n)
+    print(f"  payload size: JSON {len(FastResponse(analysis).render_for(''))} bytes, "
+          f"MessagePack {len(dumps_msgpack(analysis))} bytes")
+
+    for turns in (10, 100):
+        body = {
+            "message": "What should I do next?",
+            "conversation_history": [
+                {"role": "user" if i % 2 == 0 else "assistant", "content": f"Message number {i} about work stress"}
+                for i in range(turns)
+            ],
+        }
+        print(f"\nPOST /api/chat request parsing ({turns} turns)")
+        report("before: Message models + manual dict conversion", timeit.timeit(
+            lambda: [{"role": m.role, "content": m.content}
+                     for m in LegacyChatRequest.model_validate(body).conversation_history],
+            number=n), n)
+        report("after: validate straight into Turn objects", timeit.timeit(
+            lambda: ChatRequest.model_validate(body).conversation_history, number=n), n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Cold-start benchmark for the API server.
+
+Reports the slowest imports of `app.main` (from `python -X importtime`) and the
+time from launching uvicorn to the first healthy /health response, with lazy
+initialization on and off.
+
+Usage (from the server directory):
+    python benchmarks/startup_bench.py [--runs 5] [--top 15]
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+
+
+def import_breakdown(top: int, env: dict):
+    """Return the `top` imports with the largest cumulative time, in microseconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=SERVER_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.replace("import time:", "|").split("|")]
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_healthy(env: dict, timeout: float = 30.0) -> float:
+    """Launch uvicorn and return seconds until /health first answers 200."""
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=SERVER_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.005)
+        raise TimeoutError("Server did not become healthy")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    for lazy in ("true", "false"):
+        env = {**os.environ, "LAZY_INIT": lazy, "PYTHONPATH": str(SERVER_DIR)}
+        print(f"\n=== LAZY_INIT={lazy} ===")
+
+        print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+        for cumulative_us, self_us, name in import_breakdown(args.top, env):
+            print(f"{cumulative_us / 1000:14.1f} {self_us / 1000:9.1f}  {name}")
+
+        timings = [time_to_healthy(env) for _ in range(args.runs)]
+        print(f"\ntime to first healthy response over {args.runs} runs: "
+              f"median {statistics.median(timings) * 1000:.0f} ms, "
+              f"min {min(timings) * 1000:.0f} ms, max {max(timings) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
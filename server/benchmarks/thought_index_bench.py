@@ -0,0 +1,83 @@
+"""
+Search latency of the per-user thought index at large sizes.
+
+Fills one user's memory-mapped index with synthetic thoughts (appended in
+batches, as the history writer does), then times ThoughtIndex.search for a
+single query and for batched queries, and compares the single-query cost with
+a brute-force cosine scan over the same rows in pure Python. Vectors are
+written to a temporary directory that is removed afterwards. Needs numpy.
+
+Usage (from the server directory):
+    python benchmarks/thought_index_bench.py [--rows 500 10000 100000] [--number 200]
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.thought_index import NUMPY_AVAILABLE, ThoughtIndex, vectorize  # noqa: E402
+
+WORDS = ("work deadline manager failure friends family mom job exam sleep money partner fight "
+         "always never everyone nobody worried anxious tired alone mistake presentation tomorrow").split()
+APPEND_BATCH = 1000
+
+
+def thought(rng: random.Random) -> str:
+    return "I " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 16)))
+
+
+def fill(index: ThoughtIndex, user_id: str, rows: int, rng: random.Random):
+    user_index = index._user_index(user_id)
+    for start in range(0, rows, APPEND_BATCH):
+        count = min(APPEND_BATCH, rows - start)
+        texts = [thought(rng) for _ in range(count)]
+        user_index.append(list(range(start + 1, start + count + 1)), vectorize(texts, index.dim))
+
+
+def timed(fn, number: int) -> float:
+    started = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return (time.perf_counter() - started) / number
+
+
+def report(label: str, seconds: float):
+    print(f"  {label:<46} {seconds * 1000:8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[500, 10000, 100000])
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+    if not NUMPY_AVAILABLE:
+        sys.exit("numpy is not installed; the thought index is disabled without it")
+
+    rng = random.Random(7)
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory(prefix="thought-index-bench-") as directory:
+            index = ThoughtIndex(directory=directory, enabled=True)
+            started = time.perf_counter()
+            fill(index, "bench-user", rows, rng)
+            print(f"{rows} thoughts (dim {index.dim}), built in {time.perf_counter() - started:.2f} s")
+
+            query = [thought(rng)]
+            batch = [thought(rng) for _ in range(32)]
+            report(f"search, 1 query, top {args.k}", timed(lambda: index.search("bench-user", query, args.k),
+                                                           args.number))
+            per_batch = timed(lambda: index.search("bench-user", batch, args.k), max(args.number // 10, 1))
+            report(f"search, {len(batch)} queries (per query)", per_batch / len(batch))
+
+            query_vector = vectorize(query, index.dim)[0].tolist()
+            stored = index._user_index("bench-user").vectors[:min(rows, 10000)].tolist()
+            scan = timed(lambda: max(sum(a * b for a, b in zip(query_vector, row)) for row in stored), 1)
+            report("brute force in pure Python (extrapolated)", scan * rows / len(stored))
+
+
+if __name__ == "__main__":
+    main()
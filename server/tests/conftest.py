@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+# Configure the app before any app module reads its settings
+_data_dir = tempfile.mkdtemp(prefix="clearmind-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_data_dir}/test.db")
+os.environ.setdefault("DATA_DIR", _data_dir)
+os.environ.setdefault("TRACING_ENABLED", "false")
+os.environ.pop("ANTHROPIC_API_KEY", None)
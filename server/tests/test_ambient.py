@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.routers import ambient as ambient_router
+from app.services import ambient
+from app.services.ambient import AmbientSession
+
+
+def test_batches_of_one_connection_are_bounded(monkeypatch):
+    active, peak = 0, 0
+
+    async def slow_batch(texts):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.02)
+        active -= 1
+        return [{"themes": ["other"], "emotions": ["other"], "key_phrase": ""} for _ in texts]
+
+    monkeypatch.setattr(ambient, "categorize_thoughts_batch", slow_batch)
+    monkeypatch.setattr(ambient, "AMBIENT_MAX_CONCURRENT_BATCHES", 2)
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def scenario():
+        session = AmbientSession(send)
+        # One chunk of short sentences completes many segments, and batches, at once
+        await session.add_chunk(" ".join(f"This is sentence number {i}." for i in range(60)))
+        await session.finish()
+
+    asyncio.run(scenario())
+    assert peak == 2
+    categorized = [item for message in sent if message["type"] == "categorized" for item in message["items"]]
+    assert len(categorized) == 60
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(ambient_router.router)
+    return TestClient(app)
+
+
+def test_binary_frame_closes_with_unsupported_data(client):
+    with client.websocket_connect("/ambient/stream") as websocket:
+        websocket.send_bytes(b"\x00\x01")
+        with pytest.raises(WebSocketDisconnect) as closed:
+            websocket.receive_json()
+    assert closed.value.code == 1003
+
+
+def test_text_that_is_not_json_gets_an_error(client):
+    with client.websocket_connect("/ambient/stream") as websocket:
+        websocket.send_text("not json")
+        assert websocket.receive_json()["type"] == "error"
+        websocket.send_json({"type": "end"})
+        assert websocket.receive_json() == {"type": "done"}
+
+
+def test_fast_sender_waits_instead_of_queueing_unbounded_batches(monkeypatch):
+    release = None
+    started = 0
+
+    async def blocked_batch(texts):
+        nonlocal started
+        started += 1
+        await release.wait()
+        return [{"themes": ["other"], "emotions": ["other"], "key_phrase": ""} for _ in texts]
+
+    monkeypatch.setattr(ambient, "categorize_thoughts_batch", blocked_batch)
+    monkeypatch.setattr(ambient, "AMBIENT_MAX_CONCURRENT_BATCHES", 1)
+    monkeypatch.setattr(ambient, "AMBIENT_MAX_QUEUED_BATCHES", 1)
+
+    async def send(message):
+        pass
+
+    async def scenario():
+        nonlocal release
+        release = asyncio.Event()
+        session = AmbientSession(send)
+        # Enough segments for 12 batches, sent as fast as possible
+        reader = asyncio.create_task(
+            session.add_chunk(" ".join(f"This is sentence number {i}." for i in range(60))))
+        await asyncio.sleep(0.05)
+        # The sender is held back: the chunk is not consumed while two batches exist
+        blocked = not reader.done()
+        outstanding = len(session.batch_tasks)
+        release.set()
+        await reader
+        await session.finish()
+        return blocked, outstanding
+
+    blocked, outstanding = asyncio.run(scenario())
+    assert blocked
+    assert outstanding == 2
+    assert started == 12
@@ -0,0 +1,50 @@
+import os
+
+from app.services.analysis_library import AnalysisLibrary, catalog_digest, write_library
+from app.services.similarity_cache import normalize
+
+THOUGHT = "I always mess everything up"
+ANALYSIS = {"distortions": [], "balanced_thought": "Some things go wrong, many go fine"}
+
+
+def replace_file(path, contents: bytes):
+    # A new file rather than an in-place rewrite, which would pull pages out from under the live mapping
+    temporary = path.with_suffix(".tmp")
+    temporary.write_bytes(contents)
+    os.replace(temporary, path)
+
+
+def build_library(path) -> AnalysisLibrary:
+    write_library(str(path), {normalize(THOUGHT): ANALYSIS}, {"catalog_digest": catalog_digest()})
+    library = AnalysisLibrary(str(path), enabled=True)
+    library.load()
+    assert library.status == "loaded"
+    return library
+
+
+def test_truncated_file_keeps_the_loaded_library(tmp_path):
+    path = tmp_path / "library.bin"
+    library = build_library(path)
+    loaded = library.file
+    contents = path.read_bytes()
+
+    for size in (0, 6, len(contents) - 20):
+        replace_file(path, contents[:size])
+        library.load()
+        assert library.status == "invalid"
+        assert library.error
+        assert library.file is loaded
+        assert library.get(THOUGHT) == ANALYSIS
+
+
+def test_reload_after_invalid_file_recovers(tmp_path):
+    path = tmp_path / "library.bin"
+    library = build_library(path)
+    contents = path.read_bytes()
+    replace_file(path, contents[:6])
+    library.load()
+
+    replace_file(path, contents)
+    library.load()
+    assert library.status == "loaded"
+    assert library.error is None
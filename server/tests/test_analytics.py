@@ -0,0 +1,88 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+
+from app import database
+from app.models import history, metadata
+from app.services.analytics import AnalyticsBusyError, AnalyticsJob, read_matrix, read_weekly
+
+pytest.importorskip("numpy")
+
+MONDAY = date.today() - timedelta(days=date.today().weekday())
+
+
+@pytest.fixture
+def engine(monkeypatch, tmp_path):
+    """A database of its own, so the job only sees this test's history."""
+    engine = create_engine(f"sqlite:///{tmp_path}/analytics.db")
+    metadata.create_all(engine)
+    monkeypatch.setattr(database, "get_engine", lambda: engine)
+    return engine
+
+
+def row(user_id: str, kind: str, result: dict, day: date = MONDAY):
+    return {"user_id": user_id, "kind": kind, "input": "text", "result": result,
+            "created_at": datetime.combine(day, datetime.min.time()) + timedelta(hours=12)}
+
+
+def analysis(distortions, exercises=()):
+    return {"identified_distortions": [{"id": d} for d in distortions], "suggested_exercises": list(exercises)}
+
+
+HISTORY = [
+    row("u1", "analysis", analysis(["all_or_nothing", "overgeneralization"], ["thought_record"])),
+    row("u2", "analysis", analysis(["all_or_nothing"], ["thought_record"]), MONDAY + timedelta(days=2)),
+    row("u3", "analysis", analysis(["overgeneralization"])),
+    row("u1", "categorization", {"themes": ["work"], "emotions": ["anxious"]}),
+    row("u2", "summary", {"themes": ["Work", "a new theme"], "emotions": ["anxious"]}),
+    # A week with a single user is left out of the weekly tables
+    row("u1", "analysis", analysis(["all_or_nothing"]), MONDAY - timedelta(weeks=3)),
+]
+
+
+def cells(name: str):
+    return {(c["row_label"], c["col_label"]): c["count"] for c in read_matrix(name)["cells"]}
+
+
+def test_run_publishes_weekly_shares_and_cooccurrence(engine):
+    with engine.begin() as conn:
+        conn.execute(history.insert(), HISTORY)
+
+    run = AnalyticsJob(chunk_size=2, min_users=2, min_count=2).run()
+    assert (run["records"], run["weeks"]) == (6, 1)
+
+    weekly = {(r["week"], r["metric"], r["label"]): (r["count"], r["share"]) for r in read_weekly(None, 8)}
+    week = MONDAY.isoformat()
+    assert weekly == {
+        (week, "distortion", "all_or_nothing"): (2, round(2 / 3, 6)),
+        (week, "distortion", "overgeneralization"): (2, round(2 / 3, 6)),
+        (week, "exercise", "thought_record"): (2, round(2 / 3, 6)),
+        (week, "theme", "work"): (2, 1.0),
+        (week, "theme", "other"): (1, 0.5),
+        (week, "emotion", "anxious"): (2, 1.0),
+    }
+
+    # Co-occurrence covers all weeks; cells under min_count are left out
+    assert cells("distortion_distortion") == {
+        ("all_or_nothing", "all_or_nothing"): 3,
+        ("overgeneralization", "overgeneralization"): 2,
+    }
+    assert cells("distortion_exercise") == {("all_or_nothing", "thought_record"): 2}
+    assert cells("theme_emotion") == {("work", "anxious"): 2}
+
+
+def test_too_few_users_publishes_nothing(engine):
+    with engine.begin() as conn:
+        conn.execute(history.insert(), HISTORY)
+
+    run = AnalyticsJob(min_users=5, min_count=1).run()
+    assert run["weeks"] == 0 and run["weekly_rows"] == 0 and run["matrix_rows"] == 0
+
+
+def test_concurrent_run_is_refused(engine):
+    job = AnalyticsJob()
+    with job.lock:
+        assert job.running
+        with pytest.raises(AnalyticsBusyError):
+            job.run()
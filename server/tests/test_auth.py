@@ -0,0 +1,147 @@
+import asyncio
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.database import get_engine
+from app.models import revoked_tokens
+from app.routers import auth
+from app.services import tokens
+from app.services.tokens import RevocationList
+
+
+@pytest.fixture
+def revocations(monkeypatch):
+    revocations = RevocationList(capacity=1000, sync_seconds=0)
+    monkeypatch.setattr(tokens, "revocation_list", revocations)
+    monkeypatch.setattr(auth, "revocation_list", revocations)
+    return revocations
+
+
+@pytest.fixture
+def client(revocations):
+    app = FastAPI()
+    app.include_router(auth.router, prefix="/api/auth")
+    return TestClient(app)
+
+
+def register(client) -> dict:
+    response = client.post("/api/auth/register", json={
+        "email": f"{uuid.uuid4().hex[:8]}@example.com", "password": "correct horse",
+    })
+    assert response.status_code == 200
+    return response.json()
+
+
+def me(client, access_token: str) -> int:
+    return client.get("/api/auth/me", headers={"Authorization": f"Bearer {access_token}"}).status_code
+
+
+def refresh(client, refresh_token: str):
+    return client.post("/api/auth/refresh", json={"refresh_token": refresh_token})
+
+
+def test_refresh_rotates_within_the_session(client):
+    session = register(client)
+    rotated = refresh(client, session["refresh_token"])
+    assert rotated.status_code == 200
+    pair = rotated.json()
+    assert pair["refresh_token"] != session["refresh_token"]
+    assert me(client, pair["access_token"]) == 200
+    # The successor works once in turn
+    assert refresh(client, pair["refresh_token"]).status_code == 200
+
+
+def test_reused_refresh_token_revokes_the_family(client, revocations):
+    session = register(client)
+    rotated = refresh(client, session["refresh_token"]).json()
+
+    # The first token again, e.g. replayed by someone who copied it
+    assert refresh(client, session["refresh_token"]).status_code == 401
+    assert refresh(client, rotated["refresh_token"]).status_code == 401
+    assert me(client, rotated["access_token"]) == 401
+    assert me(client, session["access_token"]) == 401
+    assert auth.decode_token(rotated["access_token"])["fam"] in revocations.revoked
+
+    # Other sessions are unaffected
+    assert me(client, register(client)["access_token"]) == 200
+
+
+def test_logout_ends_only_that_session(client):
+    first, second = register(client), register(client)
+    response = client.post("/api/auth/logout", headers={"Authorization": f"Bearer {first['access_token']}"})
+    assert response.status_code == 204
+    assert me(client, first["access_token"]) == 401
+    assert refresh(client, first["refresh_token"]).status_code == 401
+    assert me(client, second["access_token"]) == 200
+    assert client.post("/api/auth/logout").status_code == 401
+
+
+def test_decode_access_token_checks_type_and_revocation(client, revocations):
+    session = register(client)
+    payload = auth.decode_access_token(session["access_token"])
+    assert payload["type"] == "access"
+    assert auth.decode_access_token(session["refresh_token"]) is None
+    assert auth.decode_access_token("not-a-token") is None
+
+    expires_at = datetime.utcnow() + timedelta(minutes=5)
+    revocations.revoke(payload["jti"], expires_at)
+    assert auth.decode_access_token(session["access_token"]) is None
+    assert revocations.counters["revoked_hits"] == 1
+
+
+def test_revocations_of_other_workers_are_loaded_and_synced(revocations):
+    key = uuid.uuid4().hex
+    other_worker = RevocationList(capacity=1000, sync_seconds=0)
+    other_worker.revoke(key, datetime.utcnow() + timedelta(minutes=5))
+
+    async def scenario():
+        await revocations.start()
+        await revocations.stop()
+    asyncio.run(scenario())
+    assert revocations.is_revoked({"jti": key})
+
+    later = uuid.uuid4().hex
+    other_worker.revoke(later, datetime.utcnow() + timedelta(minutes=5))
+    revocations.sync()
+    assert revocations.is_revoked({"fam": later})
+
+
+def test_sync_prunes_expired_entries_and_shrinks_the_filter(revocations):
+    past = datetime.utcnow() - timedelta(seconds=1)
+    with revocations.lock:
+        for i in range(10):
+            revocations._remember(f"expired-{i}", past)
+        revocations._remember("live", datetime.utcnow() + timedelta(minutes=5))
+
+    revocations.sync()
+    assert "expired-0" not in revocations.revoked
+    assert revocations.is_revoked({"jti": "live"})
+    # Rebuilt from the live entries, so the expired keys no longer take up bits
+    assert revocations.bloom.count == len(revocations.revoked)
+    assert revocations.counters["rebuilds"] == 1
+
+
+def test_concurrent_revocations_are_all_kept(revocations):
+    expires_at = datetime.utcnow() + timedelta(minutes=5)
+    keys = [uuid.uuid4().hex for _ in range(40)]
+    revocations.capacity = 8  # forces rebuilds while others revoke
+
+    def revoke_some(part):
+        for key in part:
+            revocations.revoke(key, expires_at)
+
+    workers = [threading.Thread(target=revoke_some, args=(keys[i::4],)) for i in range(4)]
+    workers.append(threading.Thread(target=revocations.sync))
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert all(revocations.is_revoked({"jti": key}) for key in keys)
+    with get_engine().connect() as conn:
+        stored = {row.key for row in conn.execute(revoked_tokens.select())}
+    assert set(keys) <= stored
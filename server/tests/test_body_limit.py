@@ -0,0 +1,105 @@
+import asyncio
+import json
+
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+from app.middleware.body_limit import BodySizeLimitMiddleware
+
+LIMIT = 1000
+
+
+class Thought(BaseModel):
+    thought: str
+
+
+def make_app():
+    app = FastAPI()
+
+    @app.post("/api/analyze")
+    async def analyze(request: Thought):
+        return {"length": len(request.thought)}
+
+    @app.post("/api/sync")
+    async def sync(request: Thought):
+        return {"length": len(request.thought)}
+
+    return BodySizeLimitMiddleware(app, max_bytes=LIMIT, path_limits={"/api/sync": 10 * LIMIT})
+
+
+async def post(app, path: str, body: bytes, chunk_size: int = None, content_length: bool = True):
+    """Send `body` in chunks of `chunk_size` bytes; without a Content-Length it is sent chunked."""
+    headers = [(b"content-type", b"application/json")]
+    if content_length:
+        headers.append((b"content-length", str(len(body)).encode()))
+    else:
+        headers.append((b"transfer-encoding", b"chunked"))
+    scope = {"type": "http", "method": "POST", "path": path, "headers": headers,
+             "query_string": b"", "http_version": "1.1", "scheme": "http", "server": ("test", 80)}
+    chunk_size = chunk_size or len(body) or 1
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)] or [b""]
+    messages = [{"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+                for i, chunk in enumerate(chunks)]
+    delivered = 0
+
+    async def receive():
+        nonlocal delivered
+        if messages:
+            delivered += 1
+            return messages.pop(0)
+        await asyncio.Event().wait()
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    body = json.loads(b"".join(m.get("body", b"") for m in sent[1:]))
+    return sent[0]["status"], body, delivered
+
+
+def thought_body(size: int) -> bytes:
+    return json.dumps({"thought": "x" * (size - 15)}).encode()
+
+
+def test_small_bodies_pass_through():
+    status, body, _ = asyncio.run(post(make_app(), "/api/analyze", thought_body(LIMIT)))
+    assert (status, body) == (200, {"length": LIMIT - 15})
+
+
+def test_declared_length_over_the_limit_is_rejected_unread():
+    status, body, delivered = asyncio.run(post(make_app(), "/api/analyze", thought_body(LIMIT + 1)))
+    assert status == 413
+    assert str(LIMIT) in body["detail"]
+    assert delivered == 0
+
+
+def test_chunked_body_is_rejected_once_it_passes_the_limit():
+    payload = thought_body(5 * LIMIT)
+    status, body, delivered = asyncio.run(
+        post(make_app(), "/api/analyze", payload, chunk_size=100, content_length=False))
+    assert status == 413
+    # Reading stops at the first chunk past the limit
+    assert delivered == LIMIT // 100 + 1
+
+
+def test_larger_limit_applies_to_its_path():
+    app = make_app()
+    status, _, _ = asyncio.run(post(app, "/api/sync", thought_body(5 * LIMIT), chunk_size=100,
+                                    content_length=False))
+    assert status == 200
+    status, _, _ = asyncio.run(post(app, "/api/sync", thought_body(11 * LIMIT)))
+    assert status == 413
+
+
+def test_body_buffered_outside_the_endpoint_is_rejected():
+    async def buffering_app(scope, receive, send):
+        while (await receive()).get("more_body"):
+            pass
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    app = BodySizeLimitMiddleware(buffering_app, max_bytes=LIMIT)
+    status, body, _ = asyncio.run(post(app, "/upload", b"x" * (2 * LIMIT), chunk_size=300, content_length=False))
+    assert status == 413
@@ -0,0 +1,115 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+from app.middleware import cancellation
+from app.middleware.body_limit import BodySizeLimitMiddleware
+from app.middleware.cancellation import RequestCancellationMiddleware
+from app.services.cancellation import CancellationMetrics
+
+PATH = "/api/chat"
+
+
+class Message(BaseModel):
+    message: str
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    metrics = CancellationMetrics()
+    monkeypatch.setattr(cancellation, "cancellation_metrics", metrics)
+    return metrics
+
+
+def make_app(events: list, work_seconds: float = 0):
+    """A chat endpoint standing in for a model call that takes `work_seconds`."""
+    app = FastAPI()
+
+    @app.post(PATH)
+    async def chat(request: Message):
+        events.append("started")
+        try:
+            await asyncio.sleep(work_seconds)
+        except asyncio.CancelledError:
+            events.append("cancelled")
+            raise
+        return {"reply": f"{len(request.message)} characters"}
+
+    return RequestCancellationMiddleware(app, [PATH])
+
+
+async def post(app, body: bytes, headers=(), chunk_size: int = None, disconnect_after: float = None):
+    """
+    Send `body` (chunked when `chunk_size` is given), then wait: for a
+    disconnect after `disconnect_after` seconds, or forever.
+    """
+    chunk_size = chunk_size or len(body)
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+    messages = [{"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+                for i, chunk in enumerate(chunks)]
+    header_list = [(b"content-type", b"application/json"), *((k.encode(), v.encode()) for k, v in headers)]
+    if chunk_size == len(body):
+        header_list.append((b"content-length", str(len(body)).encode()))
+    scope = {"type": "http", "method": "POST", "path": PATH, "headers": header_list,
+             "query_string": b"", "http_version": "1.1", "scheme": "http", "server": ("test", 80)}
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        if disconnect_after is not None:
+            await asyncio.sleep(disconnect_after)
+            return {"type": "http.disconnect"}
+        await asyncio.Event().wait()
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    # Fails instead of hanging if the handler is never answered
+    await asyncio.wait_for(app(scope, receive, send), timeout=5)
+    if not sent:
+        return None, None
+    return sent[0]["status"], json.loads(b"".join(m.get("body", b"") for m in sent[1:]))
+
+
+def test_completed_request_is_answered(metrics):
+    events = []
+    status, body = asyncio.run(post(make_app(events), b'{"message": "hello"}'))
+    assert (status, body) == (200, {"reply": "5 characters"})
+    assert events == ["started"]
+
+
+def test_disconnect_cancels_the_handler(metrics):
+    events = []
+    status, _ = asyncio.run(post(make_app(events, work_seconds=10), b'{"message": "hello"}',
+                                 disconnect_after=0.05))
+    assert status is None
+    assert events == ["started", "cancelled"]
+    assert metrics.requests == {"disconnect": 1, "deadline": 0}
+    assert metrics.paths == {PATH: 1}
+
+
+def test_passed_deadline_is_answered_with_504(metrics):
+    events = []
+    status, body = asyncio.run(post(make_app(events, work_seconds=10), b'{"message": "hello"}',
+                                    headers=[("x-request-deadline-ms", "50")]))
+    assert status == 504
+    assert body == {"detail": "Request deadline exceeded"}
+    assert events == ["started", "cancelled"]
+    assert metrics.requests["deadline"] == 1
+
+
+def test_oversized_chunked_body_is_rejected_through_the_read_ahead(metrics):
+    events = []
+    app = BodySizeLimitMiddleware(make_app(events), max_bytes=1000)
+    body = json.dumps({"message": "x" * 3000}).encode()
+
+    status, response = asyncio.run(post(app, body, chunk_size=300))
+    assert status == 413
+    assert "1000 bytes" in response["detail"]
+    assert events == []
+    assert metrics.requests == {"disconnect": 0, "deadline": 0}
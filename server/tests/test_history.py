@@ -0,0 +1,92 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+import uuid
+from datetime import datetime, timedelta
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.database import get_engine
+from app.routers import history as history_router
+from app.routers.auth import require_auth
+from app.services import history
+
+
+def store(user_id: str, entries):
+    """Write history rows directly, as the write-behind writer would."""
+    records = [
+        {"user_id": user_id, "kind": kind, "input": text, "result": result,
+         "created_at": created_at or datetime.utcnow()}
+        for kind, text, result, created_at in entries
+    ]
+    with get_engine().begin() as conn:
+        history.write_batch(conn, records)
+
+
+def new_user() -> str:
+    return f"user-{uuid.uuid4().hex[:8]}"
+
+
+def export_client(user_id: str) -> TestClient:
+    app = FastAPI()
+    app.include_router(history_router.router, prefix="/api")
+    app.dependency_overrides[require_auth] = lambda: {"id": user_id}
+    return TestClient(app)
+
+
+def collect(rows):
+    async def scenario():
+        return [row async for row in rows]
+    return asyncio.run(scenario())
+
+
+def test_iter_history_walks_all_pages_in_order():
+    user_id = new_user()
+    store(user_id, [("analysis", f"Thought {i}", {"n": i}, None) for i in range(7)])
+    store(new_user(), [("analysis", "Someone else's thought", {}, None)])
+
+    rows = collect(history.iter_history(user_id=user_id, page_size=3))
+    assert [row["input"] for row in rows] == [f"Thought {i}" for i in range(7)]
+
+
+def test_export_ndjson_filters_by_kind_and_date():
+    user_id = new_user()
+    old = datetime.utcnow() - timedelta(days=10)
+    store(user_id, [
+        ("analysis", "Old thought", {"n": 0}, old),
+        ("analysis", "New thought", {"n": 1}, None),
+        ("summary", "A session", {"summary": "Talked"}, None),
+    ])
+    client = export_client(user_id)
+
+    response = client.get("/api/history/export", params={
+        "kind": "analysis", "since": (old + timedelta(days=1)).isoformat(),
+    })
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert 'filename="clearmind-history.ndjson"' in response.headers["content-disposition"]
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [(line["input"], line["result"]) for line in lines] == [("New thought", {"n": 1})]
+    assert lines[0]["user_id"] == user_id
+
+
+def test_export_csv_is_gzipped_when_accepted():
+    user_id = new_user()
+    store(user_id, [("analysis", 'She said "never", again', {"reframes": ["ok"]}, None)])
+    client = export_client(user_id)
+
+    with client.stream("GET", "/api/history/export", params={"format": "csv"},
+                       headers={"Accept-Encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        body = gzip.decompress(b"".join(response.iter_raw())).decode("utf-8")
+    rows = list(csv.DictReader(io.StringIO(body)))
+    assert [row["input"] for row in rows] == ['She said "never", again']
+    assert json.loads(rows[0]["result"]) == {"reframes": ["ok"]}
+
+
+def test_export_rejects_unknown_format():
+    response = export_client(new_user()).get("/api/history/export", params={"format": "xml"})
+    assert response.status_code == 422
@@ -0,0 +1,122 @@
+import asyncio
+import json
+
+from app.middleware.idempotency import IdempotencyCache, IdempotencyMiddleware
+
+PATH = "/api/analyze"
+
+
+def counting_app(calls: list, delay: float = 0):
+    """Answers with the call number, in JSON or a stand-in binary format depending on Accept."""
+    async def app(scope, receive, send):
+        message = await receive()
+        calls.append(message["body"])
+        if delay:
+            await asyncio.sleep(delay)
+        accept = dict(scope["headers"]).get(b"accept", b"")
+        body = json.dumps({"call": len(calls)}).encode()
+        content_type = b"application/json"
+        if accept == b"application/msgpack":
+            body, content_type = b"\x81" + body, b"application/msgpack"
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", content_type)]})
+        await send({"type": "http.response.body", "body": body})
+    return app
+
+
+async def post(app, body: bytes = b'{"thought": "x"}', key: str = "k1", token: str = "token-a",
+               accept: str = "application/json"):
+    headers = [(b"idempotency-key", key.encode()), (b"accept", accept.encode())]
+    if token:
+        headers.append((b"authorization", f"Bearer {token}".encode()))
+    scope = {"type": "http", "method": "POST", "path": PATH, "headers": headers}
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    start = sent[0]
+    return start["status"], dict(start["headers"]), b"".join(m.get("body", b"") for m in sent[1:])
+
+
+def make(calls: list, delay: float = 0):
+    cache = IdempotencyCache(ttl_seconds=60, max_entries=100)
+    return IdempotencyMiddleware(counting_app(calls, delay), [PATH], cache), cache
+
+
+def test_completed_response_is_replayed():
+    calls = []
+    app, cache = make(calls)
+
+    async def scenario():
+        return await post(app), await post(app)
+
+    first, second = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert second[2] == first[2]
+    assert second[1][b"idempotent-replayed"] == b"true"
+    assert cache.counters["hits"] == 1
+
+
+def test_duplicate_in_flight_attaches_to_the_original():
+    calls = []
+    app, cache = make(calls, delay=0.05)
+
+    async def scenario():
+        return await asyncio.gather(post(app), post(app))
+
+    first, second = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert first[2] == second[2]
+    assert cache.counters["attached"] == 1
+
+
+def test_key_reused_with_different_body_or_accept_is_rejected():
+    calls = []
+    app, cache = make(calls)
+
+    async def scenario():
+        await post(app)
+        other_body = await post(app, body=b'{"thought": "y"}')
+        other_accept = await post(app, accept="application/msgpack")
+        return other_body, other_accept
+
+    other_body, other_accept = asyncio.run(scenario())
+    assert other_body[0] == 422
+    assert other_accept[0] == 422
+    assert len(calls) == 1
+    assert cache.counters["conflicts"] == 2
+
+
+def test_keys_are_scoped_per_caller_and_anonymous_calls_are_not_cached():
+    calls = []
+    app, cache = make(calls)
+
+    async def scenario():
+        return [await post(app, token=token) for token in ("token-a", "token-b", "", "")]
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 4
+    assert [json.loads(body)["call"] for _, _, body in results] == [1, 2, 3, 4]
+    assert len(cache.entries) == 2
+
+
+def test_expired_entries_are_dropped():
+    calls = []
+    app, cache = make(calls)
+    cache.ttl_seconds = 0
+
+    async def scenario():
+        await post(app, key="k1")
+        await post(app, key="k2")
+        return await post(app, key="k1")
+
+    asyncio.run(scenario())
+    assert len(calls) == 3
+    assert cache.counters["expirations"] >= 2
+    assert len(cache.expiry) <= 1
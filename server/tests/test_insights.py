@@ -0,0 +1,56 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import chat
+
+THOUGHT = "I always mess up every presentation at work"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def distortions(thought):
+        return {"distortions": ["all_or_nothing"]}
+
+    async def empty_reminder(thought, note):
+        # A legitimate result that happens to be empty
+        return {}
+
+    async def failing_plan(thought, context):
+        raise RuntimeError("upstream unavailable")
+
+    monkeypatch.setattr(chat, "analyze_cognitive_distortions", distortions)
+    monkeypatch.setattr(chat, "create_reminder", empty_reminder)
+    monkeypatch.setattr(chat, "generate_action_plan", failing_plan)
+    app = FastAPI()
+    app.include_router(chat.router, prefix="/api")
+    return TestClient(app)
+
+
+def test_combined_response_keeps_empty_results_and_reports_failures(client):
+    response = client.post("/api/chat/insights", params={"stream": "false"},
+                           json={"thought": THOUGHT, "parts": ["distortions", "action_plan", "reminder"]})
+    assert response.status_code == 200
+    assert response.json() == {
+        "distortions": {"distortions": ["all_or_nothing"]},
+        "action_plan": {"error": "Failed to generate action_plan"},
+        "reminder": {},
+    }
+
+
+def test_streamed_parts_end_with_done(client):
+    response = client.post("/api/chat/insights",
+                           json={"thought": THOUGHT, "parts": ["distortions", "action_plan", "reminder"]})
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[-1] == {"done": True}
+    by_part = {line["part"]: line for line in lines[:-1]}
+    assert by_part["reminder"] == {"part": "reminder", "result": {}}
+    assert by_part["action_plan"]["error"] == "Failed to generate action_plan"
+    assert by_part["distortions"]["result"] == {"distortions": ["all_or_nothing"]}
+
+
+def test_short_thought_is_rejected(client):
+    assert client.post("/api/chat/insights", json={"thought": "sad"}).status_code == 400
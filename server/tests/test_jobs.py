@@ -0,0 +1,109 @@
+import asyncio
+import uuid
+from datetime import datetime
+
+import pytest
+
+from app.services import jobs
+from app.services.jobs import JobQueue
+from app.services.tracing import record_fallback
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_RETRY_BACKOFF_SECONDS", 0)
+
+
+def flaky_handler(failures: int, calls: list):
+    """Falls back like the chat services do for the first `failures` attempts."""
+    async def handler(payload):
+        calls.append(payload)
+        if len(calls) <= failures:
+            record_fallback("upstream_error")
+            return {"success": True, "source": "fallback"}
+        return {"success": True, "source": "model"}
+    return handler
+
+
+def run_job(queue: JobQueue, job_type: str):
+    async def scenario():
+        await queue.start()
+        try:
+            job = await queue.submit(job_type, {"thought": "x"})
+            return await queue.wait_for(job["id"], 5)
+        finally:
+            await queue.stop()
+    return asyncio.run(scenario())
+
+
+def test_upstream_fallback_is_retried():
+    calls = []
+    queue = JobQueue(workers=1, max_attempts=3)
+    queue.register("flaky", flaky_handler(1, calls))
+
+    job = run_job(queue, "flaky")
+    assert job["status"] == "succeeded"
+    assert job["result"]["source"] == "model"
+    assert job["attempts"] == 2
+    assert queue.counters["retries"] == 1
+
+
+def test_last_attempt_keeps_fallback_result():
+    calls = []
+    queue = JobQueue(workers=1, max_attempts=2)
+    queue.register("flaky", flaky_handler(10, calls))
+
+    job = run_job(queue, "flaky")
+    assert job["status"] == "succeeded"
+    assert job["result"]["source"] == "fallback"
+    assert len(calls) == 2
+    assert queue.counters["fallback_results"] == 1
+
+
+def test_database_jobs_interrupted_by_restart_are_recovered(monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_STORE", "database")
+    store = jobs.DatabaseJobStore()
+    now = datetime.utcnow()
+    interrupted = {"type": "flaky", "payload": {}, "result": None, "error": None, "user_id": None,
+                   "created_at": now, "updated_at": now}
+    resumable = {**interrupted, "id": str(uuid.uuid4()), "status": "running", "attempts": 1}
+    exhausted = {**interrupted, "id": str(uuid.uuid4()), "status": "running", "attempts": 3}
+    store._save(resumable)
+    store._save(exhausted)
+
+    queue = JobQueue(workers=1, max_attempts=3)
+    queue.register("flaky", flaky_handler(0, []))
+
+    async def scenario():
+        await queue.start()
+        try:
+            return await queue.wait_for(resumable["id"], 5), await queue.get(exhausted["id"])
+        finally:
+            await queue.stop()
+
+    resumed, failed = asyncio.run(scenario())
+    assert resumed["status"] == "succeeded"
+    assert failed["status"] == "failed"
+    assert queue.counters["recovered"] == 1
+
+
+def test_stop_releases_waiters_of_unfinished_jobs():
+    queue = JobQueue(workers=1)
+
+    async def never_finishes(payload):
+        await asyncio.sleep(60)
+
+    queue.register("slow", never_finishes)
+
+    async def scenario():
+        await queue.start()
+        job = await queue.submit("slow", {})
+        await asyncio.sleep(0.05)
+        waiter = asyncio.create_task(queue.wait_for(job["id"], 30))
+        await asyncio.sleep(0.05)
+        await queue.stop()
+        return await asyncio.wait_for(waiter, 1)
+
+    job = asyncio.run(scenario())
+    assert job["status"] == "running"
+    assert queue.finished == {}
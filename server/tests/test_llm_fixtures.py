@@ -0,0 +1,64 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from app.database import data_directory
+from app.services.llm_fixtures import FixtureMissError, FixtureStore
+
+REQUEST = {"model": "fast-model", "max_tokens": 100, "messages": [{"role": "user", "content": "Hello"}]}
+
+
+class FakeUpstream:
+    """Answers like the SDK client, numbering its replies."""
+
+    def __init__(self):
+        self.calls = 0
+        self.messages = self
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(
+            model=kwargs["model"], stop_reason="end_turn",
+            content=[SimpleNamespace(type="text", text=f"reply {self.calls}")],
+            usage=SimpleNamespace(input_tokens=10, output_tokens=self.calls),
+        )
+
+
+def test_recorded_calls_replay_in_order(tmp_path):
+    path = str(tmp_path / "fixtures.jsonl.gz")
+    upstream = FakeUpstream()
+
+    async def record():
+        client = FixtureStore(path=path, mode="record").client(upstream)
+        await client.messages.create(**REQUEST)
+        await client.messages.create(**REQUEST)
+
+    async def replay():
+        client = FixtureStore(path=path, mode="replay").client()
+        return [await client.messages.create(**REQUEST) for _ in range(3)]
+
+    asyncio.run(record())
+    replies = asyncio.run(replay())
+    assert upstream.calls == 2
+    # Replayed in recorded order, then staying on the last recording
+    assert [reply.content[0].text for reply in replies] == ["reply 1", "reply 2", "reply 2"]
+    assert replies[0].usage.input_tokens == 10 and replies[1].usage.output_tokens == 2
+
+
+def test_replay_of_an_unrecorded_request_fails(tmp_path):
+    store = FixtureStore(path=str(tmp_path / "missing.jsonl.gz"), mode="replay")
+    with pytest.raises(FixtureMissError, match="fast-model"):
+        asyncio.run(store.client().messages.create(**REQUEST))
+    assert store.counters["misses"] == 1
+
+
+def test_default_file_is_kept_next_to_the_database():
+    store = FixtureStore(path="", mode="off")
+    assert store.path == os.path.join(data_directory(), "llm_fixtures.jsonl.gz")
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError, match="LLM_FIXTURE_MODE"):
+        FixtureStore(mode="rewind")
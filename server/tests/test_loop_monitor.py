@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+from app.services.loop_monitor import LoopMonitor
+
+
+def blocking_call(seconds: float):
+    time.sleep(seconds)
+
+
+def run_monitored(scenario, **kwargs) -> LoopMonitor:
+    monitor = LoopMonitor(interval=0.02, threshold=0.05, enabled=True, **kwargs)
+
+    async def main():
+        monitor.start()
+        try:
+            await scenario()
+        finally:
+            await monitor.stop()
+
+    asyncio.run(main())
+    return monitor
+
+
+def test_blocking_call_is_attributed_to_its_frame():
+    async def scenario():
+        await asyncio.sleep(0.05)
+        blocking_call(0.3)
+        await asyncio.sleep(0.1)
+
+    monitor = run_monitored(scenario)
+    assert monitor.blocked_events >= 1
+    offender = monitor.top_offenders(1)[0]
+    assert "test_loop_monitor.py" in offender["location"]
+    assert "blocking_call" in offender["location"]
+    assert offender["blocked_seconds_max"] >= 0.2
+    assert monitor.lag_max >= 0.2
+
+
+def test_idle_loop_reports_no_blocking():
+    async def scenario():
+        await asyncio.sleep(0.3)
+
+    monitor = run_monitored(scenario)
+    assert monitor.samples >= 5
+    assert monitor.blocked_events == 0
+    assert monitor.stats()["running"] is False
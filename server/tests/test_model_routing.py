@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from app.services import model_routing
+from app.services.model_routing import get_route_config, select_route
+from app.services.usage import usage_meter
+
+CONFIG = {
+    "tiers": {"fast": {"model": "fast-model"}, "strong": {"model": "strong-model"}},
+    "routes": {
+        "analysis": {
+            "tier": "fast",
+            "max_tokens": 500,
+            "rules": [
+                {"max_words": 2, "tier": "rule_based"},
+                {"min_words": 30, "tier": "strong", "max_tokens": 1500},
+                {"min_turns": 10, "tier": "strong"},
+            ],
+        },
+    },
+}
+
+
+def use_config(monkeypatch, tmp_path, config):
+    path = tmp_path / "routes.json"
+    path.write_text(json.dumps(config))
+    monkeypatch.setattr(model_routing, "MODEL_ROUTES_FILE", str(path))
+    get_route_config.cache_clear()
+
+
+@pytest.fixture(autouse=True)
+def routes(monkeypatch, tmp_path):
+    monkeypatch.setattr(usage_meter, "quota_exhausted", lambda: False)
+    use_config(monkeypatch, tmp_path, CONFIG)
+    yield
+    get_route_config.cache_clear()
+
+
+def test_default_tier_when_no_rule_matches():
+    route = select_route("analysis", "I keep worrying about the deadline")
+    assert route == {"route": "analysis", "tier": "fast", "model": "fast-model", "max_tokens": 500}
+
+
+def test_first_matching_rule_wins_and_can_set_its_budget():
+    long_text = " ".join(["word"] * 40)
+    assert select_route("analysis", long_text)["model"] == "strong-model"
+    assert select_route("analysis", long_text)["max_tokens"] == 1500
+    # The turns rule inherits the route's budget
+    route = select_route("analysis", "Short but deep conversation", turns=12)
+    assert (route["tier"], route["max_tokens"]) == ("strong", 500)
+
+
+def test_rule_based_tier_skips_the_model():
+    before = model_routing.route_metrics.routes.get("analysis:rule_based", {}).get("calls", 0)
+    assert select_route("analysis", "so sad") is None
+    assert model_routing.route_metrics.routes["analysis:rule_based"]["calls"] == before + 1
+
+
+def test_unknown_tier_or_rule_key_is_rejected(monkeypatch, tmp_path):
+    bad_tier = {**CONFIG, "routes": {"analysis": {"tier": "huge", "max_tokens": 10}}}
+    use_config(monkeypatch, tmp_path, bad_tier)
+    with pytest.raises(ValueError, match="unknown tier"):
+        get_route_config()
+
+    bad_key = {**CONFIG, "routes": {"analysis": {"tier": "fast", "max_tokens": 10,
+                                                 "rules": [{"min_sentences": 3, "tier": "strong"}]}}}
+    use_config(monkeypatch, tmp_path, bad_key)
+    with pytest.raises(ValueError, match="unknown rule keys"):
+        get_route_config()
+
+
+def test_shipped_route_table_is_valid(monkeypatch):
+    monkeypatch.undo()
+    get_route_config.cache_clear()
+    assert get_route_config()["routes"]
@@ -0,0 +1,81 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.profiler import SamplingProfiler
+
+
+def profile_while(target, seconds: float = 0.3):
+    """Run `target(stop)` in a thread and profile the process meanwhile."""
+    stop = threading.Event()
+    thread = threading.Thread(target=target, args=(stop,), name="profiled")
+    thread.start()
+    time.sleep(0.05)
+    try:
+        return SamplingProfiler(enabled=True).run(seconds, 0.005)
+    finally:
+        stop.set()
+        thread.join()
+
+
+def idle_loop(policy=None):
+    def target(stop: threading.Event):
+        async def main():
+            while not stop.is_set():
+                await asyncio.sleep(0.05)
+
+        if policy is None:
+            asyncio.run(main())
+        else:
+            loop = policy.new_event_loop()
+            try:
+                loop.run_until_complete(main())
+            finally:
+                loop.close()
+    return target
+
+
+def profiled_samples(result) -> int:
+    return sum(int(line.rsplit(" ", 1)[1]) for line in result["collapsed"] if line.startswith("profiled;"))
+
+
+def test_idle_asyncio_loop_counts_as_idle():
+    result = profile_while(idle_loop())
+    assert result["samples"] > 10
+    assert profiled_samples(result) <= result["ticks"] * 0.1
+
+
+def test_idle_uvloop_loop_counts_as_idle():
+    uvloop = pytest.importorskip("uvloop")
+    result = profile_while(idle_loop(uvloop.EventLoopPolicy()))
+    assert result["samples"] > 10
+    assert profiled_samples(result) <= result["ticks"] * 0.1
+
+
+def spin(seconds: float):
+    # Longer than the GIL switch interval, so the sampler preempts it mid-loop
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_busy_python_code_under_uvloop_counts_as_busy():
+    uvloop = pytest.importorskip("uvloop")
+
+    def target(stop: threading.Event):
+        async def main():
+            while not stop.is_set():
+                spin(0.02)
+                await asyncio.sleep(0)
+
+        loop = uvloop.EventLoopPolicy().new_event_loop()
+        try:
+            loop.run_until_complete(main())
+        finally:
+            loop.close()
+
+    result = profile_while(target)
+    assert profiled_samples(result) >= result["ticks"] * 0.5
+    assert any(":spin" in line for line in result["collapsed"] if line.startswith("profiled;"))
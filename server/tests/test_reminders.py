@@ -0,0 +1,58 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+from app.services.reminders import ReminderScheduler
+
+
+def new_user() -> str:
+    return f"user-{uuid.uuid4().hex[:8]}"
+
+
+def insert(scheduler: ReminderScheduler, user_id: str, due_at: datetime, status: str = "pending") -> int:
+    return scheduler._insert({
+        "user_id": user_id, "text": "Check in", "category": "general", "suggested_time": None,
+        "due_at": due_at, "status": status, "created_at": datetime.utcnow(), "dispatched_at": None,
+    })["id"]
+
+
+def test_window_loads_continue_from_cursor_when_heap_is_full():
+    async def scenario():
+        scheduler = ReminderScheduler(heap_limit=2, window_seconds=3600, enabled=True)
+        user_id = new_user()
+        now = datetime.utcnow()
+        # Inserted out of due order: ids do not follow due times
+        ids = [insert(scheduler, user_id, now - timedelta(seconds=offset)) for offset in (1, 5, 3, 4, 2)]
+
+        dispatched = []
+        for _ in range(len(ids)):
+            await scheduler._refill(now)
+            assert len(scheduler.heap) <= 2
+            dispatched += [entry[1] for entry in scheduler.heap if entry[0] <= now]
+            await scheduler._dispatch_due(now)
+        await scheduler._refill(now)
+        return ids, dispatched, scheduler
+
+    ids, dispatched, scheduler = asyncio.run(scenario())
+    # Earliest first, each reminder exactly once
+    assert dispatched[:2] == [ids[1], ids[3]]
+    assert sorted(dispatched) == sorted(ids)
+    assert scheduler.counters["dispatched"] == len(ids)
+    assert scheduler.cursor[1] == -1
+
+
+def test_due_pages_past_excluded_reminders():
+    async def scenario():
+        scheduler = ReminderScheduler(enabled=True)
+        user_id = new_user()
+        now = datetime.utcnow()
+        ids = [insert(scheduler, user_id, now, status="due") for _ in range(7)]
+        # The stream has sent the first five; the two after them must still come through
+        first = await scheduler.due(user_id, exclude=set(ids[:5]), limit=3)
+        # A lower id that falls due later is not skipped either
+        rest = await scheduler.due(user_id, exclude=set(ids[:2] + ids[3:]), limit=3)
+        return ids, first, rest
+
+    ids, first, rest = asyncio.run(scenario())
+    assert [item["id"] for item in first] == ids[5:]
+    assert [item["id"] for item in rest] == [ids[2]]
@@ -0,0 +1,51 @@
+from datetime import datetime
+
+import msgpack
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.responses import FastResponse, response_content
+from app.routers import thoughts
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(thoughts.router, prefix="/api")
+
+    @app.get("/payload", response_class=FastResponse)
+    async def payload():
+        return FastResponse({"when": datetime(2024, 5, 1, 9, 30), "items": [1, 2]})
+
+    return TestClient(app)
+
+
+def test_json_is_the_default(client):
+    response = client.get("/payload")
+    assert response.headers["content-type"] == "application/json"
+    assert response.headers["vary"] == "Accept"
+    assert response.json() == {"when": "2024-05-01T09:30:00", "items": [1, 2]}
+    assert int(response.headers["content-length"]) == len(response.content)
+
+
+def test_msgpack_when_accepted(client):
+    response = client.get("/payload", headers={"Accept": "application/msgpack, application/json;q=0.5"})
+    assert response.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(response.content) == {"when": "2024-05-01T09:30:00", "items": [1, 2]}
+
+
+def test_analyze_route_negotiates_without_revalidating(client):
+    body = {"thought": "I always fail at everything"}
+    as_json = client.post("/api/analyze", json=body)
+    as_msgpack = client.post("/api/analyze", json=body, headers={"Accept": "application/x-msgpack"})
+
+    assert as_json.status_code == as_msgpack.status_code == 200
+    assert as_msgpack.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(as_msgpack.content)["original_thought"] == as_json.json()["original_thought"]
+
+
+def test_internal_callers_read_the_unrendered_content():
+    content = {"success": True}
+    assert response_content(FastResponse(content)) is content
+    assert response_content(content) is content
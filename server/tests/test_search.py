@@ -0,0 +1,89 @@
+import uuid
+from datetime import datetime, timedelta
+
+from app.database import get_engine
+from app.services import history
+from app.services.search import match_expression, search_history
+
+
+def store(user_id: str, entries):
+    records = [
+        {"user_id": user_id, "kind": kind, "input": text, "result": result,
+         "created_at": created_at or datetime.utcnow()}
+        for kind, text, result, created_at in entries
+    ]
+    with get_engine().begin() as conn:
+        history.write_batch(conn, records)
+
+
+def new_user() -> str:
+    return f"user-{uuid.uuid4().hex[:8]}"
+
+
+def analysis(*distortions, themes=()):
+    return {"identified_distortions": [{"id": d} for d in distortions], "themes": list(themes)}
+
+
+def test_search_is_ranked_and_scoped_to_the_user():
+    user_id = new_user()
+    store(user_id, [
+        ("analysis", "My manager will fire me over the deadline", analysis(), None),
+        ("analysis", "The deadline, the deadline, I will miss the deadline", analysis(), None),
+        ("analysis", "I slept badly", analysis(), None),
+    ])
+    store(new_user(), [("analysis", "Another user's deadline", analysis(), None)])
+
+    found = search_history(user_id, "deadline")
+    assert [r["input"] for r in found["results"]] == [
+        "The deadline, the deadline, I will miss the deadline",
+        "My manager will fire me over the deadline",
+    ]
+    assert "[deadline]" in found["results"][0]["snippet"]
+
+
+def test_last_word_is_prefix_matched():
+    user_id = new_user()
+    store(user_id, [("analysis", "Zebra crossing", analysis(), None)])
+    assert len(search_history(user_id, "zebra cross")["results"]) == 1
+    assert search_history(user_id, "zeb crossing")["results"] == []
+
+
+def test_filters_by_kind_distortion_theme_and_date():
+    user_id = new_user()
+    old = datetime.utcnow() - timedelta(days=30)
+    store(user_id, [
+        ("analysis", "Everyone hates me at work", analysis("overgeneralization", themes=["work"]), old),
+        ("analysis", "I always fail at work", analysis("all-or-nothing", themes=["work"]), None),
+        ("categorization", "Work stress", {"key_phrase": "stress", "themes": ["work"]}, None),
+    ])
+
+    def inputs(**filters):
+        return [r["input"] for r in search_history(user_id, "work", **filters)["results"]]
+
+    assert inputs(kind="categorization") == ["Work stress"]
+    assert inputs(distortion="overgeneralization") == ["Everyone hates me at work"]
+    assert inputs(distortion="all-or-nothing") == ["I always fail at work"]
+    assert sorted(inputs(theme="work")) == sorted(["Everyone hates me at work", "I always fail at work",
+                                                  "Work stress"])
+    assert "Everyone hates me at work" not in inputs(since=old + timedelta(days=1))
+    assert inputs(until=old + timedelta(days=1)) == ["Everyone hates me at work"]
+
+
+def test_empty_query_lists_newest_first_with_pagination():
+    user_id = new_user()
+    store(user_id, [("analysis", f"Thought {i}", analysis(), None) for i in range(5)])
+
+    first = search_history(user_id, "", limit=2)
+    assert [r["input"] for r in first["results"]] == ["Thought 4", "Thought 3"]
+    assert first["has_more"]
+    last = search_history(user_id, "", limit=2, offset=4)
+    assert [r["input"] for r in last["results"]] == ["Thought 0"]
+    assert not last["has_more"]
+
+
+def test_query_syntax_is_quoted():
+    expression = match_expression('deadline" OR tags:*', "someone")
+    assert 'body:("deadline" AND "or" AND "tags"*)' in expression
+    user_id = new_user()
+    store(user_id, [("analysis", "deadline", analysis(), None)])
+    assert search_history(user_id, 'deadline" OR tags:*')["results"] == []
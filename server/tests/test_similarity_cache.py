@@ -0,0 +1,63 @@
+from app.services.similarity_cache import SimilarityCache
+
+MARK = "I am terrified my husband Mark is going to leave me after the fight last night"
+SARAH = "I am terrified my girlfriend Sarah is going to leave me after the fight last night"
+
+
+def make_cache(**kwargs) -> SimilarityCache:
+    return SimilarityCache("test", enabled=True, **kwargs)
+
+
+def test_entries_are_not_served_to_other_users():
+    cache = make_cache()
+    cache.put(MARK, {"balanced_thought": "One fight does not mean Mark will leave"}, "alice")
+
+    assert cache.get(MARK, "bob") is None
+    assert cache.get(MARK, None) is None
+    assert cache.get(MARK, "alice")[1] == 1.0
+
+
+def test_different_people_never_match():
+    # Even with a low shingle threshold, differing content words rule out reuse
+    cache = make_cache(threshold=0.5)
+    cache.put(MARK, {"balanced_thought": "One fight does not mean Mark will leave"}, "alice")
+
+    assert cache.get(SARAH, "alice") is None
+
+
+def test_filler_word_variants_still_match_for_the_same_user():
+    cache = make_cache(threshold=0.5)
+    cache.put("I'm so worried about the presentation at work", {"reframes": []}, "alice")
+
+    hit = cache.get("I am worried about the presentation at work!", "alice")
+    assert hit is not None and hit[1] < 1.0
+
+
+def test_negated_thought_does_not_match():
+    cache = make_cache(threshold=0.5)
+    cache.put("I will pass the exam tomorrow", {"reframes": []}, "alice")
+
+    assert cache.get("I will not pass the exam tomorrow", "alice") is None
+
+
+def test_paraphrase_with_an_extra_word_matches():
+    cache = make_cache()
+    cache.put("I always mess up at work", {"reframes": []}, "alice")
+
+    hit = cache.get("I always mess everything up at work", "alice")
+    assert hit is not None and hit[1] < 1.0
+
+
+def test_one_changed_word_in_a_short_thought_does_not_match():
+    cache = make_cache(threshold=0.5)
+    cache.put("I am worried about talking to my mom tomorrow", {"reframes": []}, "alice")
+
+    assert cache.get("I am worried about talking to my job tomorrow", "alice") is None
+
+
+def test_anonymous_callers_share_only_their_own_scope():
+    cache = make_cache()
+    cache.put("I always mess up at work", {"reframes": []}, None)
+
+    assert cache.get("I always mess everything up at work", None) is not None
+    assert cache.get("I always mess everything up at work", "alice") is None
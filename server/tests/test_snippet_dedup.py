@@ -0,0 +1,110 @@
+import asyncio
+
+from app.services.snippet_dedup import SnippetDeduplicator
+
+MOM = "I am worried about talking to my mom tomorrow"
+JOB = "I am worried about talking to my job tomorrow"
+
+
+def make_deduplicator(**kwargs) -> SnippetDeduplicator:
+    return SnippetDeduplicator(enabled=True, **kwargs)
+
+
+def recording_categorize(calls):
+    async def categorize(text):
+        calls.append(text)
+        await asyncio.sleep(0)
+        return {"text": text}
+    return categorize
+
+
+def test_similar_but_distinct_thoughts_are_categorized_separately():
+    async def scenario():
+        dedup = make_deduplicator(settle_seconds=0.01)
+        calls = []
+        categorize = recording_categorize(calls)
+        first, second = await asyncio.gather(
+            dedup.categorize("alice", MOM, categorize),
+            dedup.categorize("alice", JOB, categorize),
+        )
+        return first, second, calls, dedup
+
+    first, second, calls, dedup = asyncio.run(scenario())
+    assert first == {"text": MOM}
+    assert second == {"text": JOB}
+    assert sorted(calls) == sorted([MOM, JOB])
+    assert dedup.counters["duplicates_suppressed"] == 0
+    assert dedup.counters["extensions_merged"] == 0
+
+
+def test_repeats_and_prefix_extensions_share_one_call():
+    async def scenario():
+        dedup = make_deduplicator(settle_seconds=0.01)
+        calls = []
+        categorize = recording_categorize(calls)
+        results = await asyncio.gather(
+            dedup.categorize("alice", "I am worried", categorize),
+            dedup.categorize("alice", "I am worried about my job", categorize),
+            dedup.categorize("alice", "I am worried about my job", categorize),
+        )
+        return results, calls, dedup
+
+    results, calls, dedup = asyncio.run(scenario())
+    assert calls == ["I am worried about my job"]
+    assert all(result == {"text": "I am worried about my job"} for result in results)
+    assert not dedup.settling
+
+
+def test_lone_snippet_skips_the_settle_delay():
+    async def scenario():
+        dedup = make_deduplicator(settle_seconds=30)
+        calls = []
+        result = await asyncio.wait_for(dedup.categorize("alice", MOM, recording_categorize(calls)), 1)
+        return result, dedup
+
+    result, dedup = asyncio.run(scenario())
+    assert result == {"text": MOM}
+    assert dedup.counters["settle_delays"] == 0
+
+
+def test_sessions_do_not_share_snippets():
+    async def scenario():
+        dedup = make_deduplicator(settle_seconds=0.01)
+        calls = []
+        categorize = recording_categorize(calls)
+        await dedup.categorize("alice", MOM, categorize)
+        await dedup.categorize("bob", MOM, categorize)
+        return calls
+
+    assert asyncio.run(scenario()) == [MOM, MOM]
+
+
+def test_growing_partials_sent_one_after_another_share_one_call():
+    async def scenario():
+        dedup = make_deduplicator(settle_seconds=0.01)
+        calls = []
+        categorize = recording_categorize(calls)
+        first = await dedup.categorize("alice", "I keep thinking everyone at the office is laughing at me", categorize)
+        second = await dedup.categorize("alice", "I keep thinking everyone at the office is laughing at me again",
+                                        categorize)
+        return first, second, calls, dedup
+
+    first, second, calls, dedup = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert second == first
+    assert dedup.counters["completed_extensions_merged"] == 1
+
+
+def test_large_extension_of_a_completed_snippet_is_categorized_again():
+    async def scenario():
+        dedup = make_deduplicator(settle_seconds=0.01)
+        calls = []
+        categorize = recording_categorize(calls)
+        await dedup.categorize("alice", "I am worried", categorize)
+        await dedup.categorize("alice", "I am worried about my job", categorize)
+        # A changed word after completion is a different thought too
+        await dedup.categorize("alice", MOM, categorize)
+        await dedup.categorize("alice", JOB, categorize)
+        return calls
+
+    assert asyncio.run(scenario()) == ["I am worried", "I am worried about my job", MOM, JOB]
@@ -0,0 +1,45 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from app.services import startup
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+DEFERRED_MODULES = ["anthropic", "passlib", "jose", "bcrypt", "numpy", "starlette.staticfiles"]
+
+
+def test_importing_the_app_defers_heavy_dependencies():
+    # A fresh interpreter, since this test process has imported everything already
+    script = (
+        "import json, sys\n"
+        "import app.main\n"
+        "from app.services import catalog\n"
+        f"print(json.dumps({{'loaded': [m for m in {DEFERRED_MODULES!r} if m in sys.modules],\n"
+        "                   'catalog_cached': catalog.get_distortions_data.cache_info().currsize}))\n"
+    )
+    env = {**os.environ, "PYTHONPATH": str(SERVER_DIR)}
+    output = subprocess.run([sys.executable, "-c", script], cwd=SERVER_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    assert result == {"loaded": [], "catalog_cached": 0}
+
+
+def test_lazy_warmups_run_after_startup_and_survive_errors(monkeypatch):
+    monkeypatch.setattr(startup, "LAZY_INIT", True)
+    ran = []
+
+    def failing():
+        raise RuntimeError("boom")
+
+    async def scenario():
+        task = await startup.initialize([failing, lambda: ran.append("second")])
+        # Nothing has run yet: startup finishes before the warm-ups
+        assert ran == []
+        await task
+
+    asyncio.run(scenario())
+    assert ran == ["second"]
+    assert startup.startup_metrics["warmup_seconds"] is not None
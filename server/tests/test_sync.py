@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+from pydantic import BaseModel, ValidationError
+
+from app.routers import sync as sync_router
+from app.routers.sync import SyncItem, SyncRequest
+
+
+class EchoInput(BaseModel):
+    text: str
+
+
+@pytest.fixture
+def echo(monkeypatch):
+    """A sync handler that records its calls and answers after a short delay."""
+    calls = []
+
+    async def handler(payload: EchoInput):
+        calls.append(payload.text)
+        await asyncio.sleep(0.05)
+        return {"echo": payload.text}
+
+    monkeypatch.setitem(sync_router.SYNC_HANDLERS, "/test/echo", (EchoInput, handler))
+    monkeypatch.setattr(sync_router, "recent_results", type(sync_router.recent_results)())
+    monkeypatch.setattr(sync_router, "in_flight", {})
+    return calls
+
+
+def batch(key: str, text: str) -> SyncRequest:
+    return SyncRequest(items=[SyncItem(idempotency_key=key, endpoint="/test/echo", data={"text": text})])
+
+
+def test_anonymous_results_are_not_shared(echo):
+    async def scenario():
+        first = await sync_router.sync(batch("1700000000000", "mine"), user=None)
+        second = await sync_router.sync(batch("1700000000000", "theirs"), user=None)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first["results"][0]["result"] == {"echo": "mine"}
+    assert second["results"][0]["result"] == {"echo": "theirs"}
+    assert "replayed" not in second["results"][0]
+    assert echo == ["mine", "theirs"]
+
+
+def test_keys_are_scoped_per_user(echo):
+    async def scenario():
+        alice = await sync_router.sync(batch("k1", "alice"), user={"id": "alice"})
+        bob = await sync_router.sync(batch("k1", "bob"), user={"id": "bob"})
+        retry = await sync_router.sync(batch("k1", "alice again"), user={"id": "alice"})
+        return alice, bob, retry
+
+    alice, bob, retry = asyncio.run(scenario())
+    assert alice["results"][0]["result"] == {"echo": "alice"}
+    assert bob["results"][0]["result"] == {"echo": "bob"}
+    assert retry["results"][0]["result"] == {"echo": "alice"}
+    assert retry["results"][0]["replayed"] is True
+    assert echo == ["alice", "bob"]
+
+
+def test_concurrent_batches_with_same_key_run_once(echo):
+    async def scenario():
+        return await asyncio.gather(
+            sync_router.sync(batch("k1", "once"), user={"id": "alice"}),
+            sync_router.sync(batch("k1", "once"), user={"id": "alice"}),
+        )
+
+    first, second = asyncio.run(scenario())
+    assert echo == ["once"]
+    assert first["results"][0]["result"] == second["results"][0]["result"] == {"echo": "once"}
+    assert sync_router.in_flight == {}
+
+
+def test_queue_larger_than_one_request_drains_in_batches(echo, monkeypatch):
+    async def instant(payload: EchoInput):
+        echo.append(payload.text)
+        return {"echo": payload.text}
+
+    monkeypatch.setitem(sync_router.SYNC_HANDLERS, "/test/echo", (EchoInput, instant))
+    queue = [SyncItem(idempotency_key=f"k{i}", endpoint="/test/echo", data={"text": str(i)}) for i in range(450)]
+
+    with pytest.raises(ValidationError):
+        SyncRequest(items=queue)
+
+    async def scenario():
+        # What the client does: batches of at most MAX_SYNC_ITEMS, one after another
+        results = []
+        for start in range(0, len(queue), sync_router.MAX_SYNC_ITEMS):
+            response = await sync_router.sync(
+                SyncRequest(items=queue[start:start + sync_router.MAX_SYNC_ITEMS]), user={"id": "alice"})
+            results += response["results"]
+        return results
+
+    results = asyncio.run(scenario())
+    assert [result["idempotency_key"] for result in results if result["ok"]] == [item.idempotency_key for item in queue]
+    assert len(echo) == 450
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import uuid
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from app.database import get_engine
+from app.services import ai_analyzer
+from app.services import history
+from app.services import thought_index as thought_index_module
+from app.services.request_context import current_request
+from app.services.thought_index import ThoughtIndex, related_analyses
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+PAST_THOUGHT = "I will never finish this project before the deadline"
+SIMILAR_THOUGHT = "I will never finish this report before the deadline"  # cosine ~0.83
+UNRELATED_THOUGHT = "my dog likes long walks in the park"
+
+pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def index(monkeypatch, tmp_path):
+    index = ThoughtIndex(directory=str(tmp_path), enabled=True)
+    monkeypatch.setattr(thought_index_module, "thought_index", index)
+    monkeypatch.setattr(ai_analyzer, "thought_index", index)
+    return index
+
+
+def store_analysis(user_id: str, text: str, result: dict):
+    """Write a history row and index it, as the write-behind writer does."""
+    record = {"user_id": user_id, "kind": "analysis", "input": text, "result": result,
+              "created_at": datetime.utcnow()}
+    with get_engine().begin() as conn:
+        index_thoughts = history.write_batch(conn, [record])
+    index_thoughts()
+
+
+def test_rows_survive_growth_and_reopening(monkeypatch, tmp_path):
+    monkeypatch.setattr(thought_index_module, "INITIAL_CAPACITY", 2)
+    index = ThoughtIndex(directory=str(tmp_path), enabled=True)
+    for entry_id in range(1, 6):
+        index.add("alice", entry_id, f"thought number {entry_id} about work")
+    index.add("alice", 6, PAST_THOUGHT)
+
+    # A new instance maps the files written by the first, using the persisted count
+    reopened = ThoughtIndex(directory=str(tmp_path), enabled=True)
+    assert reopened._user_index("alice").count == 6
+    assert reopened.search("alice", [PAST_THOUGHT], k=1)[0][0][0] == 6
+    assert reopened.search("bob", [PAST_THOUGHT]) == [[]]
+
+
+def test_related_analyses_apply_the_context_threshold(index):
+    user_id = f"user-{uuid.uuid4().hex[:8]}"
+    store_analysis(user_id, PAST_THOUGHT, {"analysis_method": "ai", "reframes": []})
+
+    related = related_analyses(user_id, SIMILAR_THOUGHT)
+    assert [item["thought"] for item in related] == [PAST_THOUGHT]
+    assert 0.5 <= related[0]["similarity"] < 0.9
+    assert related_analyses(user_id, UNRELATED_THOUGHT) == []
+    assert related_analyses("someone-else", PAST_THOUGHT) == []
+
+
+def analyze_as(user_id: str, thought: str, monkeypatch, reply: str = None) -> tuple:
+    prompts = []
+
+    async def fake_create_message(client, route, messages):
+        prompts.append(messages[0]["content"])
+        return SimpleNamespace(content=[SimpleNamespace(text=reply)])
+
+    monkeypatch.setattr(ai_analyzer, "get_anthropic_client", lambda: object())
+    monkeypatch.setattr(ai_analyzer, "select_route", lambda name, text: {"route": name, "model": "m"})
+    monkeypatch.setattr(ai_analyzer, "create_message", fake_create_message)
+
+    async def scenario():
+        token = current_request.set({"user_id": user_id, "client_host": None, "path": "/api/analyze"})
+        try:
+            return await ai_analyzer.analyze_thought_with_ai(thought)
+        finally:
+            current_request.reset(token)
+
+    return asyncio.run(scenario()), prompts
+
+
+def test_near_identical_thought_reuses_the_stored_analysis(index, monkeypatch):
+    user_id = f"user-{uuid.uuid4().hex[:8]}"
+    stored = {"analysis_method": "ai", "compassionate_response": "Stored reply",
+              "reframes": [{"perspective": "Break it into steps"}]}
+    store_analysis(user_id, PAST_THOUGHT, stored)
+
+    result, prompts = analyze_as(user_id, PAST_THOUGHT + "!", monkeypatch)
+    assert prompts == []
+    assert result["compassionate_response"] == "Stored reply"
+    assert result["original_thought"] == PAST_THOUGHT + "!"
+    assert result["related_thoughts"][0]["thought"] == PAST_THOUGHT
+    assert index.counters["reused"] == 1
+
+
+def test_similar_thought_is_sent_to_the_model_as_context(index, monkeypatch):
+    user_id = f"user-{uuid.uuid4().hex[:8]}"
+    store_analysis(user_id, PAST_THOUGHT, {"analysis_method": "ai",
+                                          "reframes": [{"perspective": "Break it into steps"}]})
+    reply = json.dumps({"identified_distortions": [], "reframes": [], "compassionate_response": "New reply"})
+
+    result, prompts = analyze_as(user_id, SIMILAR_THOUGHT, monkeypatch, reply)
+    assert len(prompts) == 1
+    assert "SIMILAR THOUGHTS BEFORE" in prompts[0] and "Break it into steps" in prompts[0]
+    assert result["compassionate_response"] == "New reply"
+    assert [item["thought"] for item in result["related_thoughts"]] == [PAST_THOUGHT]
+    assert (index.counters["reused"], index.counters["context_matches"]) == (0, 1)
+
+
+def test_index_is_disabled_without_numpy(tmp_path):
+    # A fresh interpreter where numpy cannot be imported
+    script = (
+        "import json, sys\n"
+        "sys.modules['numpy'] = None\n"
+        "from app.services.thought_index import ThoughtIndex, NUMPY_AVAILABLE, thought_index\n"
+        f"index = ThoughtIndex(directory={str(tmp_path)!r})\n"
+        "index.add('alice', 1, 'a thought')\n"
+        "print(json.dumps({'available': NUMPY_AVAILABLE, 'enabled': thought_index.enabled,\n"
+        "                  'search': index.search('alice', ['a thought']), 'stats': index.stats()['enabled']}))\n"
+    )
+    env = {**os.environ, "PYTHONPATH": str(SERVER_DIR)}
+    output = subprocess.run([sys.executable, "-c", script], cwd=SERVER_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    assert result == {"available": False, "enabled": False, "search": [[]], "stats": False}
+    assert os.listdir(tmp_path) == []
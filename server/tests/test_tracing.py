@@ -0,0 +1,75 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.middleware.tracing import TracingMiddleware
+from app.routers import thoughts
+from app.services import tracing
+from app.services.tracing import TraceExporter, span
+
+
+@pytest.fixture
+def exporter(monkeypatch):
+    exporter = TraceExporter(buffer_size=10, export_file=None)
+    monkeypatch.setattr(tracing, "exporter", exporter)
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", True)
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 1.0)
+    return exporter
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(thoughts.router, prefix="/api")
+    app.add_middleware(TracingMiddleware)
+    return TestClient(app)
+
+
+def test_request_spans_cover_router_service_and_fallback(exporter, client, monkeypatch):
+    monkeypatch.setattr("app.services.ai_analyzer.get_anthropic_client", lambda: None)
+    response = client.post("/api/analyze", json={"thought": "I always fail at everything"})
+    assert response.status_code == 200
+
+    trace = exporter.find(response.headers["x-trace-id"])
+    assert trace is not None
+    spans = {s["name"]: s for s in trace["spans"]}
+    root = spans["POST /api/analyze"]
+    route = spans["route /api/analyze"]
+    endpoint = spans["endpoint analyze_thought"]
+    analyzer = spans["analyzer.analyze_thought_with_ai"]
+    rule_based = spans["analyzer.analyze_thought_rule_based"]
+
+    # Each stage is nested in the one that called it
+    assert root["parent_id"] is None
+    assert route["parent_id"] == root["span_id"]
+    assert endpoint["parent_id"] == route["span_id"]
+    assert analyzer["parent_id"] == endpoint["span_id"]
+    assert rule_based["parent_id"] == analyzer["span_id"]
+
+    assert trace["attributes"]["status_code"] == 200
+    assert trace["attributes"]["route"] == "/api/analyze"
+    assert "parse_ms" in route["attributes"]
+    assert analyzer["attributes"]["fallback_reason"]
+    assert exporter.fallbacks[analyzer["attributes"]["fallback_reason"]] == 1
+
+
+def test_failing_block_marks_its_span_as_error(exporter):
+    with pytest.raises(ValueError):
+        with span("outer"):
+            with span("inner"):
+                raise ValueError("bad input")
+
+    spans = {s["name"]: s for s in exporter.traces[-1]["spans"]}
+    assert spans["inner"]["status"] == "error"
+    assert spans["inner"]["error"] == "ValueError: bad input"
+    assert spans["outer"]["status"] == "error"
+
+
+def test_unsampled_requests_are_not_recorded(exporter, client, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 0.0)
+    response = client.post("/api/analyze", json={"thought": "I always fail at everything"})
+
+    assert response.status_code == 200
+    assert "x-trace-id" not in response.headers
+    assert len(exporter.traces) == 0
+    assert exporter.counters["unsampled"] == 1
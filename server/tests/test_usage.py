@@ -0,0 +1,67 @@
+import asyncio
+from contextlib import contextmanager
+
+from app.services import model_routing
+from app.services.model_routing import select_route
+from app.services.request_context import current_request
+from app.services.usage import UsageMeter
+
+
+@contextmanager
+def caller(user_id=None, client_host="10.0.0.1", path="/api/analyze"):
+    token = current_request.set({"user_id": user_id, "client_host": client_host, "path": path})
+    try:
+        yield
+    finally:
+        current_request.reset(token)
+
+
+def test_quota_is_per_caller_and_per_kind():
+    meter = UsageMeter(user_quota=100, anonymous_quota=10, enabled=True)
+    with caller(user_id="alice"):
+        meter.record("analyze", "fast-model", 60, 30)
+        assert not meter.over_quota()
+        meter.record("analyze", "fast-model", 5, 5)
+        assert meter.over_quota()
+        assert meter.caller_usage("user:alice")["tokens_remaining"] == 0
+    with caller(user_id="bob"):
+        assert not meter.over_quota()
+    with caller():
+        meter.record("analyze", "fast-model", 8, 2)
+        assert meter.over_quota()
+
+
+def test_exhausted_quota_routes_to_rule_based(monkeypatch):
+    meter = UsageMeter(user_quota=50, enabled=True)
+    monkeypatch.setattr(model_routing, "usage_meter", meter)
+    with caller(user_id="alice"):
+        assert select_route("analyze", "I keep worrying about the deadline") is not None
+        meter.record("analyze", "fast-model", 40, 10)
+        assert select_route("analyze", "I keep worrying about the deadline") is None
+    assert meter.counters["quota_fallbacks"] == 1
+
+
+def test_disabled_quota_never_rejects():
+    meter = UsageMeter(user_quota=0, enabled=True)
+    with caller(user_id="alice"):
+        meter.record("analyze", "fast-model", 10_000, 10_000)
+        assert not meter.quota_exhausted()
+
+
+def test_flushed_usage_is_reported_and_reloaded():
+    async def scenario():
+        meter = UsageMeter(user_quota=1000, enabled=True)
+        with caller(user_id="report-user", path="/api/chat"):
+            meter.record("chat", "fast-model", 100, 20)
+            meter.record("chat", "fast-model", 50, 10)
+        rows = await meter.report(1, "endpoint", "user:report-user")
+        assert rows == [{"endpoint": "/api/chat", "requests": 2, "input_tokens": 150,
+                         "output_tokens": 30, "total_tokens": 180}]
+
+        # A restarted meter picks today's totals up from the table
+        restarted = UsageMeter(user_quota=1000, enabled=True)
+        await restarted.start()
+        await restarted.stop()
+        assert restarted.caller_usage("user:report-user")["tokens_used"] == 180
+
+    asyncio.run(scenario())
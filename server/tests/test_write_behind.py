@@ -0,0 +1,64 @@
+import asyncio
+import uuid
+from datetime import datetime
+
+from sqlalchemy import select
+
+from app.database import get_engine
+from app.models import history
+from app.services import history as history_service
+from app.services.thought_index import thought_index
+from app.services.write_behind import WriteBehindQueue
+
+
+def history_rows(user_id: str):
+    with get_engine().connect() as conn:
+        return conn.execute(select(history).where(history.c.user_id == user_id)).mappings().all()
+
+
+def write_analyses(queue: WriteBehindQueue, user_id: str, count: int):
+    async def scenario():
+        await queue.start()
+        try:
+            for i in range(count):
+                await queue.enqueue(history_service.write_batch, {
+                    "user_id": user_id, "kind": "analysis", "input": f"Thought number {i}",
+                    "result": {"n": i}, "created_at": datetime.utcnow(),
+                })
+        finally:
+            await queue.stop()
+    asyncio.run(scenario())
+
+
+def test_callback_failure_does_not_rewrite_the_batch(monkeypatch):
+    def broken_add(*args):
+        raise RuntimeError("index unavailable")
+
+    monkeypatch.setattr(thought_index, "add", broken_add)
+    user_id = f"user-{uuid.uuid4().hex[:8]}"
+    queue = WriteBehindQueue(batch_size=10, max_delay_ms=20)
+
+    write_analyses(queue, user_id, 3)
+
+    assert len(history_rows(user_id)) == 3
+    assert queue.counters["written"] == 3
+    assert queue.counters["batch_errors"] == 0
+    assert queue.counters["failed"] == 0
+    assert queue.counters["callback_errors"] >= 1
+
+
+def test_direct_write_callback_failure_writes_once(monkeypatch):
+    def broken_add(*args):
+        raise RuntimeError("index unavailable")
+
+    monkeypatch.setattr(thought_index, "add", broken_add)
+    user_id = f"user-{uuid.uuid4().hex[:8]}"
+    queue = WriteBehindQueue()
+
+    asyncio.run(queue.enqueue(history_service.write_batch, {
+        "user_id": user_id, "kind": "analysis", "input": "Only once", "result": {}, "created_at": datetime.utcnow(),
+    }))
+
+    assert len(history_rows(user_id)) == 1
+    assert queue.counters["written"] == 1
+    assert queue.counters["callback_errors"] == 1